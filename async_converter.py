@@ -0,0 +1,220 @@
+"""
+asyncio facade over GameXMLConverter with cancellation and progress reporting
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from converter import atomic_write
+from instrumentation import (OUTCOME_ALREADY_READABLE, OUTCOME_CACHED, OUTCOME_EXCLUDED,
+                             OUTCOME_FAILED, OUTCOME_OK, OUTCOME_UNAVAILABLE)
+
+
+class ConversionJob:
+    """Awaitable handle for a running conversion"""
+
+    def __init__(self, task):
+        self.task = task
+        self.stage = "queued"
+        self.progress = 0.0
+
+    def __await__(self):
+        return self.task.__await__()
+
+    def cancel(self):
+        """Request cancellation; the target file is left untouched unless its write has started"""
+        return self.task.cancel()
+
+    def done(self):
+        """Check if the job has finished, failed or been cancelled"""
+        return self.task.done()
+
+
+class _Progress:
+    """Reports stage changes to a job and callback, timing each stage for instrumentation"""
+
+    def __init__(self, callback, job):
+        self.callback = callback
+        self.job = job
+        self.stages = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._stage = None
+        self._started = time.perf_counter()
+
+    def __call__(self, stage, fraction):
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + now - self._started
+        self._stage, self._started = stage, now
+
+        if self.job is not None:
+            self.job.stage, self.job.progress = stage, fraction
+        if self.callback is not None:
+            self.callback(stage, fraction)
+
+
+class AsyncGameXMLConverter:
+    """Runs conversions without blocking the event loop, limited by a semaphore"""
+
+    def __init__(self, converter, max_concurrency=2):
+        self.converter = converter
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, func, *args):
+        """Run a blocking call in the default executor"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _convert_bytes(self, direction, data):
+        """Convert bytes with the converter's own cache, codec and .exe fallback, in a thread"""
+        converter = self.converter
+        key, cached = await self._run(converter.cache_lookup, data, direction)
+        if cached is not None:
+            return cached, True
+        output = await self._run(converter.convert_bytes, direction, data)
+        await self._run(converter.cache_store, key, output)
+        return output, False
+
+    async def _write(self, file_path, output):
+        """Replace file_path with output
+
+        The executor thread can't be stopped once the write starts, so a
+        cancellation arriving now is absorbed: the job finishes and reports
+        the file it actually wrote.
+        """
+        write = asyncio.ensure_future(self._run(atomic_write, file_path, output))
+        while not write.done():
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                pass
+        return write.result()
+
+    def _emit(self, file_path, direction, outcome, report):
+        """Send the instrumentation event for a finished job"""
+        report("done", 1.0)
+        self.converter.instrumentation.emit(file_path, direction, outcome, report.stages,
+                                            report.bytes_in, report.bytes_out)
+
+    async def convert_to_readable(self, file_path, progress=None, job=None):
+        """Convert a file to readable XML, returning (success, message)"""
+        report = _Progress(progress, job)
+        converter = self.converter
+        if not converter.can_convert:
+            self._emit(file_path, "readable", OUTCOME_UNAVAILABLE, report)
+            return False, "Conversion tools not available"
+        if converter.should_exclude_file(file_path):
+            self._emit(file_path, "readable", OUTCOME_EXCLUDED, report)
+            return False, f"File {file_path} is excluded from conversion"
+
+        async with self.semaphore:
+            try:
+                report("sniff", 0.0)
+                if await self._run(converter.is_file_xml_format, file_path):
+                    self._emit(file_path, "readable", OUTCOME_ALREADY_READABLE, report)
+                    return True, "File is already in readable XML format"
+
+                report("read", 0.1)
+                data = await self._run(_read_bytes, file_path)
+                report.bytes_in = len(data)
+
+                report("convert", 0.3)
+                output, cached = await self._convert_bytes("readable", data)
+                report.bytes_out = len(output)
+
+                # Cancelling stops the job up to here; once the write starts it completes
+                report("write", 0.9)
+                xml_path = converter.readable_output_path(file_path)
+                await self._write(xml_path, output)
+
+                self._emit(file_path, "readable", OUTCOME_CACHED if cached else OUTCOME_OK, report)
+                source = " (cached)" if cached else ""
+                return True, f"Successfully converted to readable XML format{source}: {os.path.abspath(xml_path)}"
+            except asyncio.CancelledError:
+                report("cancelled", 0.0)
+                raise
+            except Exception as e:
+                self._emit(file_path, "readable", OUTCOME_FAILED, report)
+                return False, f"Error during conversion: {str(e)}"
+
+    async def save_as_binary(self, file_path, progress=None, job=None):
+        """Convert a readable XML file to binary in place, returning (success, message)"""
+        report = _Progress(progress, job)
+        converter = self.converter
+        if not converter.can_convert:
+            self._emit(file_path, "binary", OUTCOME_UNAVAILABLE, report)
+            return False, "Conversion tools not available"
+        if converter.should_exclude_file(file_path):
+            self._emit(file_path, "binary", OUTCOME_EXCLUDED, report)
+            return False, f"File {file_path} is excluded from conversion"
+
+        async with self.semaphore:
+            try:
+                report("read", 0.0)
+                data = await self._run(_read_bytes, file_path)
+                report.bytes_in = len(data)
+
+                report("convert", 0.2)
+                output, cached = await self._convert_bytes("binary", data)
+                report.bytes_out = len(output)
+
+                report("write", 0.9)
+                await self._write(file_path, output)
+
+                self._emit(file_path, "binary", OUTCOME_CACHED if cached else OUTCOME_OK, report)
+                return True, "Successfully saved as binary format."
+            except asyncio.CancelledError:
+                report("cancelled", 0.0)
+                raise
+            except Exception as e:
+                self._emit(file_path, "binary", OUTCOME_FAILED, report)
+                return False, f"Error during save: {str(e)}"
+
+    def submit_convert_to_readable(self, file_path, progress=None):
+        """Start convert_to_readable as a task and return its ConversionJob"""
+        job = ConversionJob(None)
+        job.task = asyncio.ensure_future(self.convert_to_readable(file_path, progress, job))
+        return job
+
+    def submit_save_as_binary(self, file_path, progress=None):
+        """Start save_as_binary as a task and return its ConversionJob"""
+        job = ConversionJob(None)
+        job.task = asyncio.ensure_future(self.save_as_binary(file_path, progress, job))
+        return job
+
+
+def _read_bytes(file_path):
+    """Read a whole file"""
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+class EventLoopThread:
+    """Runs an asyncio event loop in a daemon thread for the GUI"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="async-converter", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, func, *args):
+        """Run a plain function on the loop thread and wait for its result"""
+        async def wrapper():
+            return func(*args)
+        return self.submit(wrapper()).result()
+
+    def stop(self):
+        """Stop the loop and wait for the thread to exit"""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
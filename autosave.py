@@ -0,0 +1,275 @@
+"""
+Autosave journal and crash recovery
+
+While a document has unsaved edits, every edit is appended to
+<document>.journal as one JSON line describing the element's new state,
+and at the configured interval the whole tree is written to
+<document>.autosave on a background thread. Once a snapshot is on disk
+the journal is compacted down to the edits made after it started.
+
+Journal entries hold absolute state (an element's full text and
+attributes, a replacement subtree, or a whole replacement document), so
+replaying an entry the snapshot already contains is harmless. Recovery loads the snapshot (or
+the document itself if no snapshot was written) and replays the journal.
+"""
+
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import xml.etree.ElementTree as ET
+
+from cache import default_cache_directory
+from converter import atomic_write
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+SNAPSHOT_SUFFIX = ".autosave"
+
+OP_ELEMENT = "element"
+OP_SUBTREE = "subtree"
+OP_DOCUMENT = "document"
+
+
+def journal_path(document_path):
+    return document_path + JOURNAL_SUFFIX
+
+
+def snapshot_path(document_path):
+    return document_path + SNAPSHOT_SUFFIX
+
+
+def has_journal(document_path):
+    return os.path.exists(journal_path(document_path))
+
+
+def _sessions_path():
+    return os.path.join(os.path.dirname(default_cache_directory()), "autosave_sessions.json")
+
+
+_sessions_lock = threading.Lock()
+
+
+def _update_sessions(document_path, active):
+    path = _sessions_path()
+    with _sessions_lock:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                sessions = json.load(f)
+        except (OSError, ValueError):
+            sessions = []
+        document_path = os.path.abspath(document_path)
+        if active and document_path not in sessions:
+            sessions.append(document_path)
+        elif not active and document_path in sessions:
+            sessions.remove(document_path)
+        else:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, json.dumps(sessions).encode("utf-8"))
+
+
+def pending_sessions():
+    """Documents whose journals were left behind by an editor that didn't close cleanly"""
+    try:
+        with open(_sessions_path(), "r", encoding="utf-8") as f:
+            sessions = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [path for path in sessions if has_journal(path)]
+
+
+def element_path(path_elements):
+    """Child positions leading from the root to the last of path_elements"""
+    return [list(parent).index(child) for parent, child in zip(path_elements, path_elements[1:])]
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _find_element(root, positions):
+    element = root
+    for position in positions:
+        element = element[position]
+    return element
+
+
+def _read_journal(document_path):
+    entries = []
+    with open(journal_path(document_path), "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A line cut short by the crash; nothing after it was written either
+                break
+    return entries
+
+
+def recover(document_path, tree=None):
+    """Rebuild the last autosaved state of a document
+
+    tree is the document as loaded from disk, used (copied, not modified)
+    when no snapshot was written yet. Returns (ElementTree, number of the
+    last journal entry).
+    """
+    snapshot = snapshot_path(document_path)
+    if os.path.exists(snapshot):
+        tree = ET.parse(snapshot)
+    elif tree is not None:
+        tree = copy.deepcopy(tree)
+    else:
+        tree = ET.parse(document_path)
+
+    entries = _read_journal(document_path)
+    root = tree.getroot()
+    for entry in entries:
+        if entry["op"] == OP_DOCUMENT:
+            root = ET.fromstring(entry["xml"])
+            tree = ET.ElementTree(root)
+            continue
+        try:
+            element = _find_element(root, entry["path"])
+        except IndexError:
+            # Superseded by a later document entry
+            continue
+        if entry["op"] == OP_SUBTREE:
+            parent = _find_element(root, entry["path"][:-1])
+            replacement = ET.fromstring(entry["xml"])
+            replacement.tail = element.tail
+            parent[entry["path"][-1]] = replacement
+            continue
+        element.text = entry["text"]
+        element.attrib.clear()
+        element.attrib.update(entry["attrib"])
+    return tree, entries[-1]["seq"] if entries else 0
+
+
+class Autosave:
+    """Journal writer and periodic snapshots for one document
+
+    All file I/O happens on a writer thread and a snapshot thread, so
+    recording an edit only costs a queue put on the UI thread.
+    """
+
+    def __init__(self, document_path):
+        self.document_path = document_path
+        self.sequence = 0           # number of the last recorded entry
+        self.snapshot_sequence = 0  # entries up to here are in the snapshot on disk
+        self._snapshotting = False
+        self._generation = 0        # bumped by discard() so late snapshots are dropped
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="autosave-journal", daemon=True)
+        self._writer.start()
+
+    @property
+    def needs_snapshot(self):
+        return self.sequence > self.snapshot_sequence and not self._snapshotting
+
+    def record_element(self, positions, element):
+        """Journal an element's current text and attributes"""
+        self.sequence += 1
+        self._queue.put(("append", {
+            "seq": self.sequence, "op": OP_ELEMENT, "path": positions,
+            "text": element.text, "attrib": dict(element.attrib)
+        }))
+
+    def record_subtree(self, positions, element):
+        """Journal an element replaced along with its descendants (not the root)"""
+        tail, element.tail = element.tail, None
+        try:
+            xml_text = ET.tostring(element, encoding="unicode")
+        finally:
+            element.tail = tail
+        self.sequence += 1
+        self._queue.put(("append", {"seq": self.sequence, "op": OP_SUBTREE, "path": positions, "xml": xml_text}))
+
+    def record_document(self, xml_text):
+        """Journal a replacement of the whole document"""
+        self.sequence += 1
+        self._queue.put(("append", {"seq": self.sequence, "op": OP_DOCUMENT, "xml": xml_text}))
+
+    def snapshot(self, tree):
+        """Write the whole tree in the background, then compact the journal"""
+        if not self.needs_snapshot:
+            return False
+        self._snapshotting = True
+        threading.Thread(target=self._write_snapshot, args=(tree, self.sequence, self._generation),
+                         name="autosave-snapshot", daemon=True).start()
+        return True
+
+    def _write_snapshot(self, tree, sequence, generation):
+        # Edits made while this runs may or may not end up in the snapshot;
+        # their journal entries are kept, and replaying them is idempotent
+        path = snapshot_path(self.document_path)
+        temp_path = path + ".tmp"
+        try:
+            tree.write(temp_path, encoding="utf-8", xml_declaration=True)
+            if generation != self._generation:
+                # The document was saved meanwhile; this snapshot is stale
+                os.remove(temp_path)
+                return
+            os.replace(temp_path, path)
+            self._queue.put(("compact", (sequence, generation)))
+        except Exception as e:
+            logger.warning("Autosave snapshot failed: %s", e)
+            _remove(temp_path)
+            self._snapshotting = False
+
+    def discard(self):
+        """Forget the journal and snapshot, e.g. after the document was saved"""
+        self._generation += 1
+        self._queue.put(("discard", None))
+        self.sequence = self.snapshot_sequence = 0
+        self._snapshotting = False
+
+    def close(self, timeout=5.0):
+        """Stop the writer once queued work is done, leaving the journal for recovery"""
+        self._queue.put(("stop", None))
+        self._writer.join(timeout)
+
+    def _write_loop(self):
+        journal = None
+        path = journal_path(self.document_path)
+        while True:
+            command, argument = self._queue.get()
+            try:
+                if command == "append":
+                    if journal is None:
+                        if not os.path.exists(path):
+                            # A new journal: any snapshot lying around predates it
+                            _remove(snapshot_path(self.document_path))
+                            _update_sessions(self.document_path, True)
+                        journal = open(path, "a", encoding="utf-8")
+                    journal.write(json.dumps(argument) + "\n")
+                    journal.flush()
+                elif command == "compact":
+                    sequence, generation = argument
+                    if generation != self._generation:
+                        _remove(snapshot_path(self.document_path))
+                        continue
+                    if journal is not None:
+                        journal.close()
+                        journal = None
+                    if os.path.exists(path):
+                        kept = [entry for entry in _read_journal(self.document_path) if entry["seq"] > sequence]
+                        atomic_write(path, "".join(json.dumps(entry) + "\n" for entry in kept).encode("utf-8"))
+                    self.snapshot_sequence = sequence
+                    self._snapshotting = False
+                else:
+                    if journal is not None:
+                        journal.close()
+                        journal = None
+                    if command == "discard":
+                        _remove(path)
+                        _remove(snapshot_path(self.document_path))
+                        _update_sessions(self.document_path, False)
+                    elif command == "stop":
+                        return
+            except Exception as e:
+                logger.warning("Autosave journal error: %s", e)
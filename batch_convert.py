@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Game XML Batch Converter - Headless Entry Point
+
+Converts every supported file in a game data directory between binary and
+readable XML formats on a process pool. Results are appended to a JSON lines
+manifest so an interrupted run can be resumed.
+
+Usage:
+    python batch_convert.py DATA_DIR [--to readable|binary] [--workers N]
+                            [--manifest FILE] [--resume]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import BATCH_SETTINGS, get_tools_path, is_excluded_file, is_supported_file
+from converter import GameXMLConverter
+from instrumentation import JSONLinesSink, format_summary, summarize
+import parsers
+import rml
+from sniffer import FORMAT_RML, FORMAT_XML, classify_directory
+
+# Converter instance owned by each worker process
+_converter = None
+
+
+def _init_worker(tools_path):
+    """Create the per-process converter"""
+    global _converter
+    _converter = GameXMLConverter(tools_path)
+
+
+def convert_one(file_path, direction):
+    """Convert a single file in a worker process and return its manifest record"""
+    start = time.perf_counter()
+    record = {
+        "path": file_path,
+        "direction": direction,
+        "status": "failed",
+        "message": "",
+        "bytes": 0,
+        "seconds": 0.0,
+        "cache": None,
+        "outcome": None,
+        "bytes_out": 0,
+        "timings": {}
+    }
+
+    # Skipped files never reach the converter; don't report the previous file's measurements for them
+    _converter.begin_conversion()
+    try:
+        record["bytes"] = os.path.getsize(file_path)
+        is_readable = _converter.is_file_xml_format(file_path)
+
+        if direction == "readable":
+            if is_readable:
+                record["status"] = "skipped"
+                record["message"] = "File is already in readable XML format"
+            else:
+                success, message = _converter.convert_to_readable(file_path)
+                record["status"] = "ok" if success else "failed"
+                record["message"] = message
+        else:
+            if not is_readable:
+                record["status"] = "skipped"
+                record["message"] = "File is already in binary format"
+            else:
+                success, message = _converter.save_as_binary(file_path)
+                record["status"] = "ok" if success else "failed"
+                record["message"] = message
+    except Exception as e:
+        record["message"] = f"Error during conversion: {str(e)}"
+
+    record["cache"] = _converter.last_cache_result
+    record["outcome"] = _converter.last_outcome
+    record["bytes_out"] = _converter.last_bytes[1]
+    record["timings"] = {stage: round(seconds, 6) for stage, seconds in _converter.last_timings.items()}
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def find_files(root_dir, skip_paths=None):
+    """Walk a directory and yield files that should be converted"""
+    skip_paths = skip_paths or set()
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(dirpath, filename)
+            if not is_supported_file(file_path) or is_excluded_file(file_path):
+                continue
+            if file_path in skip_paths:
+                continue
+            yield file_path
+
+
+def load_manifest(manifest_path):
+    """Load the last record for each path from an existing manifest"""
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run interrupted mid-write can leave a truncated last line
+                continue
+            records[record["path"]] = record
+    return records
+
+
+def format_rate(count, nbytes, seconds):
+    """Format throughput numbers for the summary"""
+    seconds = max(seconds, 1e-9)
+    return f"{count / seconds:,.1f} files/s, {nbytes / seconds / (1024 * 1024):,.2f} MB/s"
+
+
+def record_to_event(record):
+    """Turn a manifest record into an instrumentation event"""
+    return {
+        "file": record["path"],
+        "direction": record["direction"],
+        "outcome": record.get("outcome") or record["status"],
+        "stages": record.get("timings", {}),
+        "bytes_in": record["bytes"],
+        "bytes_out": record.get("bytes_out", 0),
+        "total": record["seconds"],
+        "timestamp": time.time()
+    }
+
+
+def run_batch(root_dir, direction="readable", workers=None, manifest_path=None,
+              resume=False, tools_path=None, quiet=False, timings_log=None):
+    """Convert a directory tree and return a summary dictionary"""
+    tools_path = tools_path or get_tools_path()
+    workers = workers or BATCH_SETTINGS["workers"] or os.cpu_count() or 1
+    manifest_path = manifest_path or os.path.join(root_dir, BATCH_SETTINGS["manifest_name"])
+
+    # Skip files that already completed in a previous run
+    done_paths = set()
+    if resume:
+        for path, record in load_manifest(manifest_path).items():
+            if record.get("direction") == direction and record.get("status") in ("ok", "skipped"):
+                done_paths.add(path)
+
+    files = list(find_files(root_dir, done_paths))
+    total = len(files)
+    counts = {"ok": 0, "skipped": 0, "failed": 0}
+    cache_counts = {"hit": 0, "miss": 0}
+    total_bytes = 0
+    events = []
+    timings_sink = JSONLinesSink(timings_log) if timings_log else None
+    progress_every = max(1, BATCH_SETTINGS["progress_every"])
+
+    if not quiet:
+        print(f"Converting {total} files to {direction} with {workers} workers"
+              + (f" ({len(done_paths)} already done)" if done_paths else ""))
+
+    start = time.perf_counter()
+    with open(manifest_path, "a" if resume else "w", encoding="utf-8") as manifest:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tools_path,)) as pool:
+            futures = [pool.submit(convert_one, path, direction) for path in files]
+
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                counts[record["status"]] += 1
+                total_bytes += record["bytes"]
+                if record["cache"] in cache_counts:
+                    cache_counts[record["cache"]] += 1
+
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+
+                event = record_to_event(record)
+                events.append(event)
+                if timings_sink is not None:
+                    timings_sink.emit(event)
+
+                if not quiet and (done % progress_every == 0 or done == total):
+                    print(f"[{done}/{total}] {record['status']:<7} {record['path']}"
+                          + (f" - {record['message']}" if record["status"] == "failed" else ""))
+
+    elapsed = time.perf_counter() - start
+    timing_summary = summarize(events)
+    summary = {
+        "total": total,
+        "ok": counts["ok"],
+        "skipped": counts["skipped"],
+        "failed": counts["failed"],
+        "resumed": len(done_paths),
+        "cache_hits": cache_counts["hit"],
+        "cache_misses": cache_counts["miss"],
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "manifest": manifest_path,
+        "timings": timing_summary
+    }
+
+    if not quiet:
+        print(f"\nDone in {elapsed:.2f}s: {counts['ok']} converted, "
+              f"{counts['skipped']} skipped, {counts['failed']} failed")
+        print(f"Throughput: {format_rate(total, total_bytes, elapsed)}")
+        print(f"Cache: {cache_counts['hit']} hits, {cache_counts['miss']} misses")
+        print(f"Manifest: {manifest_path}")
+        if events:
+            print("\nWhere the time went:")
+            print(format_summary(timing_summary))
+
+    return summary
+
+
+def print_classification(root_dir, quiet=False):
+    """Print the sniffed format of every supported file and per-format totals"""
+    results = classify_directory(root_dir)
+    totals = {}
+    for file_path, file_format in results.items():
+        totals[file_format] = totals.get(file_format, 0) + 1
+        if not quiet:
+            print(f"{file_format:<8} {file_path}")
+
+    if quiet:
+        print(json.dumps(totals))
+    else:
+        print("\n" + ", ".join(f"{count} {name}" for name, count in sorted(totals.items())))
+    return 0
+
+
+def _scan_xml(file_path, tag=None):
+    """Count an XML file like rml.scan, streaming it with element clearing"""
+    statistics = parsers.scan_statistics(file_path)
+    return {"elements": statistics.elements, "attributes": statistics.attributes,
+            "matches": statistics.tag_counts.get(tag, 0) if tag is not None else 0}
+
+
+def print_scan(root_dir, tag=None, quiet=False):
+    """Stream every binary and XML file and print element/attribute counts (and tag matches)"""
+    totals = {"files": 0, "elements": 0, "attributes": 0, "matches": 0}
+    for file_path, file_format in classify_directory(root_dir).items():
+        if file_format not in (FORMAT_RML, FORMAT_XML):
+            continue
+        try:
+            result = rml.scan(file_path, tag) if file_format == FORMAT_RML else _scan_xml(file_path, tag)
+        except (rml.RMLFormatError, ET.ParseError, OSError) as e:
+            if not quiet:
+                print(f"error    {file_path} - {str(e)}")
+            continue
+
+        totals["files"] += 1
+        for key in ("elements", "attributes", "matches"):
+            totals[key] += result[key]
+        if not quiet and (tag is None or result["matches"]):
+            line = f"{result['elements']:>9} elements {result['attributes']:>9} attributes  {file_path}"
+            if tag is not None:
+                line += f"  ({result['matches']} <{tag}>)"
+            print(line)
+
+    if quiet:
+        print(json.dumps(totals))
+    else:
+        print(f"\n{totals['files']} files, {totals['elements']:,} elements, "
+              f"{totals['attributes']:,} attributes"
+              + (f", {totals['matches']:,} <{tag}> elements" if tag is not None else ""))
+    return 0
+
+
+def main(argv=None):
+    """Parse command line arguments and run the batch conversion"""
+    parser = argparse.ArgumentParser(description="Batch convert AVATAR game XML files")
+    parser.add_argument("directory", help="Game data directory to convert")
+    parser.add_argument("--to", dest="direction", choices=("readable", "binary"),
+                        default="readable", help="Target format (default: readable)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--manifest", help="Manifest file path (default: inside DIRECTORY)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip files already completed in the manifest")
+    parser.add_argument("--tools", help="Path to the conversion tools directory")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    parser.add_argument("--timings-log", help="Append a JSON lines timing event per file")
+    parser.add_argument("--classify", action="store_true",
+                        help="Only report the format of each file, without converting")
+    parser.add_argument("--scan", action="store_true",
+                        help="Stream binary and XML files and report element counts, without converting")
+    parser.add_argument("--tag", help="With --scan, count elements with this tag")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: not a directory: {args.directory}")
+        return 2
+
+    if args.classify:
+        return print_classification(args.directory, args.quiet)
+    if args.scan:
+        return print_scan(args.directory, args.tag, args.quiet)
+
+    summary = run_batch(args.directory, args.direction, args.workers, args.manifest,
+                        args.resume, args.tools, args.quiet, args.timings_log)
+    if args.quiet:
+        print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
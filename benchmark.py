@@ -0,0 +1,245 @@
+"""
+Micro-benchmarks for the editor's document handling
+
+Usage:
+    python benchmark.py walkers [--depth N] [--width N] [--repeat N]
+    python benchmark.py parsers [--objects N [N ...]] [--repeat N]
+    python benchmark.py models [--objects N [N ...]]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import parsers
+import tree_walk
+from compact_document import CompactDocument
+from doc_stats import DocumentStatistics
+from document_index import DocumentIndex
+
+
+def build_deep_tree(depth):
+    """A single chain of nested elements"""
+    root = ET.Element("root")
+    element = root
+    for index in range(depth):
+        element = ET.SubElement(element, "node", {"level": str(index)})
+    return root
+
+
+def build_wide_tree(width, fanout=10):
+    """A root with width children, each holding fanout leaves"""
+    root = ET.Element("root")
+    for index in range(width):
+        child = ET.SubElement(root, "item", {"id": str(index)})
+        for leaf in range(fanout):
+            ET.SubElement(child, "value").text = str(leaf)
+    return root
+
+
+def clear_whitespace(root):
+    """Undo indentation so indent benchmarks start from the same state"""
+    for element in root.iter():
+        if element.text is not None and not element.text.strip():
+            element.text = None
+        if element.tail is not None and not element.tail.strip():
+            element.tail = None
+
+
+# Recursive versions the editor used before the explicit-stack walkers
+def recursive_max_depth(element, current_depth=0):
+    if not list(element):
+        return current_depth
+    return max(recursive_max_depth(child, current_depth + 1) for child in element)
+
+
+def recursive_indent(elem, level=0):
+    i = "\n" + level * "  "
+    if len(elem):
+        if not elem.text or not elem.text.strip():
+            elem.text = i + "  "
+        if not elem.tail or not elem.tail.strip():
+            elem.tail = i
+        for child in elem:
+            recursive_indent(child, level + 1)
+        if not child.tail or not child.tail.strip():
+            child.tail = i
+    else:
+        if level and (not elem.tail or not elem.tail.strip()):
+            elem.tail = i
+
+
+def recursive_count(element):
+    return 1 + sum(recursive_count(child) for child in element)
+
+
+def iterative_count(element):
+    return sum(1 for _ in tree_walk.preorder(element))
+
+
+def time_call(func, root, repeat, reset=None):
+    """Best wall time of func(root) over repeat runs, or None on RecursionError"""
+    best = None
+    for _ in range(repeat):
+        if reset is not None:
+            reset(root)
+        started = time.perf_counter()
+        try:
+            func(root)
+        except RecursionError:
+            return None
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def format_seconds(seconds):
+    return "RecursionError" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+def bench_walkers(args):
+    trees = [
+        (f"deep ({args.depth} levels)", build_deep_tree(args.depth)),
+        (f"wide ({args.width} x 10)", build_wide_tree(args.width))
+    ]
+    cases = [
+        ("walk", recursive_count, iterative_count, None),
+        ("max depth", recursive_max_depth, tree_walk.max_depth, None),
+        ("indent", recursive_indent, tree_walk.indent, clear_whitespace)
+    ]
+
+    print(f"{'tree':<24} {'operation':<10} {'recursive':>16} {'iterative':>16} {'speedup':>8}")
+    for tree_name, root in trees:
+        for case_name, recursive, iterative, reset in cases:
+            old = time_call(recursive, root, args.repeat, reset)
+            new = time_call(iterative, root, args.repeat, reset)
+            speedup = f"{old / new:.2f}x" if old and new else "-"
+            print(f"{tree_name:<24} {case_name:<10} {format_seconds(old):>16} "
+                  f"{format_seconds(new):>16} {speedup:>8}")
+
+
+def build_game_xml(objects, fields=6, children=3):
+    """A .game.xml-like document: nested entity objects holding typed fields"""
+    root = ET.Element("object", {"name": "EntityLibrary"})
+    parents = [root]
+    for index in range(objects):
+        parent = parents[index // children] if index // children < len(parents) else root
+        element = ET.SubElement(parent, "object", {"hash": f"{index * 2654435761 % 2**32:08X}"})
+        for field in range(fields):
+            if field % 2:
+                ET.SubElement(element, "field", {"name": f"hidField{field}", "type": "String"}).text = f"value{index}"
+            else:
+                ET.SubElement(element, "field", {"hash": f"{field:08X}", "type": "BinHex"}).text = f"{index:08X}"
+        parents.append(element)
+    tree_walk.indent(root)
+    return ET.ElementTree(root)
+
+
+def load_with(backend, filename):
+    """Parse a file and build its statistics and index, as opening it in the editor does"""
+    parsed = parsers.get_parser(backend=backend).parse_file(filename)
+    root = parsed.tree.getroot()
+    statistics = parsed.statistics or DocumentStatistics(root)
+    index = parsed.index or DocumentIndex(root)
+    return parsed, statistics, index
+
+
+def peak_memory(func, *args):
+    """Peak bytes allocated through Python while func runs"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_parsers(args):
+    backends = parsers.available_backends()
+    print(f"Backends: {', '.join(backends)}"
+          + ("" if parsers.BACKEND_LXML in backends else " (lxml is not installed)"))
+    print("Peak memory counts Python allocations; lxml's own tree is freed once copied and not included.\n")
+    print(f"{'file':<26} {'backend':<10} {'parse':>12} {'parse+count+index':>18} {'peak memory':>12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for objects in args.objects:
+            filename = os.path.join(directory, f"bench_{objects}.game.xml")
+            build_game_xml(objects).write(filename, encoding="utf-8", xml_declaration=True)
+            label = f"{objects} objects ({os.path.getsize(filename) / 1024 / 1024:.1f} MB)"
+            for backend in backends:
+                parser = parsers.get_parser(backend=backend)
+                parse_time = time_call(parser.parse_file, filename, args.repeat)
+                load_time = time_call(lambda name: load_with(backend, name), filename, args.repeat)
+                peak = peak_memory(load_with, backend, filename)
+                print(f"{label:<26} {backend:<10} {format_seconds(parse_time):>12} "
+                      f"{format_seconds(load_time):>18} {peak / 1024 / 1024:>9.1f} MB")
+                label = ""
+
+
+def retained_memory(func, *args):
+    """(seconds, bytes still allocated through Python) for building func's result"""
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return elapsed, retained
+
+
+def bench_models(args):
+    models = [
+        ("ElementTree", lambda name: ET.parse(name)),
+        ("compact", CompactDocument.parse),
+    ]
+    print("Memory held by the parsed document (tracing slows the timings).\n")
+    print(f"{'file':<26} {'model':<12} {'elements':>10} {'parse':>12} {'memory':>12} {'per element':>12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for objects in args.objects:
+            filename = os.path.join(directory, f"bench_{objects}.game.xml")
+            build_game_xml(objects).write(filename, encoding="utf-8", xml_declaration=True)
+            elements = sum(1 for _ in ET.parse(filename).iter())
+            label = f"{objects} objects ({os.path.getsize(filename) / 1024 / 1024:.1f} MB)"
+            for name, load in models:
+                elapsed, retained = retained_memory(load, filename)
+                print(f"{label:<26} {name:<12} {elements:>10} {format_seconds(elapsed):>12} "
+                      f"{retained / 1024 / 1024:>9.1f} MB {retained / elements:>10.0f} B")
+                label = ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark editor document handling")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    walkers = commands.add_parser("walkers", help="Recursive vs explicit-stack tree walkers")
+    walkers.add_argument("--depth", type=int, default=5000, help="Nesting depth of the deep tree")
+    walkers.add_argument("--width", type=int, default=20000, help="Children of the wide tree's root")
+    walkers.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    walkers.set_defaults(func=bench_walkers)
+
+    parser_bench = commands.add_parser("parsers", help="XML parser backends on generated .game.xml files")
+    parser_bench.add_argument("--objects", type=int, nargs="+", default=[2000, 20000, 100000],
+                              help="Entity objects per generated file (one file per value)")
+    parser_bench.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser_bench.set_defaults(func=bench_parsers)
+
+    models = commands.add_parser("models", help="ElementTree vs compact document memory")
+    models.add_argument("--objects", type=int, nargs="+", default=[20000, 100000],
+                        help="Entity objects per generated file (one file per value)")
+    models.set_defaults(func=bench_models)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Content-addressed on-disk cache for conversion results
+
+Several processes (batch workers, the editor) may share one directory.
+Each keeps its own index of it, so every put re-reads the directory before
+evicting, and the size limit holds for the directory as a whole rather
+than per process. A scan is cheap next to the conversion that produced
+the entry.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import rml
+
+# Bump when the layout of cached entries changes
+CACHE_FORMAT_VERSION = 1
+
+
+def default_cache_directory():
+    """Get the per-user cache directory"""
+    return os.path.join(os.path.expanduser("~"), ".avatar_xml_editor", "cache")
+
+
+class ConversionCache:
+    """Stores converted output keyed by a hash of the input bytes, with LRU eviction"""
+
+    def __init__(self, directory=None, max_size_mb=512):
+        self.directory = directory or default_cache_directory()
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = None  # key -> size, oldest first
+        self._total_size = 0
+
+    def make_key(self, data, direction):
+        """Build the cache key for converting data in the given direction"""
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_FORMAT_VERSION}:codec{rml.CODEC_VERSION}:{direction}:".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        """Get the file path for a cache entry"""
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load_index(self, rescan=False):
+        """Scan the cache directory (once, unless rescan), ordering entries by last access"""
+        if self._entries is not None and not rescan:
+            return
+
+        found = []
+        if os.path.isdir(self.directory):
+            for dirpath, dirnames, filenames in os.walk(self.directory):
+                for filename in filenames:
+                    if filename.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(dirpath, filename))
+                    except OSError:
+                        continue
+                    found.append((stat.st_mtime, filename, stat.st_size))
+
+        # Timestamps are coarse, so accesses within one tick keep the order this process saw
+        known = {key: position for position, key in enumerate(self._entries or ())}
+        found.sort(key=lambda entry: (entry[0], known.get(entry[1], -1), entry[1]))
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._total_size = sum(size for _, _, size in found)
+
+    def get(self, key):
+        """Return cached bytes for key, or None on a miss"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._load_index()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+        # Touch the entry so LRU order survives restarts
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Store converted bytes under key and evict old entries if over budget"""
+        if len(data) > self.max_size:
+            return
+
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._load_index()
+            self._entries.pop(key, None)
+            self._entries[key] = len(data)
+            # Other processes add and evict entries in the same directory
+            self._load_index(rescan=True)
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        while self._total_size > self.max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_size -= size
+            try:
+                os.remove(self._entry_path(key))
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        """Delete every cache entry"""
+        with self._lock:
+            self._load_index()
+            for key in list(self._entries):
+                try:
+                    os.remove(self._entry_path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_size = 0
+
+    def stats(self):
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            self._load_index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self._total_size
+            }
@@ -0,0 +1,731 @@
+"""
+Compact array-backed document model for very large files
+
+An ElementTree element costs a few hundred bytes before its strings are
+counted. CompactDocument keeps a whole tree in flat integer arrays instead:
+per element its tag, text and tail ids, parent, first/last child and
+sibling links, child count and a run of attribute slots. Tag and attribute
+names are interned in one pool, attribute values, text and tails in
+another, so the thousands of identical indentation tails and repeated
+values are stored once.
+
+CompactElement is a two-slot view of one element, created on access. It
+supports the part of the Element API the editor's helpers rely on (tag,
+attrib, text, tail, get/set/items/keys, len, iteration, indexing and the
+child list methods, iter and ElementPath find), so render_document(),
+indent(), DocumentStatistics and DocumentIndex work on it unchanged. Views
+compare and hash by position, so they can key dictionaries like elements.
+
+Removed elements stay in the arrays, detached, so they can be inserted
+again, as with ElementTree. Unlike ElementTree, an element belongs to one
+parent at a time: inserting an attached element moves it.
+
+The editor opens files above PARSER_SETTINGS["compact_min_mb"] in this
+model (the "compact" parser backend). Text and attributes can be edited
+and the document saved with write(); structural edits, which go through
+the source view, are off. Nothing is built per element on load: statistics()
+counts from the arrays, and CompactIndex stands in for the search index,
+finding paths through the parent array and leaving search off.
+"""
+
+from array import array
+from collections import Counter
+from collections.abc import MutableMapping
+from itertools import chain
+import sys
+import xml.etree.ElementTree as ET
+from xml.etree import ElementPath
+# Same escaping as ET.tostring, so serialized documents match
+from xml.etree.ElementTree import _escape_attrib, _escape_cdata
+
+# Missing string, parent, child or sibling
+NONE = -1
+
+# Bytes fed to the XML parser at a time
+READ_CHUNK_SIZE = 256 * 1024
+
+
+class StringPool:
+    """Interned strings, referred to by their position"""
+
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}  # string -> position
+
+    def __len__(self):
+        return len(self.strings)
+
+    def add(self, value):
+        """Position of value, adding it if new; NONE for None"""
+        if value is None:
+            return NONE
+        number = self.ids.get(value)
+        if number is None:
+            number = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return number
+
+    def get(self, number):
+        return None if number == NONE else self.strings[number]
+
+
+class CompactDocument:
+    """A document tree held in flat arrays"""
+
+    def __init__(self):
+        self.names = StringPool()   # tags and attribute names
+        self.values = StringPool()  # attribute values, text and tails
+        self.tags = array("i")
+        self.texts = array("i")
+        self.tails = array("i")
+        self.parents = array("i")
+        self.first_children = array("i")
+        self.last_children = array("i")
+        self.next_siblings = array("i")
+        self.previous_siblings = array("i")
+        self.child_counts = array("i")
+        # An element's attributes are attribute_counts[i] slots from attribute_starts[i]
+        self.attribute_starts = array("i")
+        self.attribute_counts = array("i")
+        self.attribute_names = array("i")
+        self.attribute_values = array("i")
+        self.root_index = NONE
+        # (parent, child position, child) of the last indexed child, so
+        # walking a child list by position doesn't start over each time
+        self._cursor = (NONE, 0, NONE)
+
+    def __len__(self):
+        """Number of element slots, detached elements included"""
+        return len(self.tags)
+
+    # Building
+
+    @classmethod
+    def parse(cls, filename):
+        """Parse an XML file straight into arrays, without building ElementTree elements"""
+        document = cls()
+        parser = ET.XMLParser(target=document.builder())
+        with open(filename, "rb") as f:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                parser.feed(chunk)
+        return parser.close()
+
+    @classmethod
+    def fromstring(cls, text):
+        """Parse XML text; raises ET.ParseError like ET.fromstring"""
+        parser = ET.XMLParser(target=cls().builder())
+        parser.feed(text)
+        return parser.close()
+
+    @classmethod
+    def from_element(cls, root):
+        """Copy an ElementTree element (and its descendants) into a new document"""
+        document = cls()
+        document.root_index = document._import(root)
+        return document
+
+    def builder(self):
+        """An XMLParser target filling this empty document; its close() returns the document"""
+        return _Builder(self)
+
+    def getroot(self):
+        return CompactElement(self, self.root_index) if self.root_index != NONE else None
+
+    def makeelement(self, tag, attrib):
+        """A new detached element"""
+        return CompactElement(self, self._new_node(tag, attrib))
+
+    def _new_node(self, tag, attrib=None, text=None, tail=None):
+        node = len(self.tags)
+        self.tags.append(self.names.add(tag))
+        self.texts.append(self.values.add(text))
+        self.tails.append(self.values.add(tail))
+        for links in (self.parents, self.first_children, self.last_children,
+                      self.next_siblings, self.previous_siblings):
+            links.append(NONE)
+        self.child_counts.append(0)
+        self.attribute_starts.append(len(self.attribute_names))
+        self.attribute_counts.append(len(attrib) if attrib else 0)
+        if attrib:
+            for name, value in attrib.items():
+                self.attribute_names.append(self.names.add(name))
+                self.attribute_values.append(self.values.add(value))
+        return node
+
+    def _import(self, element):
+        # Copy element and its descendants into this document; returns the new top node
+        top = self._new_node(element.tag, element.attrib, element.text, element.tail)
+        stack = [(element, top)]
+        while stack:
+            source, node = stack.pop()
+            for child in source:
+                child_node = self._new_node(child.tag, child.attrib, child.text, child.tail)
+                self._link(node, child_node)
+                if len(child):
+                    stack.append((child, child_node))
+        return top
+
+    def _adopt(self, element):
+        # The node for element inside this document: its own node, or a copy
+        if isinstance(element, CompactElement) and element.document is self:
+            return element.index
+        return self._import(element)
+
+    # Structure
+
+    def _link(self, parent, node, before=NONE):
+        """Insert node among parent's children, before the child before (or last)"""
+        ancestor = parent
+        while ancestor != NONE:
+            if ancestor == node:
+                raise ValueError("cannot insert an element into its own subtree")
+            ancestor = self.parents[ancestor]
+        if before == node:
+            # Inserting node where it already is: place it before its successor
+            before = self.next_siblings[node]
+        if self.parents[node] != NONE:
+            self._unlink(node)
+
+        if before == NONE:
+            previous, following = self.last_children[parent], NONE
+        else:
+            previous, following = self.previous_siblings[before], before
+        self.parents[node] = parent
+        self.previous_siblings[node] = previous
+        self.next_siblings[node] = following
+        if previous == NONE:
+            self.first_children[parent] = node
+        else:
+            self.next_siblings[previous] = node
+        if following == NONE:
+            self.last_children[parent] = node
+        else:
+            self.previous_siblings[following] = node
+        self.child_counts[parent] += 1
+        self._cursor = (NONE, 0, NONE)
+
+    def _unlink(self, node):
+        """Detach node (with its descendants) from its parent"""
+        parent = self.parents[node]
+        previous, following = self.previous_siblings[node], self.next_siblings[node]
+        if previous == NONE:
+            self.first_children[parent] = following
+        else:
+            self.next_siblings[previous] = following
+        if following == NONE:
+            self.last_children[parent] = previous
+        else:
+            self.previous_siblings[following] = previous
+        self.child_counts[parent] -= 1
+        self.parents[node] = self.previous_siblings[node] = self.next_siblings[node] = NONE
+        self._cursor = (NONE, 0, NONE)
+
+    def _children(self, node):
+        child = self.first_children[node]
+        next_siblings = self.next_siblings
+        while child != NONE:
+            yield child
+            child = next_siblings[child]
+
+    def _child_at(self, parent, position):
+        """The child at position (negative counts from the end); raises IndexError"""
+        count = self.child_counts[parent]
+        if position < 0:
+            position += count
+        if not 0 <= position < count:
+            raise IndexError("child index out of range")
+
+        # Walk from whichever of the first child, last child and cursor is closest
+        start, node = 0, self.first_children[parent]
+        if count - 1 - position < position:
+            start, node = count - 1, self.last_children[parent]
+        cursor_parent, cursor_position, cursor_node = self._cursor
+        if cursor_parent == parent and abs(position - cursor_position) < abs(position - start):
+            start, node = cursor_position, cursor_node
+        while start < position:
+            node = self.next_siblings[node]
+            start += 1
+        while start > position:
+            node = self.previous_siblings[node]
+            start -= 1
+        self._cursor = (parent, position, node)
+        return node
+
+    def _preorder(self, top):
+        """Nodes of top's subtree in document order"""
+        first_children, next_siblings, parents = self.first_children, self.next_siblings, self.parents
+        yield top
+        node = first_children[top]
+        while node != NONE:
+            yield node
+            if first_children[node] != NONE:
+                node = first_children[node]
+                continue
+            while node != top and next_siblings[node] == NONE:
+                node = parents[node]
+            if node == top:
+                break
+            node = next_siblings[node]
+
+    # Attributes
+
+    def _attribute_slot(self, node, name):
+        number = self.names.ids.get(name)
+        if number is not None:
+            start = self.attribute_starts[node]
+            for slot in range(start, start + self.attribute_counts[node]):
+                if self.attribute_names[slot] == number:
+                    return slot
+        return None
+
+    def _set_attribute(self, node, name, value):
+        slot = self._attribute_slot(node, name)
+        if slot is not None:
+            self.attribute_values[slot] = self.values.add(value)
+            return
+        start, count = self.attribute_starts[node], self.attribute_counts[node]
+        if start + count != len(self.attribute_names):
+            # Not the last run: move it to the end so it can grow
+            self.attribute_names.extend(self.attribute_names[start:start + count])
+            self.attribute_values.extend(self.attribute_values[start:start + count])
+            self.attribute_starts[node] = len(self.attribute_names) - count
+        self.attribute_names.append(self.names.add(name))
+        self.attribute_values.append(self.values.add(value))
+        self.attribute_counts[node] = count + 1
+
+    def _delete_attribute(self, node, name):
+        slot = self._attribute_slot(node, name)
+        if slot is None:
+            raise KeyError(name)
+        end = self.attribute_starts[node] + self.attribute_counts[node]
+        # Close the gap within the run, keeping attribute order
+        self.attribute_names[slot:end - 1] = self.attribute_names[slot + 1:end]
+        self.attribute_values[slot:end - 1] = self.attribute_values[slot + 1:end]
+        self.attribute_counts[node] -= 1
+
+    def _attribute_items(self, node):
+        start = self.attribute_starts[node]
+        names, values = self.names.strings, self.values.strings
+        return [(names[self.attribute_names[slot]], values[self.attribute_values[slot]])
+                for slot in range(start, start + self.attribute_counts[node])]
+
+    # Conversion and output
+
+    def to_element(self, node=None):
+        """Copy an element (the root by default) and its descendants into ElementTree elements"""
+        node = self.root_index if node is None else node
+        names, values = self.names.strings, self.values.get
+
+        def make(number):
+            element = ET.Element(names[self.tags[number]], dict(self._attribute_items(number)))
+            element.text = values(self.texts[number])
+            element.tail = values(self.tails[number])
+            return element
+
+        top = make(node)
+        stack = [(node, top)]
+        while stack:
+            number, element = stack.pop()
+            for child in self._children(number):
+                child_element = make(child)
+                element.append(child_element)
+                if self.first_children[child] != NONE:
+                    stack.append((child, child_element))
+        return top
+
+    def serialize(self, node=None):
+        """Yield the text of an element (the root by default) as ET.tostring would write it"""
+        node = self.root_index if node is None else node
+        names, values = self.names.strings, self.values.strings
+        top = node
+        # (node, closing)
+        stack = [(node, False)]
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                yield "</" + names[self.tags[node]] + ">"
+            else:
+                piece = "<" + names[self.tags[node]]
+                for name, value in self._attribute_items(node):
+                    piece += f' {name}="{_escape_attrib(value)}"'
+                text = self.texts[node]
+                if text != NONE and values[text] or self.first_children[node] != NONE:
+                    piece += ">"
+                    if text != NONE:
+                        piece += _escape_cdata(values[text])
+                    yield piece
+                    stack.append((node, True))
+                    children = list(self._children(node))
+                    stack.extend((child, False) for child in reversed(children))
+                    continue
+                yield piece + " />"
+            tail = self.tails[node]
+            if tail != NONE and values[tail] and node != top:
+                yield _escape_cdata(values[tail])
+
+    def write(self, filename):
+        """Save the document as UTF-8 XML without building the whole text at once"""
+        from converter import atomic_write
+
+        declaration = '<?xml version="1.0" encoding="utf-8"?>\n'
+        atomic_write(filename, (piece.encode("utf-8") for piece in chain([declaration], self.serialize())))
+
+    def statistics(self):
+        """DocumentStatistics of the attached tree, counted from the arrays without creating views"""
+        from doc_stats import DocumentStatistics
+
+        statistics = DocumentStatistics()
+        root = self.root_index
+        if root == NONE:
+            return statistics
+        tags, parents, attribute_counts = self.tags, self.parents, self.attribute_counts
+        depths = array("i", [0]) * len(self)
+        depth_counts = []
+        tag_counts = Counter()
+        attributes = 0
+        # Preorder reaches a parent before its children, so its depth is already known
+        for node in self._preorder(root):
+            depth = depths[parents[node]] + 1 if node != root else 0
+            depths[node] = depth
+            if depth == len(depth_counts):
+                depth_counts.append(0)
+            depth_counts[depth] += 1
+            tag_counts[tags[node]] += 1
+            attributes += attribute_counts[node]
+        names = self.names.strings
+        statistics.elements = sum(depth_counts)
+        statistics.attributes = attributes
+        statistics.depth_counts = depth_counts
+        statistics.tag_counts = {names[tag]: count for tag, count in tag_counts.items()}
+        return statistics
+
+    def path(self, node):
+        """Nodes from the root down to node, or [] if node is detached"""
+        path = []
+        while node != NONE:
+            path.append(node)
+            node = self.parents[node]
+        if not path or path[-1] != self.root_index:
+            return []
+        path.reverse()
+        return path
+
+    def memory_usage(self):
+        """Approximate bytes held by the arrays and string pools"""
+        arrays = (self.tags, self.texts, self.tails, self.parents, self.first_children,
+                  self.last_children, self.next_siblings, self.previous_siblings, self.child_counts,
+                  self.attribute_starts, self.attribute_counts, self.attribute_names, self.attribute_values)
+        total = sum(sys.getsizeof(values) for values in arrays)
+        for pool in (self.names, self.values):
+            total += sys.getsizeof(pool.strings) + sys.getsizeof(pool.ids)
+            total += sum(sys.getsizeof(string) for string in pool.strings)
+        return total
+
+
+class _Builder:
+    """XMLParser target appending straight into a CompactDocument"""
+
+    def __init__(self, document):
+        self.document = document
+        self.open_nodes = []
+        self.closed = NONE  # the element just closed, whose tail collects data
+        self.pieces = []
+
+    def _flush(self):
+        if not self.pieces:
+            return
+        text = "".join(self.pieces)
+        self.pieces = []
+        document = self.document
+        if self.closed != NONE:
+            document.tails[self.closed] = document.values.add(text)
+        elif self.open_nodes:
+            document.texts[self.open_nodes[-1]] = document.values.add(text)
+
+    def start(self, tag, attrib):
+        self._flush()
+        document = self.document
+        node = document._new_node(tag, attrib)
+        if self.open_nodes:
+            document._link(self.open_nodes[-1], node)
+        else:
+            document.root_index = node
+        self.open_nodes.append(node)
+        self.closed = NONE
+
+    def end(self, tag):
+        self._flush()
+        self.closed = self.open_nodes.pop()
+
+    def data(self, data):
+        # Anything after the root element is dropped, as ElementTree does
+        if self.open_nodes:
+            self.pieces.append(data)
+
+    def close(self):
+        return self.document
+
+
+class CompactIndex:
+    """Stands in for DocumentIndex on a CompactDocument, which isn't indexed for search"""
+
+    def __init__(self, document):
+        self.document = document
+        self.root = document.getroot()
+
+    def update_element(self, element):
+        """Nothing is indexed, so there is nothing to update"""
+
+    def search(self, query, fields=None, prefix=True, limit=None):
+        return []
+
+    def parent(self, element):
+        parent = self.document.parents[element.index]
+        return CompactElement(self.document, parent) if parent != NONE else None
+
+    def path(self, element):
+        """Elements from the root down to element, or [] if it isn't in the document"""
+        if not isinstance(element, CompactElement) or element.document is not self.document:
+            return []
+        return [CompactElement(self.document, node) for node in self.document.path(element.index)]
+
+
+class CompactAttributes(MutableMapping):
+    """Dictionary view of one element's attributes, in document order"""
+
+    __slots__ = ("document", "index")
+
+    def __init__(self, document, index):
+        self.document = document
+        self.index = index
+
+    def __getitem__(self, name):
+        slot = self.document._attribute_slot(self.index, name)
+        if slot is None:
+            raise KeyError(name)
+        return self.document.values.strings[self.document.attribute_values[slot]]
+
+    def __setitem__(self, name, value):
+        self.document._set_attribute(self.index, name, value)
+
+    def __delitem__(self, name):
+        self.document._delete_attribute(self.index, name)
+
+    def __iter__(self):
+        return iter([name for name, value in self.document._attribute_items(self.index)])
+
+    def __len__(self):
+        return self.document.attribute_counts[self.index]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def items(self):
+        return self.document._attribute_items(self.index)
+
+    def clear(self):
+        self.document.attribute_counts[self.index] = 0
+
+
+class CompactElement:
+    """View of one element of a CompactDocument, with the Element API the editor uses"""
+
+    __slots__ = ("document", "index")
+
+    def __init__(self, document, index):
+        self.document = document
+        self.index = index
+
+    def __eq__(self, other):
+        return (isinstance(other, CompactElement) and self.index == other.index
+                and self.document is other.document)
+
+    def __hash__(self):
+        return hash((id(self.document), self.index))
+
+    def __repr__(self):
+        return f"<CompactElement {self.tag!r} #{self.index}>"
+
+    # Fields
+
+    @property
+    def tag(self):
+        return self.document.names.strings[self.document.tags[self.index]]
+
+    @tag.setter
+    def tag(self, value):
+        self.document.tags[self.index] = self.document.names.add(value)
+
+    @property
+    def text(self):
+        return self.document.values.get(self.document.texts[self.index])
+
+    @text.setter
+    def text(self, value):
+        self.document.texts[self.index] = self.document.values.add(value)
+
+    @property
+    def tail(self):
+        return self.document.values.get(self.document.tails[self.index])
+
+    @tail.setter
+    def tail(self, value):
+        self.document.tails[self.index] = self.document.values.add(value)
+
+    @property
+    def attrib(self):
+        return CompactAttributes(self.document, self.index)
+
+    def get(self, key, default=None):
+        slot = self.document._attribute_slot(self.index, key)
+        if slot is None:
+            return default
+        return self.document.values.strings[self.document.attribute_values[slot]]
+
+    def set(self, key, value):
+        self.document._set_attribute(self.index, key, value)
+
+    def keys(self):
+        return [name for name, value in self.items()]
+
+    def items(self):
+        return self.document._attribute_items(self.index)
+
+    # Children
+
+    def __len__(self):
+        return self.document.child_counts[self.index]
+
+    def __bool__(self):
+        # Like Element, but without the deprecation: a view always exists
+        return True
+
+    def __iter__(self):
+        document = self.document
+        return (CompactElement(document, child) for child in document._children(self.index))
+
+    def __reversed__(self):
+        document = self.document
+        previous_siblings = document.previous_siblings
+        child = document.last_children[self.index]
+        while child != NONE:
+            yield CompactElement(document, child)
+            child = previous_siblings[child]
+
+    def _positions(self, key):
+        return range(*key.indices(len(self)))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        return CompactElement(self.document, self.document._child_at(self.index, key))
+
+    def __setitem__(self, key, value):
+        document = self.document
+        if not isinstance(key, slice):
+            old = document._child_at(self.index, key)
+            node = document._adopt(value)
+            if node == old:
+                return
+            document._link(self.index, node, old)
+            document._unlink(old)
+            return
+
+        positions = self._positions(key)
+        new = [document._adopt(element) for element in value]
+        if positions.step != 1:
+            if len(new) != len(positions):
+                raise ValueError(f"attempt to assign sequence of size {len(new)} "
+                                 f"to extended slice of size {len(positions)}")
+            for position, node in zip(positions, new):
+                self[position] = CompactElement(document, node)
+            return
+
+        old = [document._child_at(self.index, position) for position in positions]
+        # Insert before whatever follows the replaced run
+        start = min(positions.start, len(self))
+        before = document._child_at(self.index, start) if start < len(self) else NONE
+        if old:
+            before = document.next_siblings[old[-1]]
+        # Elements being moved can't be the insertion point
+        moving = set(new)
+        while before in moving:
+            before = document.next_siblings[before]
+        for node in old:
+            document._unlink(node)
+        for node in new:
+            document._link(self.index, node, before)
+
+    def __delitem__(self, key):
+        document = self.document
+        if isinstance(key, slice):
+            nodes = [document._child_at(self.index, position) for position in self._positions(key)]
+        else:
+            nodes = [document._child_at(self.index, key)]
+        for node in nodes:
+            document._unlink(node)
+
+    def append(self, element):
+        self.document._link(self.index, self.document._adopt(element))
+
+    def extend(self, elements):
+        for element in elements:
+            self.append(element)
+
+    def insert(self, index, element):
+        document = self.document
+        count = len(self)
+        if index < 0:
+            index = max(index + count, 0)
+        before = document._child_at(self.index, index) if index < count else NONE
+        document._link(self.index, document._adopt(element), before)
+
+    def remove(self, element):
+        if (not isinstance(element, CompactElement) or element.document is not self.document
+                or self.document.parents[element.index] != self.index):
+            raise ValueError("list.remove(x): x not in list")
+        self.document._unlink(element.index)
+
+    def clear(self):
+        """Remove children, attributes, text and tail, as Element.clear does"""
+        document = self.document
+        while document.first_children[self.index] != NONE:
+            document._unlink(document.first_children[self.index])
+        document.attribute_counts[self.index] = 0
+        document.texts[self.index] = document.tails[self.index] = NONE
+
+    def makeelement(self, tag, attrib):
+        return self.document.makeelement(tag, attrib)
+
+    # Searching
+
+    def iter(self, tag=None):
+        """This element and its descendants in document order, optionally only those with tag"""
+        document = self.document
+        wanted = None
+        if tag is not None and tag != "*":
+            wanted = document.names.ids.get(tag)
+            if wanted is None:
+                return
+        tags = document.tags
+        for node in document._preorder(self.index):
+            if wanted is None or tags[node] == wanted:
+                # ElementPath tells the starting element apart by identity
+                yield self if node == self.index else CompactElement(document, node)
+
+    def find(self, path, namespaces=None):
+        return ElementPath.find(self, path, namespaces)
+
+    def findall(self, path, namespaces=None):
+        return ElementPath.findall(self, path, namespaces)
+
+    def iterfind(self, path, namespaces=None):
+        return ElementPath.iterfind(self, path, namespaces)
+
+    def findtext(self, path, default=None, namespaces=None):
+        return ElementPath.findtext(self, path, default, namespaces)
@@ -16,6 +16,11 @@ SUPPORTED_EXTENSIONS = [
     ".rml"         # Binary-like XML format
 ]
 
+# Binary object files, decoded with the class definitions in tools/projects
+BINARY_OBJECT_EXTENSIONS = [
+    ".fcb"
+]
+
 # Exclusions (files that should not be converted)
 EXCLUDED_FILES = [
     "_depload.xml",
@@ -38,6 +43,7 @@ TREE_DEFAULT_WIDTH = 300
 DETAILS_DEFAULT_WIDTH = 400
 ATTRIBUTE_COLUMN_WIDTH = 150
 VALUE_COLUMN_WIDTH = 250
+TREE_PAGE_SIZE = 1000  # Children inserted per expand before a "more" item
 
 # Syntax highlighting colors
 SYNTAX_COLORS = {
@@ -68,7 +74,25 @@ EDITOR_SETTINGS = {
     "xml_encoding": "utf-8",
     "xml_declaration": True,
     "max_undo_levels": 50,
-    "auto_save_interval": 5  # minutes
+    "max_undo_memory_mb": 64,  # undo history is trimmed oldest-first beyond this
+    "undo_coalesce_seconds": 1.0,  # keystrokes closer together than this undo as one step
+    "auto_save_interval": 5,  # minutes between autosave snapshots, 0 disables autosave
+    # Delay in ms before coalesced UI updates run after the last edit (0 = next idle moment)
+    "ui_update_intervals": {
+        "tree_item": 0,
+        "title": 0,
+        "source": 150,
+        "statistics": 1000,
+        "journal": 0
+    }
+}
+
+# XML parser backend settings
+PARSER_SETTINGS = {
+    "backend": "auto",        # "auto", "etree", "iterparse", "lxml" (needs lxml) or "compact"
+    "iterparse_min_mb": 8,    # "auto": files this large are counted and indexed while parsing
+    "prefer_lxml": False,     # "auto": use lxml when installed (adds line numbers)
+    "compact_min_mb": 256     # "auto": files this large open in the compact model (0: never)
 }
 
 # Search settings
@@ -76,7 +100,39 @@ SEARCH_SETTINGS = {
     "case_sensitive_default": False,
     "highlight_all_matches": True,
     "wrap_around": True,
-    "max_results": 100
+    "max_results": 100,  # 0 = no limit
+    "batch_size": 200    # Matches highlighted per UI update while searching
+}
+
+# Conversion cache settings
+CACHE_SETTINGS = {
+    "enabled": True,
+    "directory": None,  # None = ~/.avatar_xml_editor/cache
+    "max_size_mb": 512
+}
+
+# Persistent converter worker settings
+WORKER_POOL_SETTINGS = {
+    "enabled": True,
+    "workers": 1,
+    "backend": "native",     # "native" or "exe"
+    "base_timeout": 10,      # seconds
+    "timeout_per_mb": 2,     # extra seconds per MB of input
+    "max_restarts": 3,       # restarts allowed per worker...
+    "restart_window": 60     # ...within this many seconds
+}
+
+# Conversion instrumentation settings
+INSTRUMENTATION_SETTINGS = {
+    "jsonl_path": None,        # Append every conversion event to this file
+    "ring_buffer_size": 1000   # Recent events kept in memory (0 = off)
+}
+
+# Batch conversion settings
+BATCH_SETTINGS = {
+    "workers": 0,  # 0 = one per CPU
+    "manifest_name": "conversion_manifest.jsonl",
+    "progress_every": 1
 }
 
 def get_tools_path():
@@ -95,6 +151,16 @@ def get_tools_path():
     # Return default even if it doesn't exist (will be handled by converter)
     return DEFAULT_TOOLS_PATH
 
+def is_supported_file(file_path):
+    """Check if a file has one of the supported extensions"""
+    filename = os.path.basename(file_path).lower()
+    return any(filename.endswith(ext) for ext in SUPPORTED_EXTENSIONS)
+
+def is_excluded_file(file_path):
+    """Check if a file matches one of the conversion exclusions"""
+    filename = os.path.basename(file_path)
+    return any(excluded in filename for excluded in EXCLUDED_FILES)
+
 def validate_tools_directory(tools_path):
     """Validate that the tools directory contains required files"""
     if not os.path.exists(tools_path):
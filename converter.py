@@ -1,17 +1,74 @@
+import logging
 import os
-import subprocess
 import shutil
+import subprocess
+import tempfile
+import time
 import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+import fcb
+import rml
+from cache import ConversionCache
+from config import CACHE_SETTINGS
+from instrumentation import (OUTCOME_ALREADY_READABLE, OUTCOME_CACHED, OUTCOME_EXCLUDED,
+                             OUTCOME_FAILED, OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_UNAVAILABLE,
+                             create_default_instrumentation)
+from sniffer import FORMAT_RML, FORMAT_XML, sniff_file
+from worker_pool import WorkerTimeoutError, convert_exe, scaled_timeout
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(file_path, data):
+    """Write data (bytes, or an iterable of bytes chunks) to a temp file next to file_path and rename it into place"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                f.writelines(data)
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 class GameXMLConverter:
     """Handles conversion of XML and .game.xml files between formats"""
     
-    def __init__(self, tools_path="tools"):
+    def __init__(self, tools_path="tools", prefer_native=True, cache=None, pool=None,
+                 instrumentation=None):
         """Initialize the converter with paths to conversion tools"""
         self.tools_path = tools_path
         self.xml_converter_path = os.path.join(tools_path, "Gibbed.Dunia.ConvertXml.exe")
         
+        # Use the in-process RML codec first, the .exe is only a fallback
+        self.prefer_native = prefer_native
+        
+        # Conversion results keyed by input hash ("hit"/"miss" of the last call)
+        if cache is None and CACHE_SETTINGS["enabled"]:
+            cache = ConversionCache(CACHE_SETTINGS["directory"], CACHE_SETTINGS["max_size_mb"])
+        self.cache = cache
+        self.last_cache_result = None
+        
+        # Optional ConverterWorkerPool that runs the codec out of process
+        self.pool = pool
+        
+        # Seconds spent in each stage of the last conversion, and where events go
+        self.last_timings = {}
+        self.last_bytes = (0, 0)
+        self.last_outcome = None
+        self.instrumentation = instrumentation or create_default_instrumentation()
+        
+        # Compiled binary_classes.xml, loaded the first time an .fcb file is opened
+        self._class_definitions = None
+        
         # Excluded files that should not be converted
         self.excluded_files = [
             "_depload.xml",
@@ -41,7 +98,8 @@ class GameXMLConverter:
                 self.missing_dlls.append(dll)
         
         # Determine if conversion is possible
-        self.can_convert = self.xml_converter_exists and not self.missing_dlls
+        self.exe_available = self.xml_converter_exists and not self.missing_dlls
+        self.can_convert = self.prefer_native or self.exe_available
         
         if not self.can_convert:
             print(f"WARNING: Conversion disabled due to missing dependencies")
@@ -59,115 +117,77 @@ class GameXMLConverter:
         return False
     
     def is_file_xml_format(self, file_path):
-        """Check if a file is in readable XML format"""
+        """Check if a file is in readable XML format (from its first bytes only)"""
+        return sniff_file(file_path) == FORMAT_XML
+    
+    def is_file_binary_format(self, file_path):
+        """Check if a file starts like binary RML data"""
+        return sniff_file(file_path) == FORMAT_RML
+    
+    def readable_output_path(self, file_path):
+        """Get the path the readable XML for a binary file is written to"""
+        base, ext = os.path.splitext(file_path)
+        if ext == '.rml':
+            # For .rml files, create corresponding .xml file
+            return base + '.xml'
+        if ext == '.xml':
+            return file_path
+        return file_path.replace(ext, '.xml')
+    
+    @contextmanager
+    def stage(self, name):
+        """Time one stage of a conversion into last_timings"""
+        start = time.perf_counter()
         try:
-            ET.parse(file_path)
-            return True
-        except ET.ParseError:
-            return False
+            yield
+        finally:
+            self.last_timings[name] = self.last_timings.get(name, 0.0) + time.perf_counter() - start
+    
+    def begin_conversion(self):
+        """Reset per-conversion measurements"""
+        self.last_timings = {}
+        self.last_bytes = (0, 0)
+        self.last_outcome = None
+        self.last_cache_result = None
+    
+    def finish_conversion(self, file_path, direction, outcome):
+        """Emit the instrumentation event for the conversion that just ended"""
+        self.last_outcome = outcome
+        self.instrumentation.emit(file_path, direction, outcome, self.last_timings, *self.last_bytes)
     
     def convert_to_readable(self, file_path):
         """Convert file to readable XML format"""
-        if not self.can_convert:
-            return False, "Conversion tools not available"
-        
-        # Skip excluded files
-        if self.should_exclude_file(file_path):
-            return False, f"File {file_path} is excluded from conversion"
-        
+        self.begin_conversion()
+        outcome = OUTCOME_FAILED
         try:
-            # Check if already readable
-            if self.is_file_xml_format(file_path):
-                return True, "File is already in readable XML format"
+            if not self.can_convert:
+                outcome = OUTCOME_UNAVAILABLE
+                return False, "Conversion tools not available"
             
-            print(f"DEBUG: Converting file: {file_path}")
+            # Skip excluded files
+            if self.should_exclude_file(file_path):
+                outcome = OUTCOME_EXCLUDED
+                return False, f"File {file_path} is excluded from conversion"
             
-            # Determine conversion paths
-            base, ext = os.path.splitext(file_path)
-            print(f"DEBUG: Base: {base}, Extension: {ext}")
+            # Check if already readable
+            with self.stage("sniff"):
+                if self.is_file_xml_format(file_path):
+                    outcome = OUTCOME_ALREADY_READABLE
+                    return True, "File is already in readable XML format"
             
-            if ext == '.rml':
-                # For .rml files, create corresponding .xml file
-                xml_path = base + '.xml'
-                rml_path = file_path
-            elif ext == '.game.xml':
-                rml_path = base + '.rml'
-                xml_path = file_path
-            elif ext == '.xml':
-                rml_path = base + '.rml'
-                xml_path = file_path
-            else:
-                rml_path = file_path + '.rml'
-                xml_path = file_path.replace(ext, '.xml')
+            xml_path = self.readable_output_path(file_path)
+            output, cached = self.convert_file_bytes(file_path, "readable")
             
-            print(f"DEBUG: RML path: {rml_path}")
-            print(f"DEBUG: XML path: {xml_path}")
+            # Single atomic rename, the original stays intact until the output is complete
+            with self.stage("write"):
+                atomic_write(xml_path, output)
             
-            # For .rml files, we don't need to backup/move - just convert directly
-            if ext == '.rml':
-                # Use absolute paths with forward slashes
-                abs_rml_path = os.path.abspath(rml_path).replace("\\", "/")
-                abs_xml_path = os.path.abspath(xml_path).replace("\\", "/")
-                
-                print(f"DEBUG: Converting RML to XML")
-                print(f"DEBUG: Command: {self.xml_converter_path} --xml {abs_rml_path} {abs_xml_path}")
-                
-                # Run conversion
-                process = subprocess.run(
-                    [self.xml_converter_path, "--xml", abs_rml_path, abs_xml_path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=30
-                )
-                
-                print(f"DEBUG: Return code: {process.returncode}")
-                print(f"DEBUG: Stdout: {process.stdout}")
-                print(f"DEBUG: Stderr: {process.stderr}")
-                
-                # Check conversion result
-                if process.returncode != 0:
-                    return False, f"Conversion failed: {process.stderr}"
-                
-                # Check if output file was created
-                if not os.path.exists(xml_path):
-                    return False, f"Conversion appeared to succeed but output file not found: {xml_path}"
-                
-                return True, f"Successfully converted RML to readable XML: {abs_xml_path}"
-            
-            else:
-                # Original logic for .game.xml files
-                # Backup original file
-                if os.path.exists(rml_path):
-                    os.remove(rml_path)
-                shutil.move(file_path, rml_path)
+            outcome = OUTCOME_CACHED if cached else OUTCOME_OK
+            source = " (cached)" if cached else ""
+            return True, f"Successfully converted to readable XML format{source}: {os.path.abspath(xml_path)}"
                 
-                # Use absolute paths with forward slashes
-                abs_rml_path = os.path.abspath(rml_path).replace("\\", "/")
-                abs_xml_path = os.path.abspath(xml_path).replace("\\", "/")
-                
-                # Run conversion
-                process = subprocess.run(
-                    [self.xml_converter_path, "--xml", abs_rml_path, abs_xml_path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=30
-                )
-                
-                # Check conversion result
-                if process.returncode != 0:
-                    # Restore original file on failure
-                    shutil.move(rml_path, file_path)
-                    return False, f"Conversion failed: {process.stderr}"
-                
-                # Clean up intermediate file
-                if os.path.exists(rml_path):
-                    os.remove(rml_path)
-                
-                return True, f"Successfully converted to readable XML format: {abs_xml_path}"
-                
-        except subprocess.TimeoutExpired:
+        except (subprocess.TimeoutExpired, WorkerTimeoutError):
+            outcome = OUTCOME_TIMEOUT
             return False, "Conversion timed out - file may be too large or corrupted"
         except FileNotFoundError as e:
             return False, f"File not found: {str(e)}"
@@ -175,54 +195,132 @@ class GameXMLConverter:
             return False, f"Permission denied: {str(e)}"
         except Exception as e:
             return False, f"Error during conversion: {str(e)}"
+        finally:
+            self.finish_conversion(file_path, "readable", outcome)
+    
+    def convert_file_bytes(self, file_path, direction):
+        """Read a file and convert its bytes in memory, returning (output, cached)"""
+        with self.stage("read"):
+            with open(file_path, "rb") as f:
+                data = f.read()
         
-    def save_as_binary(self, file_path):
-        """Convert readable XML back to binary format"""
-        if not self.can_convert:
-            return False, "Conversion tools not available"
+        self.last_bytes = (len(data), 0)
+        
+        # Reuse a previous conversion of identical input
+        with self.stage("cache"):
+            cache_key, output = self.cache_lookup(data, direction)
+        cached = output is not None
         
-        # Skip excluded files
-        if self.should_exclude_file(file_path):
-            return False, f"File {file_path} is excluded from conversion"
+        if not cached:
+            output = self.convert_bytes(direction, data)
+            with self.stage("cache"):
+                self.cache_store(cache_key, output)
+        
+        self.last_bytes = (len(data), len(output))
+        return output, cached
+    
+    def convert_bytes(self, direction, data):
+        """Convert bytes to "readable" XML or "binary" RML, falling back to the .exe"""
+        if self.prefer_native:
+            try:
+                with self.stage("convert"):
+                    if direction == "readable":
+                        return self.decode_to_xml(data)
+                    return self.encode_to_rml(data)
+            except rml.RMLFormatError as e:
+                if not self.exe_available:
+                    raise
+                logger.debug("Native decode failed (%s), falling back to %s", e, self.xml_converter_path)
+        
+        if not self.exe_available:
+            raise RuntimeError("Conversion tools not available")
+        
+        # The tool only works on files, so give it anonymous temp files
+        with self.stage("spawn"):
+            return convert_exe(direction, data, self.xml_converter_path, timeout=self.timeout_for(len(data)))
+    
+    def timeout_for(self, size):
+        """Seconds a conversion of size bytes may take, scaled like the worker pool's"""
+        if self.pool is not None:
+            return self.pool.timeout_for(size)
+        return scaled_timeout(size)
+    
+    def decode_to_xml(self, data):
+        """Decode binary RML bytes into readable XML bytes with the native codec"""
+        if self.pool is not None:
+            return self.pool.convert("readable", data)
+        return rml.to_xml_bytes(rml.decode(data))
+    
+    def encode_to_rml(self, data):
+        """Encode readable XML bytes into binary RML bytes with the native codec"""
+        if self.pool is not None:
+            return self.pool.convert("binary", data)
+        return rml.encode(ET.fromstring(data))
+    
+    def class_definitions(self):
+        """Get the compiled .fcb class definitions, empty when the schema is missing"""
+        if self._class_definitions is None:
+            schema_path = fcb.default_schema_path(self.tools_path)
+            try:
+                self._class_definitions = fcb.load_definitions(schema_path)
+            except (OSError, ET.ParseError) as e:
+                logger.warning("Binary class definitions unavailable (%s): %s", schema_path, e)
+                self._class_definitions = fcb.ClassDefinitions()
+        return self._class_definitions
+    
+    def read_binary_object(self, file_path):
+        """Decode an .fcb file into (root_element, flags)"""
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return fcb.decode_document(data, self.class_definitions())
+    
+    def write_binary_object(self, file_path, root, flags=0):
+        """Encode an <object> tree and atomically replace the .fcb file"""
+        atomic_write(file_path, fcb.encode(root, flags))
+    
+    def cache_lookup(self, data, direction):
+        """Look up a previous conversion of data, returning (key, cached_bytes)"""
+        self.last_cache_result = None
+        if self.cache is None:
+            return None, None
         
+        key = self.cache.make_key(data, direction)
+        cached = self.cache.get(key)
+        self.last_cache_result = "miss" if cached is None else "hit"
+        return key, cached
+    
+    def cache_store(self, key, output):
+        """Store a conversion result in the cache"""
+        if self.cache is not None and key is not None:
+            self.cache.put(key, output)
+    
+    def save_as_binary(self, file_path):
+        """Convert readable XML back to binary format"""
+        self.begin_conversion()
+        outcome = OUTCOME_FAILED
         try:
-            # Create backup of readable XML - REMOVED THIS PART
-            # backup_path = file_path + ".readable.bak"
-            # shutil.copy2(file_path, backup_path)
-            
-            # Determine conversion paths
-            base, ext = os.path.splitext(file_path)
-            if ext == '.game.xml':
-                rml_path = base + '.rml'
-            elif ext == '.xml':
-                rml_path = base + '.rml'
-            else:
-                rml_path = file_path + '.rml'
+            if not self.can_convert:
+                outcome = OUTCOME_UNAVAILABLE
+                return False, "Conversion tools not available"
             
-            # Use absolute paths with forward slashes
-            abs_xml_path = os.path.abspath(file_path).replace("\\", "/")
-            abs_rml_path = os.path.abspath(rml_path).replace("\\", "/")
+            # Skip excluded files
+            if self.should_exclude_file(file_path):
+                outcome = OUTCOME_EXCLUDED
+                return False, f"File {file_path} is excluded from conversion"
             
-            # Run conversion
-            process = subprocess.run(
-                [self.xml_converter_path, "--rml", abs_xml_path, abs_rml_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=30
-            )
+            output, cached = self.convert_file_bytes(file_path, "binary")
             
-            # Check conversion result
-            if process.returncode != 0:
-                return False, f"Conversion to binary failed: {process.stderr}"
-            
-            # Replace original with binary version
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            shutil.move(rml_path, file_path)
-            
-            # Modified success message to not mention readable backup
-            return True, f"Successfully saved as binary format."
+            # Replace original with binary version in one rename
+            with self.stage("write"):
+                atomic_write(file_path, output)
             
+            outcome = OUTCOME_CACHED if cached else OUTCOME_OK
+            return True, "Successfully saved as binary format."
+        
+        except (subprocess.TimeoutExpired, WorkerTimeoutError):
+            outcome = OUTCOME_TIMEOUT
+            return False, "Conversion to binary timed out - file may be too large or corrupted"
         except Exception as e:
-            return False, f"Error during save: {str(e)}"
\ No newline at end of file
+            return False, f"Error during save: {str(e)}"
+        finally:
+            self.finish_conversion(file_path, "binary", outcome)
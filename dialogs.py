@@ -1,3 +1,4 @@
+import time
 import tkinter as tk
 from tkinter import messagebox, ttk
 
@@ -65,3 +66,152 @@ class AttributeEditDialog:
         """Handle Cancel button click"""
         self.dialog.destroy()
 
+
+
+class FindDialog:
+    """Non-modal find-in-tree panel backed by the document index"""
+    
+    # (label, index fields searched)
+    SCOPES = [
+        ("Everything", ("tag", "attribute", "value", "text")),
+        ("Tag names", ("tag",)),
+        ("Attribute names", ("attribute",)),
+        ("Attribute values", ("value",)),
+        ("Element text", ("text",))
+    ]
+    
+    def __init__(self, parent, search, on_select, max_results=500):
+        """search(query, fields, prefix, limit) returns elements; on_select(element) jumps to one"""
+        self.search = search
+        self.on_select = on_select
+        self.max_results = max_results
+        self.results = []
+        self.pending = None
+        
+        # Create dialog window
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Find in Tree")
+        self.dialog.geometry("520x420")
+        self.dialog.transient(parent)
+        
+        # Position the dialog
+        self.dialog.geometry("+%d+%d" % (parent.winfo_rootx() + 80, parent.winfo_rooty() + 80))
+        
+        main_frame = ttk.Frame(self.dialog)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Query
+        ttk.Label(main_frame, text="Find:").grid(row=0, column=0, sticky="w", pady=5)
+        self.query_var = tk.StringVar()
+        self.query_entry = ttk.Entry(main_frame, textvariable=self.query_var, width=40)
+        self.query_entry.grid(row=0, column=1, columnspan=2, sticky="ew", pady=5)
+        self.query_entry.focus()
+        
+        # Scope and match mode
+        ttk.Label(main_frame, text="In:").grid(row=1, column=0, sticky="w", pady=5)
+        self.scope_var = tk.StringVar(value=self.SCOPES[0][0])
+        scope_box = ttk.Combobox(main_frame, textvariable=self.scope_var, state="readonly",
+                                 values=[label for label, fields in self.SCOPES], width=20)
+        scope_box.grid(row=1, column=1, sticky="w", pady=5)
+        self.prefix_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(main_frame, text="Match word prefixes", variable=self.prefix_var,
+                        command=self.schedule_search).grid(row=1, column=2, sticky="w", pady=5)
+        
+        # Results
+        results_frame = ttk.Frame(main_frame)
+        results_frame.grid(row=2, column=0, columnspan=3, sticky="nsew", pady=5)
+        self.results_tree = ttk.Treeview(results_frame, columns=("details",), show="tree headings",
+                                         selectmode="browse")
+        self.results_tree.heading("#0", text="Element")
+        self.results_tree.heading("details", text="Attributes / text")
+        self.results_tree.column("#0", width=160)
+        self.results_tree.column("details", width=300)
+        results_scroll = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_tree.yview)
+        self.results_tree.configure(yscrollcommand=results_scroll.set)
+        self.results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        results_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Status and buttons
+        self.status_label = ttk.Label(main_frame, text="Type to search tags, attributes and values")
+        self.status_label.grid(row=3, column=0, columnspan=2, sticky="w")
+        ttk.Button(main_frame, text="Close", command=self.close).grid(row=3, column=2, sticky="e")
+        
+        # Configure grid
+        main_frame.grid_columnconfigure(1, weight=1)
+        main_frame.grid_rowconfigure(2, weight=1)
+        
+        # Search as you type, jump on Enter/double-click
+        self.query_var.trace_add("write", lambda *args: self.schedule_search())
+        scope_box.bind("<<ComboboxSelected>>", lambda e: self.schedule_search())
+        self.results_tree.bind("<Double-1>", lambda e: self.jump_to_selected())
+        self.results_tree.bind("<Return>", lambda e: self.jump_to_selected())
+        self.query_entry.bind("<Return>", lambda e: self.jump_to_first())
+        self.dialog.bind('<Escape>', lambda e: self.close())
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+    
+    def is_open(self):
+        """Check if the dialog window still exists"""
+        return bool(self.dialog.winfo_exists())
+    
+    def show(self):
+        """Bring an existing dialog back to the front"""
+        self.dialog.deiconify()
+        self.dialog.lift()
+        self.query_entry.focus_set()
+        self.query_entry.select_range(0, tk.END)
+    
+    def schedule_search(self):
+        """Search shortly after typing pauses"""
+        if self.pending is not None:
+            self.dialog.after_cancel(self.pending)
+        self.pending = self.dialog.after(150, self.run_search)
+    
+    def run_search(self):
+        """Query the index and list the results"""
+        self.pending = None
+        query = self.query_var.get().strip()
+        self.results_tree.delete(*self.results_tree.get_children())
+        self.results = []
+        if not query:
+            self.status_label.config(text="Type to search tags, attributes and values")
+            return
+        
+        fields = dict(self.SCOPES)[self.scope_var.get()]
+        started = time.perf_counter()
+        self.results = self.search(query, fields, self.prefix_var.get(), self.max_results + 1)
+        elapsed = (time.perf_counter() - started) * 1000
+        
+        more = len(self.results) > self.max_results
+        self.results = self.results[:self.max_results]
+        for position, element in enumerate(self.results):
+            details = " ".join(f'{name}="{value}"' for name, value in element.attrib.items())
+            if not details and element.text and element.text.strip():
+                details = element.text.strip()
+            self.results_tree.insert("", "end", iid=str(position), text=element.tag,
+                                     values=(details[:200],))
+        
+        count = f"first {self.max_results}" if more else f"{len(self.results)}"
+        self.status_label.config(text=f"{count} matches ({elapsed:.1f} ms)" if self.results else "No matches found")
+    
+    def jump_to_selected(self):
+        """Show the selected result in the editor tree"""
+        selection = self.results_tree.selection()
+        if selection:
+            self.on_select(self.results[int(selection[0])])
+    
+    def jump_to_first(self):
+        """Run any pending search and show its first result"""
+        if self.pending is not None:
+            self.dialog.after_cancel(self.pending)
+            self.run_search()
+        if self.results:
+            self.results_tree.selection_set("0")
+            self.results_tree.focus("0")
+            self.on_select(self.results[0])
+    
+    def close(self):
+        """Close the dialog"""
+        if self.pending is not None:
+            self.dialog.after_cancel(self.pending)
+            self.pending = None
+        self.dialog.destroy()
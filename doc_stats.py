@@ -0,0 +1,117 @@
+"""
+Document statistics kept current by deltas
+
+DocumentStatistics counts elements, attributes, elements per tag and
+elements per depth in one traversal when a document is loaded. Edits then
+adjust the counts directly instead of walking the document again, and the
+tags whose counts moved are remembered so the Statistics tab only has to
+update those rows.
+"""
+
+import os
+import time
+
+
+class DocumentStatistics:
+    """Element, attribute, depth and tag counts for one document"""
+
+    def __init__(self, root=None, filename=None):
+        self.elements = 0
+        self.attributes = 0
+        self.tag_counts = {}    # tag -> number of elements
+        self.depth_counts = []  # depth -> number of elements at that depth
+        self.changed_tags = set()
+        self.file_size = None
+        self.modified = None    # struct_time of the file's last modification
+        if root is not None:
+            self.build(root)
+        if filename:
+            self.read_file(filename)
+
+    @property
+    def max_depth(self):
+        """Depth of the deepest element below the root (0 for a lone root)"""
+        return max(len(self.depth_counts) - 1, 0)
+
+    def read_file(self, filename):
+        """Refresh the file size and modification time"""
+        if filename and os.path.exists(filename):
+            self.file_size = os.path.getsize(filename)
+            self.modified = time.localtime(os.path.getmtime(filename))
+        else:
+            self.file_size = self.modified = None
+
+    def build(self, root):
+        """Count a whole document in a single pass"""
+        self.elements = self.attributes = 0
+        self.tag_counts = {}
+        self.depth_counts = []
+        self.changed_tags = set()
+        self._count(root, 0, 1)
+        # A full count replaces every row anyway
+        self.changed_tags.clear()
+
+    def _count(self, element, depth, sign):
+        # Level by level: each level is one list, so depths come for free
+        depth_counts = self.depth_counts
+        elements = attributes = 0
+        tags = {}
+        level = [element]
+        while level:
+            if depth == len(depth_counts):
+                depth_counts.append(0)
+            depth_counts[depth] += sign * len(level)
+            elements += len(level)
+            for node in level:
+                attributes += len(node.attrib)
+                tags[node.tag] = tags.get(node.tag, 0) + 1
+            level = [child for node in level for child in node]
+            depth += 1
+
+        self.elements += sign * elements
+        self.attributes += sign * attributes
+        for tag, count in tags.items():
+            self._add_tag(tag, sign * count)
+        while depth_counts and not depth_counts[-1]:
+            depth_counts.pop()
+
+    def _add_tag(self, tag, delta):
+        count = self.tag_counts.get(tag, 0) + delta
+        if count > 0:
+            self.tag_counts[tag] = count
+        else:
+            self.tag_counts.pop(tag, None)
+        self.changed_tags.add(tag)
+
+    def add_element(self, element, depth):
+        """Count one element (not its descendants) at depth, e.g. as it is parsed"""
+        depth_counts = self.depth_counts
+        while len(depth_counts) <= depth:
+            depth_counts.append(0)
+        depth_counts[depth] += 1
+        self.elements += 1
+        self.attributes += len(element.attrib)
+        self._add_tag(element.tag, 1)
+
+    def add_subtree(self, element, depth):
+        """Count an element (and its descendants) inserted at depth"""
+        self._count(element, depth, 1)
+
+    def remove_subtree(self, element, depth):
+        """Uncount an element (and its descendants) removed from depth"""
+        self._count(element, depth, -1)
+
+    def change_attributes(self, delta):
+        """Account for attributes added (delta > 0) or removed (delta < 0)"""
+        self.attributes += delta
+
+    def change_tag(self, old_tag, new_tag):
+        """Account for an element renamed from old_tag to new_tag"""
+        if old_tag != new_tag:
+            self._add_tag(old_tag, -1)
+            self._add_tag(new_tag, 1)
+
+    def take_changed_tags(self):
+        """Tags whose counts changed since the last call"""
+        changed, self.changed_tags = self.changed_tags, set()
+        return changed
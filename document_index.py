@@ -0,0 +1,208 @@
+"""
+Inverted index over a document for instant element search
+
+Tag names, attribute names, attribute values and element text are split
+into lowercase word tokens, and each token maps to the set of elements it
+occurs in. A query is split the same way;
+every query token must match an indexed key exactly or as a prefix, and
+results come back in document order.
+"""
+
+import gc
+import heapq
+import re
+from bisect import bisect_left
+from functools import lru_cache
+
+FIELD_TAG = "tag"
+FIELD_ATTRIBUTE = "attribute"
+FIELD_VALUE = "value"
+FIELD_TEXT = "text"
+FIELDS = (FIELD_TAG, FIELD_ATTRIBUTE, FIELD_VALUE, FIELD_TEXT)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def index_keys(text):
+    """Lowercase keys a string is indexed under: its word tokens, or the whole string if it has none"""
+    lowered = text.lower().strip()
+    if lowered.isidentifier() or lowered.isdigit():
+        return (lowered,)
+    if not lowered:
+        return ()
+    return tuple(set(_TOKEN_RE.findall(lowered))) or (lowered,)
+
+
+# Tags and attribute names repeat constantly, values mostly don't
+_name_keys = lru_cache(maxsize=4096)(index_keys)
+
+
+class DocumentIndex:
+    """Maps tag/attribute/value/text keys to elements, kept current by update_element"""
+
+    def __init__(self, root=None):
+        self._reset()
+        if root is not None:
+            self.build(root)
+
+    def _reset(self):
+        self.postings = {field: {} for field in FIELDS}  # field -> key -> set of elements
+        self._sorted_keys = {}  # field -> sorted keys, rebuilt after keys are added or removed
+        self._entries = {}      # element -> [field, key, field, key, ...] it is indexed under
+        self._order = {}        # element -> document position, for sorting results
+        self._parents = {}      # element -> parent element
+        self._next_order = 0
+        self.root = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def build(self, root):
+        """Index a whole document, replacing anything indexed before"""
+        self._reset()
+
+        # Building creates a container per key; pausing the cycle collector
+        # while they pile up makes this noticeably faster
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self.add_subtree(root, None)
+        finally:
+            if collecting:
+                gc.enable()
+        self.finish(root)
+
+    def finish(self, root):
+        """Complete an index filled element by element, e.g. while parsing"""
+        self.root = root
+        # Sort the keys now so the first prefix search is as fast as the rest
+        for field in FIELDS:
+            self._keys(field)
+
+    def add_subtree(self, element, parent):
+        """Index element and its descendants in document order"""
+        stack = [(element, parent)]
+        while stack:
+            node, node_parent = stack.pop()
+            self._parents[node] = node_parent
+            self._order[node] = self._next_order
+            self._next_order += 1
+            self.add_element(node)
+            stack.extend((child, node) for child in reversed(node))
+
+    def add_node(self, element, parent):
+        """Place one element after those added so far; add_element() indexes it once its text is known"""
+        self._parents[element] = parent
+        self._order[element] = self._next_order
+        self._next_order += 1
+
+    def remove_subtree(self, element):
+        """Forget element and its descendants"""
+        stack = [element]
+        while stack:
+            node = stack.pop()
+            self.remove_element(node)
+            self._parents.pop(node, None)
+            self._order.pop(node, None)
+            stack.extend(node)
+
+    def add_element(self, element):
+        """Index one element's tag, attributes and text"""
+        # Postings sets this element was added to, kept so it can be removed exactly
+        entries = []
+        postings = self.postings
+
+        def add(field, keys):
+            field_postings = postings[field]
+            for key in keys:
+                elements = field_postings.get(key)
+                if elements is None:
+                    field_postings[key] = elements = set()
+                    self._sorted_keys.pop(field, None)
+                elif element in elements:
+                    continue
+                elements.add(element)
+                entries.append(field)
+                entries.append(key)
+
+        if isinstance(element.tag, str):
+            add(FIELD_TAG, _name_keys(element.tag))
+        for name, value in element.attrib.items():
+            add(FIELD_ATTRIBUTE, _name_keys(name))
+            add(FIELD_VALUE, index_keys(value))
+        if element.text:
+            add(FIELD_TEXT, index_keys(element.text))
+        self._entries[element] = entries
+
+    def remove_element(self, element):
+        """Remove one element's keys from the index"""
+        entries = self._entries.pop(element, ())
+        for position in range(0, len(entries), 2):
+            field, key = entries[position], entries[position + 1]
+            postings = self.postings[field]
+            elements = postings.get(key)
+            if elements is None:
+                continue
+            elements.discard(element)
+            if not elements:
+                del postings[key]
+                self._sorted_keys.pop(field, None)
+
+    def update_element(self, element):
+        """Re-index an element after its tag, attributes or text changed"""
+        self.remove_element(element)
+        self.add_element(element)
+
+    def _keys(self, field):
+        keys = self._sorted_keys.get(field)
+        if keys is None:
+            keys = self._sorted_keys[field] = sorted(self.postings[field])
+        return keys
+
+    def lookup(self, term, fields=FIELDS, prefix=True):
+        """Elements with a key equal to (or starting with) term in any of fields"""
+        found = set()
+        for field in fields:
+            postings = self.postings[field]
+            if not prefix:
+                found |= postings.get(term, set())
+                continue
+            keys = self._keys(field)
+            position = bisect_left(keys, term)
+            while position < len(keys) and keys[position].startswith(term):
+                found |= postings[keys[position]]
+                position += 1
+        return found
+
+    def search(self, query, fields=FIELDS, prefix=True, limit=None):
+        """Elements matching every word of query, in document order"""
+        lowered = query.lower().strip()
+        words = set(_TOKEN_RE.findall(lowered)) or ({lowered} if lowered else set())
+        if not words:
+            return []
+
+        results = None
+        for term in sorted(words, key=len, reverse=True):
+            found = self.lookup(term, fields, prefix)
+            results = found if results is None else results & found
+            if not results:
+                return []
+
+        position = self._order.get
+        if limit:
+            return heapq.nsmallest(limit, results, key=lambda element: position(element, 0))
+        return sorted(results, key=lambda element: position(element, 0))
+
+    def parent(self, element):
+        return self._parents.get(element)
+
+    def path(self, element):
+        """Elements from the root down to element, or [] if it isn't indexed"""
+        if element not in self._parents:
+            return []
+        path = []
+        while element is not None:
+            path.append(element)
+            element = self._parents.get(element)
+        path.reverse()
+        return path
@@ -0,0 +1,506 @@
+"""
+Native reader/writer for Dunia BinaryObjectFile (.fcb) data
+
+Layout (all integers little endian):
+    u32     magic "nbCF"
+    u16     version (3)
+    u16     flags (preserved on round trips)
+    u32     total object count
+    u32     total value count
+    object  root object
+
+An object is:
+    count   child count
+    u32     class name hash
+    count   value count
+    values  u32 name hash, count size, then that many bytes
+    objects the children
+
+A count is a single byte when below 0xFE, otherwise 0xFF followed by a u32.
+0xFE followed by a u32 is a back reference: the value or object is stored
+that many bytes before the start of the count, which lets the game share
+identical data. References are expanded when reading and never written.
+
+Value bytes are untyped in the file. binary_classes.xml names the classes
+and members (by CRC32 of the name, or by an explicit hash) and gives each
+member a type, which is used to turn values into editable text:
+
+    <object name="Entity">
+      <field name="hidName" type="String">tree01</field>
+      <field hash="1A2B3C4D" type="BinHex">00FF</field>
+      <object hash="E0BDB3DB">...</object>
+    </object>
+
+Anything that does not match its declared type is kept as BinHex, so
+decoding and re-encoding never loses data.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+
+import rml
+
+FCB_MAGIC = b"nbCF"
+FCB_VERSION = 3
+
+# Bump when the layout of the compiled class definitions changes
+SCHEMA_CACHE_VERSION = 1
+
+TYPE_BINHEX = "BinHex"
+
+_COUNT_OFFSET = 0xFE
+_COUNT_LARGE = 0xFF
+
+_VECTOR_SIZES = {"Vector2": 2, "Vector3": 3, "Vector4": 4}
+_SCALAR_FORMATS = {"UInt32": "<I", "UInt64": "<Q", "Hash": "<I"}
+
+
+class FCBFormatError(ValueError):
+    """Raised when data is not a valid binary object file"""
+
+
+def hash_name(name):
+    """Hash a class or member name the way the game does"""
+    return zlib.crc32(name.encode("ascii", errors="replace")) & 0xFFFFFFFF
+
+
+def _parse_hash(text):
+    """Parse a hex hash attribute"""
+    return int(text, 16) & 0xFFFFFFFF
+
+
+def _format_hash(value):
+    return f"{value:08X}"
+
+
+# --- Class definitions ---------------------------------------------------
+
+class ClassDefinitions:
+    """Compiled binary_classes.xml: class and member lookups keyed by hash"""
+
+    def __init__(self, classes=None, members=None):
+        # class hash -> (class name or None, {member hash: (member name or None, type)})
+        self.classes = classes or {}
+        # member hash -> (member name or None, type) across all classes
+        self.members = members or {}
+
+    def class_name(self, class_hash):
+        entry = self.classes.get(class_hash)
+        return entry[0] if entry else None
+
+    def member(self, class_hash, member_hash):
+        """Get (name, type) for a member, falling back to other classes, then to BinHex"""
+        entry = self.classes.get(class_hash)
+        if entry is not None:
+            found = entry[1].get(member_hash)
+            if found is not None:
+                return found
+        return self.members.get(member_hash, (None, TYPE_BINHEX))
+
+    def to_json(self):
+        return {
+            "version": SCHEMA_CACHE_VERSION,
+            "classes": {_format_hash(h): [name, {_format_hash(m): list(v) for m, v in members.items()}]
+                        for h, (name, members) in self.classes.items()},
+            "members": {_format_hash(h): list(v) for h, v in self.members.items()}
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != SCHEMA_CACHE_VERSION:
+            raise ValueError("Compiled class definitions are from another version")
+        classes = {int(h, 16): (name, {int(m, 16): tuple(v) for m, v in members.items()})
+                   for h, (name, members) in data["classes"].items()}
+        members = {int(h, 16): tuple(v) for h, v in data["members"].items()}
+        return cls(classes, members)
+
+
+def compile_definitions(schema_path):
+    """Parse binary_classes.xml into ClassDefinitions, resolving "extends" chains"""
+    root = ET.parse(schema_path).getroot()
+
+    raw = {}      # class hash -> (name, parent name, {member hash: (name, type)})
+    by_name = {}  # class name -> class hash
+    for class_element in root.iter("class"):
+        name = class_element.get("name")
+        if name is not None:
+            class_hash = hash_name(name)
+            by_name[name] = class_hash
+        elif class_element.get("hash") is not None:
+            class_hash = _parse_hash(class_element.get("hash"))
+        else:
+            continue
+
+        members = {}
+        for member_element in class_element.findall("member"):
+            member_name = member_element.get("name")
+            if member_name is not None:
+                member_hash = hash_name(member_name)
+            elif member_element.get("hash") is not None:
+                member_hash = _parse_hash(member_element.get("hash"))
+            else:
+                continue
+            members[member_hash] = (member_name, (member_element.text or TYPE_BINHEX).strip())
+        raw[class_hash] = (name, class_element.get("extends"), members)
+
+    classes = {}
+    all_members = {}
+    for class_hash, (name, parent, members) in raw.items():
+        # Parents first so a class can override an inherited member's type
+        chain = [members]
+        seen = {class_hash}
+        while parent is not None:
+            parent_hash = by_name.get(parent, hash_name(parent))
+            if parent_hash in seen or parent_hash not in raw:
+                break
+            seen.add(parent_hash)
+            chain.append(raw[parent_hash][2])
+            parent = raw[parent_hash][1]
+
+        resolved = {}
+        for level in reversed(chain):
+            resolved.update(level)
+        classes[class_hash] = (name, resolved)
+        for member_hash, entry in members.items():
+            all_members.setdefault(member_hash, entry)
+
+    return ClassDefinitions(classes, all_members)
+
+
+def default_schema_path(tools_path="tools"):
+    """Get binary_classes.xml for the project named in tools/projects/current.txt"""
+    projects = os.path.join(tools_path, "projects")
+    project = "FCCU_FC2"
+    try:
+        with open(os.path.join(projects, "current.txt"), encoding="utf-8") as f:
+            project = f.read().strip() or project
+    except OSError:
+        pass
+    return os.path.join(projects, project, "binary_classes.xml")
+
+
+_definitions_lock = threading.Lock()
+_loaded_definitions = {}  # (path, mtime, size) -> ClassDefinitions
+
+
+def load_definitions(schema_path, cache_directory=None):
+    """Get compiled class definitions, compiling binary_classes.xml at most once
+
+    Results are kept in memory for the process and as JSON in the cache
+    directory, keyed by the schema contents, so later runs skip parsing.
+    """
+    stat = os.stat(schema_path)
+    memo_key = (os.path.abspath(schema_path), stat.st_mtime_ns, stat.st_size)
+    with _definitions_lock:
+        definitions = _loaded_definitions.get(memo_key)
+        if definitions is not None:
+            return definitions
+
+        if cache_directory is None:
+            from cache import default_cache_directory
+            cache_directory = default_cache_directory()
+
+        with open(schema_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        compiled_path = os.path.join(cache_directory, f"binary_classes-{digest[:16]}.json")
+
+        definitions = None
+        try:
+            with open(compiled_path, encoding="utf-8") as f:
+                definitions = ClassDefinitions.from_json(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        if definitions is None:
+            definitions = compile_definitions(schema_path)
+            try:
+                from converter import atomic_write
+                os.makedirs(cache_directory, exist_ok=True)
+                atomic_write(compiled_path, json.dumps(definitions.to_json()).encode("utf-8"))
+            except OSError:
+                pass  # The cache is only an optimization
+
+        _loaded_definitions[memo_key] = definitions
+        return definitions
+
+
+# --- Value types -----------------------------------------------------------
+
+def _format_float(value):
+    """Shortest text that packs back to the same 32-bit float"""
+    packed = struct.pack("<f", value)
+    for digits in range(6, 10):
+        text = f"{value:.{digits}g}"
+        if struct.pack("<f", float(text)) == packed:
+            return text
+    return repr(value)
+
+
+def decode_value(value_type, data):
+    """Turn value bytes into (text, type); data that doesn't fit its type becomes BinHex"""
+    try:
+        if value_type == "String":
+            if data.endswith(b"\x00") and b"\x00" not in data[:-1]:
+                return data[:-1].decode("utf-8"), value_type
+        elif value_type == "Bool":
+            if len(data) == 1 and data[0] in (0, 1):
+                return ("true" if data[0] else "false"), value_type
+        elif value_type == "Hash":
+            if len(data) == 4:
+                return _format_hash(struct.unpack("<I", data)[0]), value_type
+        elif value_type in _SCALAR_FORMATS:
+            if len(data) == struct.calcsize(_SCALAR_FORMATS[value_type]):
+                return str(struct.unpack(_SCALAR_FORMATS[value_type], data)[0]), value_type
+        elif value_type == "Float" or value_type in _VECTOR_SIZES:
+            count = _VECTOR_SIZES.get(value_type, 1)
+            if len(data) == 4 * count:
+                values = struct.unpack(f"<{count}f", data)
+                # NaN payloads would not survive a trip through text
+                if all(math.isfinite(v) for v in values):
+                    return ",".join(_format_float(v) for v in values), value_type
+    except UnicodeDecodeError:
+        pass
+    return data.hex().upper(), TYPE_BINHEX
+
+
+def encode_value(value_type, text):
+    """Turn field text back into value bytes"""
+    text = (text or "").strip() if value_type != "String" else (text or "")
+    if value_type == "String":
+        return text.encode("utf-8") + b"\x00"
+    if value_type == "Bool":
+        lowered = text.lower()
+        if lowered not in ("true", "false", "1", "0"):
+            raise FCBFormatError(f"Invalid Bool value: {text!r}")
+        return b"\x01" if lowered in ("true", "1") else b"\x00"
+    if value_type == "Hash":
+        return struct.pack("<I", _parse_hash(text))
+    if value_type in _SCALAR_FORMATS:
+        return struct.pack(_SCALAR_FORMATS[value_type], int(text, 0))
+    if value_type == "Float" or value_type in _VECTOR_SIZES:
+        count = _VECTOR_SIZES.get(value_type, 1)
+        parts = [part for part in text.replace(" ", "").split(",") if part]
+        if len(parts) != count:
+            raise FCBFormatError(f"{value_type} needs {count} comma-separated numbers, got {text!r}")
+        return struct.pack(f"<{count}f", *(float(part) for part in parts))
+    return bytes.fromhex(text)
+
+
+# --- Decoding ----------------------------------------------------------------
+
+def _read_count(data, offset):
+    """Read a count and return (value, is_reference, new_offset)"""
+    try:
+        value = data[offset]
+    except IndexError:
+        raise FCBFormatError("Unexpected end of data") from None
+    if value < _COUNT_OFFSET:
+        return value, False, offset + 1
+    if offset + 5 > len(data):
+        raise FCBFormatError("Unexpected end of data")
+    return struct.unpack_from("<I", data, offset + 1)[0], value == _COUNT_OFFSET, offset + 5
+
+
+def _reference_target(position, distance):
+    target = position - distance
+    if distance == 0 or target < 0:
+        raise FCBFormatError(f"Invalid back reference at offset {position}")
+    return target
+
+
+def _read_value_bytes(data, offset):
+    """Read a sized value, following a back reference, and return (bytes, new_offset)"""
+    start = offset
+    size, is_reference, offset = _read_count(data, offset)
+    if is_reference:
+        size, is_reference, target = _read_count(data, _reference_target(start, size))
+        if is_reference:
+            raise FCBFormatError("Back reference points at another reference")
+        return bytes(data[target:target + size]), offset
+    if offset + size > len(data):
+        raise FCBFormatError("Value runs past the end of the data")
+    return bytes(data[offset:offset + size]), offset + size
+
+
+def is_fcb(data):
+    """Check if the given bytes start like a binary object file"""
+    return data[:4] == FCB_MAGIC
+
+
+def decode_document(data, definitions=None):
+    """Decode .fcb bytes and return (root_element, flags)"""
+    if len(data) < 16 or not is_fcb(data):
+        raise FCBFormatError("Not a binary object file (bad magic)")
+    version, flags, object_count, value_count = struct.unpack_from("<HHII", data, 4)
+    if version != FCB_VERSION:
+        raise FCBFormatError(f"Unsupported binary object file version {version}")
+    definitions = definitions or ClassDefinitions()
+
+    seen_objects = 0
+    seen_values = 0
+    root = None
+
+    # Each stack entry is [element, remaining_children, resume_offset]; the
+    # resume offset is set when the children were reached through a back
+    # reference and reading must continue elsewhere afterwards
+    stack = []
+    offset = 16
+    while True:
+        record_start = offset
+        child_count, is_reference, offset = _read_count(data, offset)
+        resume = None
+        if is_reference:
+            offset = _reference_target(record_start, child_count)
+            child_count, is_reference, offset = _read_count(data, offset)
+            if is_reference:
+                raise FCBFormatError("Back reference points at another reference")
+            resume = record_start + 5
+
+        if offset + 4 > len(data):
+            raise FCBFormatError("Unexpected end of data")
+        class_hash = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+
+        element = ET.Element("object")
+        name = definitions.class_name(class_hash)
+        if name is not None:
+            element.set("name", name)
+        else:
+            element.set("hash", _format_hash(class_hash))
+
+        values, _, offset = _read_count(data, offset)
+        for _ in range(values):
+            if offset + 4 > len(data):
+                raise FCBFormatError("Unexpected end of data")
+            member_hash = struct.unpack_from("<I", data, offset)[0]
+            raw, offset = _read_value_bytes(data, offset + 4)
+            member_name, member_type = definitions.member(class_hash, member_hash)
+
+            field = ET.SubElement(element, "field")
+            if member_name is not None:
+                field.set("name", member_name)
+            else:
+                field.set("hash", _format_hash(member_hash))
+
+            if member_type == "Rml" and rml.is_rml(raw):
+                try:
+                    document, unknown1 = rml.decode_document(raw)
+                    if rml.encode(document, unknown1) == raw:
+                        field.set("type", "Rml")
+                        field.append(document)
+                        continue
+                except rml.RMLFormatError:
+                    pass
+                member_type = TYPE_BINHEX
+            text, decoded_type = decode_value(member_type, raw)
+            field.set("type", decoded_type)
+            field.text = text
+        seen_objects += 1
+        seen_values += values
+
+        if stack:
+            stack[-1][0].append(element)
+            stack[-1][1] -= 1
+        else:
+            root = element
+
+        if child_count:
+            stack.append([element, child_count, resume])
+        elif resume is not None:
+            offset = resume
+
+        while stack and stack[-1][1] == 0:
+            finished = stack.pop()
+            if finished[2] is not None:
+                offset = finished[2]
+        if not stack:
+            break
+
+    if seen_objects != object_count or seen_values != value_count:
+        raise FCBFormatError(
+            f"Count mismatch: header says {object_count} objects/{value_count} values, "
+            f"found {seen_objects}/{seen_values}")
+    return root, flags
+
+
+def decode(data, definitions=None):
+    """Decode .fcb bytes into an ElementTree root element"""
+    return decode_document(data, definitions)[0]
+
+
+# --- Encoding ----------------------------------------------------------------
+
+def _write_count(out, value):
+    if value < _COUNT_OFFSET:
+        out.append(value)
+    else:
+        out.append(_COUNT_LARGE)
+        out += struct.pack("<I", value)
+
+
+def _element_hash(element):
+    """Get the name hash of an object or field element"""
+    if element.get("hash") is not None:
+        return _parse_hash(element.get("hash"))
+    if element.get("name") is not None:
+        return hash_name(element.get("name"))
+    raise FCBFormatError(f"<{element.tag}> needs a name or hash attribute")
+
+
+def _field_bytes(field):
+    value_type = field.get("type", TYPE_BINHEX)
+    if value_type == "Rml":
+        if len(field) != 1:
+            raise FCBFormatError("Rml fields must contain exactly one element")
+        return rml.encode(field[0])
+    try:
+        return encode_value(value_type, field.text)
+    except (ValueError, struct.error) as e:
+        name = field.get("name") or field.get("hash")
+        raise FCBFormatError(f"Invalid value for field {name}: {e}") from None
+
+
+def encode(root, flags=0):
+    """Encode an <object> element tree into .fcb bytes"""
+    if isinstance(root, ET.ElementTree):
+        root = root.getroot()
+
+    body = bytearray()
+    object_count = 0
+    value_count = 0
+
+    # Explicit pre-order walk so deep documents don't hit the recursion limit
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        if element.tag != "object":
+            raise FCBFormatError(f"Expected <object>, found <{element.tag}>")
+        fields = [child for child in element if child.tag == "field"]
+        children = [child for child in element if child.tag != "field"]
+
+        _write_count(body, len(children))
+        body += struct.pack("<I", _element_hash(element))
+        _write_count(body, len(fields))
+        for field in fields:
+            raw = _field_bytes(field)
+            body += struct.pack("<I", _element_hash(field))
+            _write_count(body, len(raw))
+            body += raw
+
+        object_count += 1
+        value_count += len(fields)
+        stack.extend(reversed(children))
+
+    header = FCB_MAGIC + struct.pack("<HHII", FCB_VERSION, flags & 0xFFFF, object_count, value_count)
+    return header + bytes(body)
+
+
+def to_xml_bytes(root, encoding="utf-8"):
+    """Serialize a decoded object tree as indented readable XML"""
+    return rml.to_xml_bytes(root, encoding)
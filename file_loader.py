@@ -0,0 +1,128 @@
+"""
+Worker-side steps of opening a document
+
+Nothing here touches Tk widgets, so a load can run on a background thread
+while the editor keeps the previous document on screen. A LoadJob carries
+the cancellation flag; it is checked between steps and while parsing.
+"""
+
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+from doc_stats import DocumentStatistics
+from document_index import DocumentIndex
+from parsers import get_parser
+from source_map import render_document
+
+
+class LoadCancelled(Exception):
+    """Raised inside a worker when its load has been cancelled"""
+
+
+class ConversionFailed(Exception):
+    """Raised when a binary file could not be converted for editing"""
+
+
+class LoadJob:
+    """One attempt to open a file; cancel() makes the worker stop at its next check"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise LoadCancelled if the job was cancelled"""
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+
+
+class LoadedDocument:
+    """Everything the UI needs to show a freshly loaded file"""
+
+    def __init__(self, filename, tree, fcb_flags, statistics, source, source_map, index, message=None,
+                 lines=None, compact=False):
+        self.filename = filename
+        self.tree = tree
+        self.fcb_flags = fcb_flags
+        self.statistics = statistics
+        self.source = source
+        self.source_map = source_map
+        self.index = index
+        self.message = message
+        self.lines = lines  # element -> line in the file, when the parser reports it
+        self.compact = compact  # tree is a CompactDocument: no source text, structure not editable
+
+
+def needs_conversion(converter, filename):
+    """Check if a file must be converted before it can be edited"""
+    ext = os.path.splitext(filename)[1]
+    if ext.lower() == ".fcb":
+        return False
+    if ext == ".rml":
+        # RML files always need conversion
+        return True
+    return not converter.is_file_xml_format(filename)
+
+
+def load_document(converter, job, progress, convert=False):
+    """Convert (if asked), parse and prepare a file for display
+
+    progress(stage, fraction) is called from the worker thread.
+    """
+    filename = job.filename
+    message = None
+    fcb_flags = None
+    statistics = index = lines = None
+    compact = False
+
+    if convert:
+        progress("Converting", 0.05)
+        success, message = converter.convert_to_readable(filename)
+        if not success:
+            raise ConversionFailed(message)
+        filename = converter.readable_output_path(filename)
+        if not os.path.exists(filename):
+            raise ConversionFailed("Converted XML file not found")
+        job.check()
+
+    if os.path.splitext(filename)[1].lower() == ".fcb":
+        progress("Decoding", 0.1)
+        root, fcb_flags = converter.read_binary_object(filename)
+        tree = ET.ElementTree(root)
+    else:
+        progress("Parsing", 0.1)
+        parser = get_parser(filename)
+        parsed = parser.parse_file(filename, job, lambda fraction: progress("Parsing", 0.1 + 0.6 * fraction))
+        tree, statistics, index, lines = parsed.tree, parsed.statistics, parsed.index, parsed.lines
+        compact = parser.compact
+    job.check()
+
+    # Some backends count and index while parsing
+    if statistics is None:
+        progress("Counting elements", 0.7)
+        statistics = DocumentStatistics(tree.getroot())
+        job.check()
+    statistics.read_file(filename)
+
+    if index is None:
+        progress("Indexing", 0.75)
+        index = DocumentIndex(tree.getroot())
+        job.check()
+
+    # The text of a compact document would be as large as the tree it saves
+    source = source_map = None
+    if not compact:
+        progress("Formatting source", 0.85)
+        source, source_map = render_document(tree.getroot())
+        job.check()
+
+    return LoadedDocument(filename, tree, fcb_flags, statistics, source, source_map, index, message, lines,
+                          compact)
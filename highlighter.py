@@ -0,0 +1,112 @@
+"""
+Viewport-only syntax highlighting for the XML source view
+
+Only the lines on screen plus a margin carry highlight tags. Lines are
+tokenized with one precompiled pattern, and tokens are cached by line text,
+so after an edit only the changed lines are tokenized again. Each refresh
+costs a handful of Tk calls (one tag_add per tag) no matter how large the
+document is.
+"""
+
+import re
+from collections import OrderedDict
+
+# Lines highlighted above and below the visible area
+HIGHLIGHT_MARGIN_LINES = 50
+
+# Tokenized lines kept for reuse
+TOKEN_CACHE_SIZE = 10000
+
+# Tag names in increasing priority; later tags win where they overlap
+HIGHLIGHT_TAGS = ("tag", "attr", "string", "comment", "declaration")
+
+_TOKEN_RE = re.compile(
+    r"(?P<comment><!--.*?-->)"
+    r"|(?P<declaration><\?.*?\?>)"
+    r"|(?P<tag><[^>]+>)"
+)
+_ATTRIBUTE_RE = re.compile(r"([\w:.-]+)\s*=\s*(\"[^\"]*\"|'[^']*')")
+
+
+def tokenize_line(line):
+    """Get (tag, start, end) highlight ranges for one line of XML"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(line):
+        kind = match.lastgroup
+        start, end = match.span()
+        tokens.append((kind, start, end))
+        if kind == "tag":
+            for attribute in _ATTRIBUTE_RE.finditer(line, start, end):
+                tokens.append(("attr", attribute.start(1), attribute.end(1)))
+                tokens.append(("string", attribute.start(2), attribute.end(2)))
+    return tokens
+
+
+class SourceHighlighter:
+    """Keeps the visible part of a Text widget highlighted"""
+
+    def __init__(self, text, colors, margin=HIGHLIGHT_MARGIN_LINES):
+        self.text = text
+        self.margin = margin
+        self._tokens = OrderedDict()  # line text -> tokens
+        self._pending = None
+
+        for tag in HIGHLIGHT_TAGS:
+            if tag in colors:
+                self.text.tag_configure(tag, foreground=colors[tag])
+
+        self.text.bind("<Configure>", lambda event: self.schedule(), add="+")
+
+    def wrap_scroll(self, scroll_set):
+        """Wrap a scrollbar's set method so scrolling also re-highlights"""
+        def yscrollcommand(first, last):
+            scroll_set(first, last)
+            self.schedule()
+        return yscrollcommand
+
+    def schedule(self):
+        """Re-highlight once the event loop is idle (repeated calls coalesce)"""
+        if self._pending is None:
+            self._pending = self.text.after_idle(self.refresh)
+
+    def cancel(self):
+        if self._pending is not None:
+            self.text.after_cancel(self._pending)
+            self._pending = None
+
+    def line_tokens(self, line):
+        tokens = self._tokens.get(line)
+        if tokens is None:
+            tokens = tokenize_line(line)
+            self._tokens[line] = tokens
+            if len(self._tokens) > TOKEN_CACHE_SIZE:
+                self._tokens.popitem(last=False)
+        else:
+            self._tokens.move_to_end(line)
+        return tokens
+
+    def visible_lines(self):
+        """Get the (first, last) line numbers to highlight"""
+        first = int(self.text.index("@0,0").split(".")[0])
+        last = int(self.text.index(f"@0,{self.text.winfo_height()}").split(".")[0])
+        return max(1, first - self.margin), last + self.margin
+
+    def refresh(self):
+        """Highlight the visible lines and drop highlighting everywhere else"""
+        self._pending = None
+        first, last = self.visible_lines()
+        lines = self.text.get(f"{first}.0", f"{last}.end").split("\n")
+
+        ranges = {tag: [] for tag in HIGHLIGHT_TAGS}
+        for offset, line in enumerate(lines):
+            if "<" not in line:
+                continue
+            line_number = first + offset
+            for tag, start, end in self.line_tokens(line):
+                ranges[tag].append(f"{line_number}.{start}")
+                ranges[tag].append(f"{line_number}.{end}")
+
+        for tag in HIGHLIGHT_TAGS:
+            self.text.tag_remove(tag, "1.0", "end")
+            if ranges[tag]:
+                self.text.tag_add(tag, *ranges[tag])
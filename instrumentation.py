@@ -0,0 +1,172 @@
+"""
+Structured timing instrumentation for conversions
+
+A conversion produces one event dictionary:
+    {"file", "direction", "outcome", "stages": {stage: seconds},
+     "bytes_in", "bytes_out", "total", "timestamp"}
+which is handed to every configured sink.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Outcome codes
+OUTCOME_OK = "ok"
+OUTCOME_CACHED = "cached"
+OUTCOME_ALREADY_READABLE = "already_readable"
+OUTCOME_EXCLUDED = "excluded"
+OUTCOME_UNAVAILABLE = "unavailable"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_FAILED = "failed"
+
+
+class LoggingSink:
+    """Sends events to the standard logging module"""
+
+    def __init__(self, log=None, level=logging.DEBUG):
+        self.log = log or logger
+        self.level = level
+
+    def emit(self, event):
+        if not self.log.isEnabledFor(self.level):
+            return
+        stages = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in event["stages"].items())
+        self.log.log(self.level, "%s %s %s in=%d out=%d %s", event["outcome"], event["direction"],
+                     event["file"], event["bytes_in"], event["bytes_out"], stages)
+
+
+class JSONLinesSink:
+    """Appends events to a JSON lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class RingBufferSink:
+    """Keeps the most recent events in memory"""
+
+    def __init__(self, capacity=1000):
+        self.events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def snapshot(self):
+        """Get a list copy of the buffered events"""
+        with self._lock:
+            return list(self.events)
+
+
+class Instrumentation:
+    """Fans conversion events out to sinks"""
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self, file_path, direction, outcome, stages, bytes_in=0, bytes_out=0):
+        """Build an event and send it to every sink"""
+        if not self.sinks:
+            return None
+        event = {
+            "file": file_path,
+            "direction": direction,
+            "outcome": outcome,
+            "stages": {name: round(seconds, 6) for name, seconds in stages.items()},
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "total": round(sum(stages.values()), 6),
+            "timestamp": time.time()
+        }
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                logger.warning("Instrumentation sink %r failed: %s", sink, e)
+        return event
+
+
+def create_default_instrumentation():
+    """Build the instrumentation described by INSTRUMENTATION_SETTINGS in config"""
+    from config import INSTRUMENTATION_SETTINGS
+
+    sinks = [LoggingSink()]
+    if INSTRUMENTATION_SETTINGS.get("jsonl_path"):
+        sinks.append(JSONLinesSink(INSTRUMENTATION_SETTINGS["jsonl_path"]))
+    if INSTRUMENTATION_SETTINGS.get("ring_buffer_size"):
+        sinks.append(RingBufferSink(INSTRUMENTATION_SETTINGS["ring_buffer_size"]))
+    return Instrumentation(sinks)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(events):
+    """Per-stage percentiles, outcome counts and byte totals for a list of events"""
+    per_stage = {}
+    totals = []
+    outcomes = {}
+    bytes_in = bytes_out = 0
+
+    for event in events:
+        outcomes[event["outcome"]] = outcomes.get(event["outcome"], 0) + 1
+        bytes_in += event.get("bytes_in", 0)
+        bytes_out += event.get("bytes_out", 0)
+        stages = event.get("stages", {})
+        totals.append(sum(stages.values()))
+        for name, seconds in stages.items():
+            per_stage.setdefault(name, []).append(seconds)
+
+    def describe(values):
+        values.sort()
+        return {
+            "count": len(values),
+            "sum": sum(values),
+            "p50": percentile(values, 0.50),
+            "p90": percentile(values, 0.90),
+            "p99": percentile(values, 0.99),
+            "max": values[-1] if values else 0.0
+        }
+
+    return {
+        "outcomes": outcomes,
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "total": describe(totals),
+        "stages": {name: describe(values) for name, values in per_stage.items()}
+    }
+
+
+def format_summary(summary):
+    """Render a summary as a small text table"""
+    lines = [f"{'stage':<10} {'count':>7} {'sum s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    rows = sorted(summary["stages"].items(), key=lambda item: item[1]["sum"], reverse=True)
+    rows.append(("total", summary["total"]))
+    for name, stats in rows:
+        lines.append(f"{name:<10} {stats['count']:>7} {stats['sum']:>9.3f} {stats['p50'] * 1000:>9.2f} "
+                     f"{stats['p90'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f} {stats['max'] * 1000:>9.2f}")
+    outcomes = ", ".join(f"{count} {name}" for name, count in sorted(summary["outcomes"].items()))
+    lines.append(f"outcomes: {outcomes}")
+    return "\n".join(lines)
@@ -8,6 +8,8 @@ binary and readable XML formats.
 Author: Generated for Level Editor Project
 """
 
+import multiprocessing
+
 from main_editor import GameXMLEditor
 
 
@@ -24,4 +26,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Needed for converter worker processes in frozen Windows builds
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
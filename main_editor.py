@@ -1,8 +1,25 @@
+from bisect import bisect_left
 import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import xml.etree.ElementTree as ET
 
+from autosave import Autosave, element_path, has_journal, pending_sessions, recover
+from doc_stats import DocumentStatistics
+from document_index import DocumentIndex
+from file_loader import (ConversionFailed, LoadCancelled, LoadJob,
+                         load_document, needs_conversion)
+from highlighter import SourceHighlighter
+from parsers import get_parser
+from source_map import UnsupportedDocument, render_document
+from source_search import SearchError, SourceSearch, compile_pattern
+from tree_diff import common_prefix_length, common_suffix_length, patch_source, update_source_map
+from tree_walk import indent, preorder
+from ui_scheduler import UIScheduler
+from undo import AttributeChange, CompoundChange, DocumentReplace, TextChange, TreePatchChange, UndoStack
+
 try:
     from converter import GameXMLConverter
 except ImportError:
@@ -17,6 +34,16 @@ except ImportError:
         def save_as_binary(self, file):
             return False, "Converter not available"
 
+try:
+    from worker_pool import ConverterWorkerPool
+except ImportError:
+    ConverterWorkerPool = None
+
+try:
+    from async_converter import AsyncGameXMLConverter, EventLoopThread
+except ImportError:
+    AsyncGameXMLConverter = None
+
 try:
     from dialogs import AttributeEditDialog, FindDialog
 except ImportError:
@@ -73,19 +100,78 @@ class GameXMLEditor:
         # Apply dark theme
         self.setup_dark_theme()
         
-        # Initialize converter
-        self.converter = GameXMLConverter()
+        # Initialize converter with a warm worker process for conversions
+        self.converter_pool = self.create_converter_pool()
+        self.converter = GameXMLConverter(pool=self.converter_pool)
+        
+        # Background event loop for conversions, results come back through ui_queue
+        self.ui_queue = queue.Queue()
+        self.conversion_jobs = []
+        self.async_runner = None
+        self.async_converter = None
+        if AsyncGameXMLConverter is not None:
+            self.async_runner = EventLoopThread()
+            self.async_converter = self.async_runner.call(AsyncGameXMLConverter, self.converter)
         
         # Current file
         self.current_file = None
         self.tree_data = None
         self.is_modified = False
         self.element_map = {}
+        self.tree_items = {}  # element -> tree item, for elements shown in the tree
+        self.source_lines = None  # element -> line in the file as loaded, if the parser reported it
+        self.suppress_text_change = False  # set while the Text entry is filled from the document
+        self.compact = False  # the open document is a CompactDocument: no source view, structure fixed
+        
+        # Lazily populated tree items: item -> (element, next child index, placeholder item)
+        self.tree_pending = {}
+        self.tree_placeholders = {}  # placeholder item -> parent item
+        
+        # Header flags of the open .fcb file, None when editing XML
+        self.fcb_flags = None
+        
+        # File currently being opened in the background
+        self.load_job = None
+        
+        # Tag/attribute/value index for find-in-tree, and its dialog
+        self.document_index = DocumentIndex()
+        self.find_dialog = None
+        
+        # Element/attribute/tag counts, updated by deltas as the document is edited
+        self.statistics = DocumentStatistics()
+        self.shown_statistics = None  # statistics object the Statistics tab currently shows
+        self.stats_tree_items = {}    # tag -> row in stats_tree
+        self.stats_tree_order = []    # sorted (-count, tag) keys of those rows
         
         # NEW: Track source modifications separately
         self.source_modified = False
         self.updating_source = False  # Flag to prevent recursive updates
         
+        # Where each element sits in the source text; None once the source
+        # no longer matches the tree and needs a full refresh
+        self.source_map = None
+        
+        # Tree item, title, source and statistics updates, coalesced per idle cycle
+        from config import EDITOR_SETTINGS
+        self.ui_scheduler = UIScheduler(self.root, EDITOR_SETTINGS.get("ui_update_intervals"))
+        self.ui_scheduler.register("tree_item", self.flush_tree_items)
+        self.ui_scheduler.register("title", self.flush_title)
+        self.ui_scheduler.register("source", self.flush_source)
+        self.ui_scheduler.register("statistics", self.flush_statistics)
+        self.ui_scheduler.register("journal", self.flush_journal)
+        
+        # Undo/redo history of tree edits
+        self.undo_stack = UndoStack(
+            EDITOR_SETTINGS.get("max_undo_levels", 50),
+            EDITOR_SETTINGS.get("max_undo_memory_mb", 64) * 1024 * 1024,
+            EDITOR_SETTINGS.get("undo_coalesce_seconds", 1.0)
+        )
+        
+        # Edit journal and periodic snapshots of the open document
+        self.autosave = None
+        self.autosave_interval = int(EDITOR_SETTINGS.get("auto_save_interval", 0) * 60 * 1000)
+        self.recover_on_load = None  # file whose journal the user already chose to recover
+        
         # Create GUI
         self.create_menu()
         self.create_toolbar()
@@ -95,10 +181,87 @@ class GameXMLEditor:
         # Check converter status and show welcome
         self.show_welcome_message()
         
+        # Offer to recover documents left with unsaved edits, then autosave from here on
+        self.root.after_idle(self.offer_session_recovery)
+        if self.autosave_interval > 0:
+            self.root.after(self.autosave_interval, self.autosave_tick)
+        
         if not self.converter.can_convert:
             self.status_var.set("WARNING: File conversion disabled - missing tools/dependencies")
         else:
             self.status_var.set("Ready - AVATAR XML File Editor")
+        
+        self.poll_ui_queue()
+    
+    def create_converter_pool(self):
+        """Start the persistent converter workers if enabled in config"""
+        from config import WORKER_POOL_SETTINGS, get_tools_path
+        if ConverterWorkerPool is None or not WORKER_POOL_SETTINGS.get("enabled", False):
+            return None
+        
+        try:
+            return ConverterWorkerPool(
+                workers=WORKER_POOL_SETTINGS["workers"],
+                backend=WORKER_POOL_SETTINGS["backend"],
+                tools_path=get_tools_path(),
+                base_timeout=WORKER_POOL_SETTINGS["base_timeout"],
+                timeout_per_mb=WORKER_POOL_SETTINGS["timeout_per_mb"],
+                max_restarts=WORKER_POOL_SETTINGS["max_restarts"],
+                restart_window=WORKER_POOL_SETTINGS["restart_window"]
+            )
+        except Exception as e:
+            print(f"Warning: could not start converter workers, converting in process: {e}")
+            return None
+    
+    def post_to_ui(self, func, *args):
+        """Queue a call to run on the Tk thread (safe from any thread)"""
+        self.ui_queue.put((func, args))
+    
+    def poll_ui_queue(self):
+        """Run calls queued by background threads"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"Error in UI callback: {e}")
+        except queue.Empty:
+            pass
+        self.root.after(50, self.poll_ui_queue)
+    
+    def run_conversion_job(self, coro, label, on_done):
+        """Run a conversion coroutine in the background and call on_done(success, message)"""
+        future = self.async_runner.submit(coro)
+        self.conversion_jobs.append(future)
+        
+        def finished(done_future):
+            self.conversion_jobs.remove(done_future)
+            if done_future.cancelled():
+                self.status_var.set(f"{label} cancelled")
+                return
+            try:
+                success, message = done_future.result()
+            except Exception as e:
+                success, message = False, f"Error during conversion: {str(e)}"
+            on_done(success, message)
+        
+        future.add_done_callback(lambda done_future: self.post_to_ui(finished, done_future))
+        return future
+    
+    def conversion_progress(self, label):
+        """Build a progress callback that shows conversion stages in the status bar"""
+        def progress(stage, fraction):
+            self.post_to_ui(self.status_var.set, f"{label}... {fraction:.0%} ({stage})")
+        return progress
+    
+    def cancel_conversions(self):
+        """Cancel all running background conversions"""
+        if not self.conversion_jobs:
+            self.status_var.set("No conversions running")
+            return
+        for future in list(self.conversion_jobs):
+            future.cancel()
     
     def setup_dark_theme(self):
         """Configure dark theme for the application"""
@@ -319,6 +482,9 @@ class GameXMLEditor:
                            activeforeground=DarkTheme.SELECTION_FG,
                            font=('Segoe UI', 9))
         menubar.add_cascade(label="Edit", menu=edit_menu)
+        edit_menu.add_command(label="Undo", command=self.undo, accelerator="Ctrl+Z")
+        edit_menu.add_command(label="Redo", command=self.redo, accelerator="Ctrl+Y")
+        edit_menu.add_separator()
         edit_menu.add_command(label="Expand All", command=self.expand_all)
         edit_menu.add_command(label="Collapse All", command=self.collapse_all)
         edit_menu.add_separator()
@@ -336,6 +502,8 @@ class GameXMLEditor:
         menubar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Convert to Readable", command=self.convert_to_readable)
         tools_menu.add_command(label="Validate XML", command=self.validate_xml)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Cancel Conversions", command=self.cancel_conversions)
         
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0, 
@@ -352,6 +520,8 @@ class GameXMLEditor:
         self.root.bind('<Control-o>', lambda e: self.open_file())
         self.root.bind('<Control-s>', lambda e: self.save_file())
         self.root.bind('<Control-f>', lambda e: self.show_find_dialog())
+        self.root.bind('<Control-z>', self.undo)
+        self.root.bind('<Control-y>', self.redo)
     
     def create_toolbar(self):
         """Create the modern toolbar with dark theme"""
@@ -443,6 +613,7 @@ class GameXMLEditor:
         
         # Bind tree events
         self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<<TreeviewOpen>>', self.on_tree_open)
         
         # Right panel - Element details with tabs (takes remaining space)
         right_panel = ttk.LabelFrame(main_container, text="🔧 XML Details", padding=10)
@@ -557,9 +728,21 @@ class GameXMLEditor:
         ttk.Button(search_frame, text="Clear", command=self.clear_search, width=8).pack(side=tk.LEFT, padx=2)
         
         # Case sensitive checkbox
-        self.case_sensitive_var = tk.BooleanVar()
+        from config import SEARCH_SETTINGS
+        self.case_sensitive_var = tk.BooleanVar(value=SEARCH_SETTINGS["case_sensitive_default"])
         ttk.Checkbutton(search_frame, text="Case sensitive", 
                     variable=self.case_sensitive_var).pack(side=tk.LEFT, padx=(10, 0))
+        self.whole_word_var = tk.BooleanVar()
+        ttk.Checkbutton(search_frame, text="Whole word", 
+                    variable=self.whole_word_var).pack(side=tk.LEFT, padx=(10, 0))
+        self.regex_var = tk.BooleanVar()
+        ttk.Checkbutton(search_frame, text="Regex", 
+                    variable=self.regex_var).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Search engine over the current source text, rebuilt when the text changes
+        self.source_search = None
+        self.search_batches = None
+        self.search_after_id = None
         
         # Search result label
         self.search_result_label = ttk.Label(search_frame, text="", foreground=DarkTheme.ACCENT_BLUE)
@@ -608,7 +791,16 @@ class GameXMLEditor:
                                     command=self.source_text.yview)
         source_scrollx = ttk.Scrollbar(text_frame, orient=tk.HORIZONTAL, 
                                     command=self.source_text.xview)
-        self.source_text.configure(yscrollcommand=source_scrolly.set, 
+        
+        # Syntax highlighting follows the visible lines as the view scrolls
+        self.source_highlighter = SourceHighlighter(self.source_text, {
+            "tag": DarkTheme.XML_TAG,
+            "attr": DarkTheme.XML_ATTR,
+            "string": DarkTheme.XML_STRING,
+            "comment": DarkTheme.XML_COMMENT,
+            "declaration": DarkTheme.ACCENT_PURPLE
+        })
+        self.source_text.configure(yscrollcommand=self.source_highlighter.wrap_scroll(source_scrolly.set), 
                                 xscrollcommand=source_scrollx.set)
         
         self.source_text.grid(row=0, column=0, sticky="nsew")
@@ -644,7 +836,10 @@ class GameXMLEditor:
         return "break"  # Prevent default Ctrl+F behavior
 
     def find_text(self):
-        """Find all occurrences of search text"""
+        """Find occurrences of the search text, showing results in batches as they are found"""
+        from config import SEARCH_SETTINGS
+        
+        self.stop_search()
         search_term = self.search_var.get()
         if not search_term:
             self.clear_search()
@@ -653,52 +848,60 @@ class GameXMLEditor:
         # Clear previous highlights
         self.source_text.tag_remove("search_highlight", "1.0", tk.END)
         self.source_text.tag_remove("current_match", "1.0", tk.END)
+        self.search_matches = []
+        self.current_match_index = -1
         
-        # Get all text content
-        content = self.source_text.get("1.0", tk.END)
+        try:
+            pattern = compile_pattern(search_term, self.case_sensitive_var.get(),
+                                      self.regex_var.get(), self.whole_word_var.get())
+        except SearchError as e:
+            self.search_result_label.config(text=str(e))
+            return
         
-        # Search options
-        if not self.case_sensitive_var.get():
-            content_lower = content.lower()
-            search_term_lower = search_term.lower()
-        else:
-            content_lower = content
-            search_term_lower = search_term
+        # The line index is only rebuilt when the text has changed since the last search
+        content = self.source_text.get("1.0", "end-1c")
+        if self.source_search is None or self.source_search.text != content:
+            self.source_search = SourceSearch(content)
         
-        # Find all matches
-        self.search_matches = []
-        start = 0
-        while True:
-            pos = content_lower.find(search_term_lower, start)
-            if pos == -1:
-                break
-            
-            # Convert position to line.column format
-            lines_before = content[:pos].count('\n')
-            if lines_before == 0:
-                col = pos
-            else:
-                last_newline = content.rfind('\n', 0, pos)
-                col = pos - last_newline - 1
-            
-            start_pos = f"{lines_before + 1}.{col}"
-            end_pos = f"{lines_before + 1}.{col + len(search_term)}"
-            
-            self.search_matches.append((start_pos, end_pos))
-            start = pos + 1
+        self.search_batches = self.source_search.iter_batches(
+            pattern, SEARCH_SETTINGS["max_results"] or None, SEARCH_SETTINGS["batch_size"])
+        self.show_next_search_batch()
+    
+    def show_next_search_batch(self):
+        """Highlight one batch of matches and schedule the next"""
+        from config import SEARCH_SETTINGS
+        
+        self.search_after_id = None
+        batch = next(self.search_batches, None)
+        if batch is None:
+            self.search_batches = None
+            if not self.search_matches:
+                self.search_result_label.config(text="No matches found")
+                return
+            limit = " (limit reached)" if len(self.search_matches) == SEARCH_SETTINGS["max_results"] else ""
+            self.search_result_label.config(
+                text=f"Match {self.current_match_index + 1} of {len(self.search_matches)}{limit}")
+            return
         
-        # Highlight all matches
-        for start_pos, end_pos in self.search_matches:
-            self.source_text.tag_add("search_highlight", start_pos, end_pos)
+        ranges = [index for match in batch for index in match]
+        self.source_text.tag_add("search_highlight", *ranges)
+        first_batch = not self.search_matches
+        self.search_matches.extend(batch)
         
-        # Update result display
-        if self.search_matches:
+        if first_batch:
             self.current_match_index = 0
             self.highlight_current_match()
-            self.search_result_label.config(text=f"{len(self.search_matches)} matches found")
         else:
-            self.search_result_label.config(text="No matches found")
-            self.current_match_index = -1
+            self.search_result_label.config(
+                text=f"Match {self.current_match_index + 1} of {len(self.search_matches)}...")
+        self.search_after_id = self.root.after(1, self.show_next_search_batch)
+    
+    def stop_search(self):
+        """Stop showing batches of a running search"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        self.search_batches = None
 
     def find_next(self):
         """Find next occurrence"""
@@ -742,6 +945,7 @@ class GameXMLEditor:
 
     def clear_search(self, event=None):
         """Clear search highlights and results"""
+        self.stop_search()
         if hasattr(self, 'source_text'):
             self.source_text.tag_remove("search_highlight", "1.0", tk.END)
             self.source_text.tag_remove("current_match", "1.0", tk.END)
@@ -785,6 +989,20 @@ class GameXMLEditor:
         self.stats_max_depth = ttk.Label(element_stats, text="Maximum depth: 0")
         self.stats_max_depth.pack(anchor=tk.W)
         
+        # Conversion cache statistics
+        cache_stats = ttk.LabelFrame(stats_container, text="Conversion Cache", padding=10)
+        cache_stats.pack(fill=tk.X, pady=(0, 10))
+        
+        self.stats_cache = ttk.Label(cache_stats, text="Cache: disabled")
+        self.stats_cache.pack(anchor=tk.W)
+        
+        # Coalesced UI update counters
+        ui_stats = ttk.LabelFrame(stats_container, text="UI Updates", padding=10)
+        ui_stats.pack(fill=tk.X, pady=(0, 10))
+        
+        self.stats_ui_updates = ttk.Label(ui_stats, text="UI updates: 0 requested")
+        self.stats_ui_updates.pack(anchor=tk.W)
+        
         # Element types
         types_frame = ttk.LabelFrame(stats_container, text="Element Types", padding=10)
         types_frame.pack(fill=tk.BOTH, expand=True)
@@ -885,8 +1103,12 @@ class GameXMLEditor:
             return
         
         try:
-            # Basic validation - try to write to string
-            ET.tostring(self.tree_data.getroot())
+            # Basic validation - try to write to string (cached while the source map is current)
+            if self.compact:
+                for _ in self.tree_data.serialize():
+                    pass
+            else:
+                self.document_text()
             self.show_custom_messagebox("Validation Result", "XML structure is valid!", "info")
         except Exception as e:
             self.show_custom_messagebox("Validation Error", f"XML validation failed:\n{str(e)}", "error")
@@ -963,7 +1185,8 @@ class GameXMLEditor:
             ("Game XML files", "*.game.xml"),
             ("XML files", "*.xml"),
             ("RML files", "*.rml"),
-            ("All supported files", "*.game.xml;*.xml;*.rml"),
+            ("Binary object files", "*.fcb"),
+            ("All supported files", "*.game.xml;*.xml;*.rml;*.fcb"),
             ("All files", "*.*")
         ]
         
@@ -976,76 +1199,150 @@ class GameXMLEditor:
             self.load_file(filename)
 
     def load_file(self, filename):
-        """Load and display a .game.xml file with enhanced error handling"""
+        """Open a file in the background; the current document stays until the new one is ready"""
+        if self.load_job is not None:
+            self.load_job.cancel()
+        
+        job = LoadJob(filename)
+        self.load_job = job
+        self.load_progress.config(value=0.0)
+        self.load_progress.pack(side=tk.RIGHT, padx=(10, 0))
+        self.load_cancel_button.pack(side=tk.RIGHT, padx=(10, 0))
+        self.status_var.set(f"Opening {os.path.basename(filename)}...")
+        self.start_load_worker(job, convert=None)
+    
+    def start_load_worker(self, job, convert):
+        """Run the background stage of a load (convert=None means sniff first)"""
+        threading.Thread(target=self.load_worker, args=(job, convert),
+                         name="file-loader", daemon=True).start()
+    
+    def load_worker(self, job, convert):
+        """Sniff, convert, parse and count off the Tk thread, then hand the result to the UI"""
+        def progress(stage, fraction):
+            self.post_to_ui(self.update_load_progress, job, stage, fraction)
+        
+        try:
+            if convert is None:
+                progress("Checking format", 0.0)
+                if needs_conversion(self.converter, job.filename):
+                    self.post_to_ui(self.confirm_load_conversion, job)
+                    return
+                convert = False
+            document = load_document(self.converter, job, progress, convert)
+        except LoadCancelled:
+            self.post_to_ui(self.end_load, job, "Loading cancelled")
+        except ConversionFailed as e:
+            self.post_to_ui(self.load_failed, job, "Conversion Failed", str(e))
+        except Exception as e:
+            self.post_to_ui(self.load_failed, job, "Error", f"Failed to load file:\n{str(e)}")
+        else:
+            self.post_to_ui(self.finish_load, job, document)
+    
+    def confirm_load_conversion(self, job):
+        """Ask whether a binary file should be converted, then resume its load"""
+        if job is not self.load_job:
+            return
+        
+        ext = os.path.splitext(job.filename)[1]
+        result = self.show_custom_messagebox_with_result(
+            "Binary Format Detected",
+            f"This {ext} file appears to be in binary format.\n\n"
+            "Would you like to convert it to readable XML format?",
+            "question"
+        )
+        
+        if job is not self.load_job:
+            return
+        if result:
+            self.start_load_worker(job, convert=True)
+        else:
+            self.end_load(job, "Loading cancelled")
+            self.show_custom_messagebox("Cannot Edit",
+                                    "Cannot edit binary format files. Please convert first.",
+                                    "warning")
+    
+    def update_load_progress(self, job, stage, fraction):
+        """Show the progress of the current load"""
+        if job is self.load_job:
+            self.load_progress.config(value=fraction)
+            self.status_var.set(f"{stage} {os.path.basename(job.filename)}... {fraction:.0%}")
+    
+    def end_load(self, job, status=None):
+        """Hide the load progress; returns False if job is no longer the current load"""
+        if job is not self.load_job:
+            return False
+        self.load_job = None
+        self.load_progress.pack_forget()
+        self.load_cancel_button.pack_forget()
+        if status:
+            self.status_var.set(status)
+        return True
+    
+    def load_failed(self, job, title, message):
+        """Report a failed load, leaving the open document as it was"""
+        if self.end_load(job, "Loading failed"):
+            self.show_custom_messagebox(title, message, "error")
+    
+    def cancel_load(self):
+        """Cancel the file that is being opened"""
+        if self.load_job is not None:
+            job = self.load_job
+            job.cancel()
+            self.end_load(job, "Loading cancelled")
+    
+    def finish_load(self, job, document):
+        """UI stage of a load: swap in the new document and render it"""
+        if job.cancelled or not self.end_load(job):
+            return
+        
         try:
             # Reset modification flags
             self.source_modified = False
             
-            # Determine if we need to convert based on file extension and format
-            needs_conversion = False
-            base, ext = os.path.splitext(filename)
-            
-            if ext == '.rml':
-                # RML files always need conversion
-                needs_conversion = True
-            else:
-                # Check if other files are in readable format
-                needs_conversion = not self.converter.is_file_xml_format(filename)
-            
-            if needs_conversion:
-                # Ask user if they want to convert using custom messagebox
-                result = self.show_custom_messagebox_with_result(
-                    "Binary Format Detected",
-                    f"This {ext} file appears to be in binary format.\n\n"
-                    "Would you like to convert it to readable XML format?",
-                    "question"
-                )
-                
-                if result:
-                    success, message = self.converter.convert_to_readable(filename)
-                    if not success:
-                        self.show_custom_messagebox("Conversion Failed", message, "error")
-                        return
-                    self.show_custom_messagebox("Conversion Successful", message, "info")
-                    
-                    # For .rml files, we need to load the generated .xml file
-                    if ext == '.rml':
-                        xml_filename = base + '.xml'
-                        if os.path.exists(xml_filename):
-                            filename = xml_filename
-                        else:
-                            self.show_custom_messagebox("Error", "Converted XML file not found", "error")
-                            return
-                else:
-                    self.show_custom_messagebox("Cannot Edit",
-                                            "Cannot edit binary format files. Please convert first.",
-                                            "warning")
-                    return
-            
-            # Parse the XML file
-            self.tree_data = ET.parse(filename)
-            self.current_file = filename
+            self.tree_data = document.tree
+            self.compact = document.compact
+            self.undo_stack.clear()
+            # Recovery replays the journal onto a re-parsed ElementTree, which a compact document avoids
+            self.start_autosave(None if document.compact else document.filename)
+            self.document_index = document.index
+            self.statistics = document.statistics
+            self.fcb_flags = document.fcb_flags
+            self.source_lines = document.lines
+            self.current_file = document.filename
+            # .fcb documents are saved as binary objects, not converted from XML
+            binary_state = tk.NORMAL if self.converter.can_convert and document.fcb_flags is None else tk.DISABLED
+            self.save_binary_button.config(state=binary_state)
             self.is_modified = False
             
             # Update tree display
             self.update_tree_display()
             
             # Update file info
+            filename = document.filename
             self.file_info_label.config(text=f"📄 {os.path.basename(filename)}")
             
             # Update window title
             self.root.title(f"AVATAR XML File Editor | Made By: Jasper_Zebra | Version 2.0 | Current XML File Loaded: - {os.path.basename(filename)}")
-            self.status_var.set(f"Loaded: {filename}")
+            if self.compact:
+                self.status_var.set(f"Loaded in the compact model (text and attributes editable): {filename}")
+            else:
+                self.status_var.set(f"Loaded: {filename}")
             
             # Update statistics
-            self.update_statistics()
+            self.show_statistics(self.statistics)
             
             # Update source view
-            self.refresh_source_view()
+            self.refresh_source_view(document.source, document.source_map)
             
             # Clear modified indicator
             self.modified_indicator.config(text="")
             
+            if document.message:
+                self.show_custom_messagebox("Conversion Successful", document.message, "info")
+            
+            if has_journal(filename) and not self.compact:
+                self.offer_recovery(filename)
+            
         except Exception as e:
             self.show_custom_messagebox("Error", f"Failed to load file:\n{str(e)}", "error")
 
@@ -1064,15 +1361,24 @@ class GameXMLEditor:
         self.modified_indicator = ttk.Label(status_frame, text="", 
                                            font=('Segoe UI', 9, 'bold'))
         self.modified_indicator.pack(side=tk.RIGHT, padx=(10, 0))
+        
+        # Load progress, only shown while a file is being opened
+        self.load_cancel_button = ttk.Button(status_frame, text="Cancel", command=self.cancel_load, width=8)
+        self.load_progress = ttk.Progressbar(status_frame, mode="determinate", maximum=1.0, length=160)
 
     def on_tab_changed(self, event):
         """Handle tab change events to sync data between tabs"""
         try:
             current_tab = self.notebook.tab(self.notebook.select(), "text")
             
+            # Bring everything up to date before showing another tab
+            self.ui_scheduler.flush_all()
+            
             # If switching TO the XML Source tab, refresh it with current tree data
+            # (edits made meanwhile were already patched in when the map is current)
             if current_tab == "XML Source" and not self.updating_source:
-                self.refresh_source_view()
+                if self.source_map is None or self.source_modified:
+                    self.refresh_source_view()
             
             # If switching FROM the XML Source tab and it was modified, ask to apply changes
             elif self.source_modified and hasattr(self, 'previous_tab') and self.previous_tab == "XML Source":
@@ -1086,8 +1392,7 @@ class GameXMLEditor:
                     if self.apply_source_changes():
                         self.source_modified = False
                 elif result == "no":  # No - discard changes
-                    self.source_modified = False
-                    self.refresh_source_view()  # Reload from tree
+                    self.revert_source_view()  # Reload from tree
                 else:  # Cancel - go back to source tab
                     # Switch back to source tab
                     for i in range(self.notebook.index("end")):
@@ -1205,60 +1510,229 @@ class GameXMLEditor:
 
     def on_source_text_change(self, event=None):
         """Handle changes to the source text widget"""
+        # Edited lines miss the token cache, so only they are tokenized again
+        self.source_highlighter.schedule()
         if not self.updating_source and self.tree_data:
+            # The source map keeps describing the text as rendered, which
+            # is what "Apply Changes to Tree" compares the edit against
             self.source_modified = True
-            self.mark_modified()
-            self.status_var.set("XML source modified - use 'Apply Changes to Tree' or save to apply")
+            self.ui_scheduler.mark("title")
 
     def apply_source_changes(self):
-        """Apply changes from the source text widget back to the XML tree"""
+        """Apply changes from the source text widget back to the XML tree
+        
+        Only the elements the edit touched are patched; everything else keeps
+        its identity, tree items, index entries and undo history.
+        """
+        if not self.check_structure_editable():
+            return False
         try:
             # Get the current source text
-            source_content = self.source_text.get(1.0, tk.END).strip()
+            source_content = self.source_text.get("1.0", "end-1c")
             
-            if not source_content:
+            if not source_content.strip():
                 self.show_custom_messagebox("Error", "Source content is empty.", "error")
                 return False
             
-            # Try to parse the XML
+            # Try to parse the edited part of the XML
             try:
-                # Parse the XML string
-                new_root = ET.fromstring(source_content)
-                
-                # Create a new ElementTree
-                new_tree = ET.ElementTree(new_root)
-                
-                # Replace the current tree data
-                self.tree_data = new_tree
-                self.source_modified = False
-                
-                # Update all displays
-                self.updating_source = True  # Prevent recursive updates
-                try:
-                    self.update_tree_display()
-                    self.update_statistics()
-                    self.refresh_source_view()  # Reformat and re-highlight
-                finally:
-                    self.updating_source = False
-                
-                # Clear any selection and update details
-                self.clear_element_details()
-                
-                self.status_var.set("XML source changes applied successfully")
-                self.show_custom_messagebox("Success", "XML source changes have been applied to the tree structure.", "info")
-                return True
-                
+                element, patches = patch_source(self.tree_data.getroot(), source_content, self.source_map,
+                                                fromstring=get_parser().parse_string)
             except ET.ParseError as e:
                 error_msg = f"XML Parse Error: {str(e)}"
                 self.show_custom_messagebox("Parse Error", error_msg, "error")
                 self.status_var.set("XML parsing failed - check syntax")
                 return False
+            
+            if patches:
+                self.undo_stack.record(TreePatchChange(element, patches))
+                self.show_tree_patches(patches)
+            self.sync_source_view(patches, source_content)
+            if patches:
+                self.journal_subtree(element)
+            
+            self.status_var.set(f"XML source changes applied successfully ({len(patches)} elements patched)")
+            self.show_custom_messagebox("Success", "XML source changes have been applied to the tree structure.", "info")
+            return True
                 
         except Exception as e:
             error_msg = f"Error applying source changes: {str(e)}"
             self.show_custom_messagebox("Error", error_msg, "error")
             return False
 
+    def show_tree_patches(self, patches):
+        """Bring the tree view, search index and statistics up to date with applied element patches"""
+        for patch in patches:
+            element = patch.element
+            if patch.old_fields[:3] != patch.new_fields[:3]:
+                self.document_index.update_element(element)
+                self.statistics.change_tag(patch.old_fields[0], patch.new_fields[0])
+                self.statistics.change_attributes(patch.attribute_delta)
+            for child in patch.removed:
+                self.document_index.remove_subtree(child)
+                self.statistics.remove_subtree(child, patch.depth + 1)
+            for child in patch.added:
+                self.document_index.add_subtree(child, element)
+                self.statistics.add_subtree(child, patch.depth + 1)
+            
+            item = self.tree_items.get(element)
+            if item is not None:
+                if patch.structural:
+                    self.patch_tree_children(item, patch)
+                self.ui_scheduler.mark("tree_item", item)
+        self.ui_scheduler.mark("statistics")
+        
+        if not self.tree.selection():
+            self.clear_element_details()
+    
+    def patch_tree_children(self, item, patch):
+        """Swap the tree items of a patch's removed children for items of the added ones
+        
+        Shown child items always mirror the first children of the element, so
+        items of unpatched siblings (and whatever is expanded below them) stay.
+        """
+        element = patch.element
+        pending = self.tree_pending.get(item)
+        items = [child for child in self.tree.get_children(item) if child not in self.tree_placeholders]
+        
+        if not items:
+            # Never expanded: only the expand arrow may need to come or go
+            if pending is None and len(element):
+                placeholder = self.tree.insert(item, "end", text="Loading...")
+                self.tree_pending[item] = (element, 0, placeholder)
+                self.tree_placeholders[placeholder] = item
+            elif pending is not None and not len(element):
+                self.forget_tree_item(pending[2])
+            return
+        
+        index = patch.index
+        removed_items = items[index:index + len(patch.removed)]
+        for child_item in removed_items:
+            self.forget_tree_item(child_item)
+        
+        shown = len(items) - len(removed_items)
+        # Children past the loaded page come in with the page they are on
+        if index < len(items) or pending is None:
+            for offset, child in enumerate(patch.added):
+                self.add_element_to_tree(item, child, index + offset)
+            shown += len(patch.added)
+        
+        if pending is not None:
+            placeholder = pending[2]
+            if shown >= len(element):
+                self.forget_tree_item(placeholder)
+            else:
+                self.tree_pending[item] = (element, shown, placeholder)
+                self.tree.item(placeholder, text=f"... {len(element) - shown} more elements")
+    
+    def forget_tree_item(self, item):
+        """Delete a tree item and drop it and its descendants from the item maps"""
+        stack = [item]
+        while stack:
+            current = stack.pop()
+            element = self.element_map.pop(current, None)
+            if element is not None and self.tree_items.get(element) == current:
+                del self.tree_items[element]
+            self.tree_pending.pop(current, None)
+            parent = self.tree_placeholders.pop(current, None)
+            if parent is not None and self.tree_pending.get(parent, (None, 0, None))[2] == current:
+                del self.tree_pending[parent]
+            stack.extend(self.tree.get_children(current))
+        self.tree.delete(item)
+    
+    def sync_source_view(self, patches, shown_text):
+        """Re-render what patches changed and correct the source view, which shows shown_text
+        
+        Only the differing stretch of the widget is replaced; without a
+        source map the whole view is refreshed.
+        """
+        if self.source_map is None:
+            self.refresh_source_view()
+            return
+        try:
+            update_source_map(self.source_map, patches)
+        except (UnsupportedDocument, KeyError):
+            self.refresh_source_view()
+            return
+        
+        text = self.source_map.text()
+        prefix = common_prefix_length(shown_text, text)
+        suffix = common_suffix_length(shown_text, text, min(len(shown_text), len(text)) - prefix)
+        if prefix < len(shown_text) - suffix or prefix < len(text) - suffix:
+            self.patch_source_view(prefix, len(shown_text) - suffix, text[prefix:len(text) - suffix])
+        self.source_modified = False
+
+    def replace_document(self, tree):
+        """Show a different tree for the current file and rebuild everything derived from it"""
+        self.tree_data = tree
+        self.document_index = DocumentIndex(tree.getroot())
+        self.statistics = DocumentStatistics(tree.getroot())
+        self.source_modified = False
+        
+        # Update all displays
+        self.updating_source = True  # Prevent recursive updates
+        try:
+            self.update_tree_display()
+            self.update_statistics()
+            self.refresh_source_view()  # Reformat and re-highlight
+        finally:
+            self.updating_source = False
+        
+        # Clear any selection and update details
+        self.clear_element_details()
+    
+    def undo(self, event=None):
+        """Undo the last tree edit"""
+        self.step_history(event, self.undo_stack.undo, -1, "Undo")
+    
+    def redo(self, event=None):
+        """Redo the last undone tree edit"""
+        self.step_history(event, self.undo_stack.redo, 1, "Redo")
+    
+    def step_history(self, event, step, direction, label):
+        """Run an undo or redo step and bring the displays up to date"""
+        # Keyboard shortcuts typed into the source view belong to the source text
+        if event is not None and self.root.focus_get() is self.source_text:
+            return
+        if not self.tree_data:
+            return
+        
+        change = step()
+        if change is None:
+            self.status_var.set(f"Nothing to {label.lower()}")
+            return
+        
+        if isinstance(change, DocumentReplace):
+            self.replace_document(change.tree)
+            self.journal_document()
+        elif isinstance(change, TreePatchChange):
+            self.show_tree_patches(change.applied)
+            if self.source_map is None or self.source_modified:
+                self.refresh_source_view()
+            else:
+                self.sync_source_view(change.applied, self.source_map.text())
+            self.journal_subtree(change.element)
+            if self.reveal_element(change.element):
+                self.refresh_attribute_display(change.element)
+        else:
+            element = change.element
+            self.document_index.update_element(element)
+            self.statistics.change_attributes(direction * change.attribute_delta)
+            if self.reveal_element(element):
+                self.ui_scheduler.mark("tree_item", self.tree.selection()[0])
+                self.refresh_attribute_display(element)
+            self.ui_scheduler.mark("source", element)
+            self.ui_scheduler.mark("statistics")
+            self.ui_scheduler.mark("journal", element)
+        
+        # Otherwise the Text entry writes its stale content back on the next key release
+        selection = self.tree.selection()
+        if selection and selection[0] in self.element_map:
+            self.show_element_text(self.element_map[selection[0]])
+        
+        self.mark_modified()
+        self.status_var.set(f"{label} complete")
+    
     def validate_source_xml(self):
         """Validate the XML syntax in the source text widget"""
         try:
@@ -1270,7 +1744,7 @@ class GameXMLEditor:
             
             # Try to parse the XML
             try:
-                ET.fromstring(source_content)
+                get_parser().parse_string(source_content)
                 self.show_custom_messagebox("Validation Result", "XML syntax is valid!", "info")
                 self.status_var.set("XML validation successful")
             except ET.ParseError as e:
@@ -1286,14 +1760,16 @@ class GameXMLEditor:
             self.show_custom_messagebox("Validation Error", f"Error during validation: {str(e)}", "error")
 
     def save_file(self):
-        """Save the current file with enhanced feedback and source sync"""
+        """Save the current file with enhanced feedback and source sync; returns success"""
         if not self.current_file:
             self.show_custom_messagebox("No File", "No file is currently open.", "warning")
-            return
+            return False
         
         if not self.tree_data:
             self.show_custom_messagebox("No Data", "No data to save.", "warning")
-            return
+            return False
+        
+        self.ui_scheduler.flush_all()
         
         # If source was modified, apply changes first
         if self.source_modified:
@@ -1305,11 +1781,12 @@ class GameXMLEditor:
             
             if result:
                 if not self.apply_source_changes():
-                    return  # Don't save if applying changes failed
+                    return False  # Don't save if applying changes failed
             else:
-                self.source_modified = False  # User chose to discard source changes
+                self.revert_source_view()  # User chose to discard source changes
         
         try:
+            from converter import atomic_write
             from config import EDITOR_SETTINGS
             if os.path.exists(self.current_file) and EDITOR_SETTINGS.get("auto_backup", False):
                 backup_path = self.current_file + ".backup"
@@ -1317,44 +1794,65 @@ class GameXMLEditor:
                 shutil.copy2(self.current_file, backup_path)
                 self.status_var.set(f"Backup created: {os.path.basename(backup_path)}")   
 
-            # Write XML file with pretty formatting
-            self.indent_xml(self.tree_data.getroot())
-            self.tree_data.write(self.current_file, encoding="utf-8", xml_declaration=True)
+            if self.compact:
+                # Streamed from the arrays, keeping the file's own formatting
+                self.tree_data.write(self.current_file)
+            else:
+                # Write XML file with pretty formatting; the source view's text already
+                # is that, and rendering it indented the tree for the binary writer
+                xml_str = self.document_text()
+                if self.fcb_flags is not None:
+                    self.converter.write_binary_object(self.current_file, self.tree_data.getroot(), self.fcb_flags)
+                else:
+                    atomic_write(self.current_file, xml_str.encode("utf-8"))
             
-            # Reset modification status
+            # Reset modification status; line numbers of the old file no longer apply
             self.is_modified = False
             self.source_modified = False
+            self.source_lines = None
+            if self.autosave is not None:
+                self.autosave.discard()
             self.root.title(self.root.title().rstrip(" *"))
             self.modified_indicator.config(text="✓", foreground=DarkTheme.ACCENT_GREEN)
             self.file_info_label.config(text=f"📄 {os.path.basename(self.current_file)}")
             
-            # Update statistics and source view
+            # Update statistics; the source view already shows what was saved
             self.update_statistics()
-            self.refresh_source_view()
             
             # Show success message with custom messagebox
             self.show_custom_messagebox("File Saved", f"Successfully saved: {os.path.basename(self.current_file)}", "info")
+            return True
                         
         except Exception as e:
             self.show_custom_messagebox("Save Error", f"Failed to save file:\n{str(e)}", "error")
+            return False
 
-    def refresh_source_view(self):
-        """Refresh the XML source view with dark theme syntax highlighting"""
+    def refresh_source_view(self, xml_str=None, source_map=None):
+        """Refresh the XML source view with dark theme syntax highlighting
+        
+        xml_str and source_map are the already rendered document when the caller has it.
+        """
+        self.ui_scheduler.discard("source")  # A full refresh covers pending patches
+        self.source_map = None
+        self.source_text.config(state=tk.NORMAL)
         if not self.tree_data:
             self.source_text.delete(1.0, tk.END)
             return
         
+        if self.compact:
+            # Rendering the whole file would take more memory than the compact model saved
+            self.source_text.delete(1.0, tk.END)
+            self.source_text.insert(1.0, "The source view is off for files opened in the compact model.\n"
+                                         "Edit text and attributes in the tree; saving writes the file.")
+            self.source_text.config(state=tk.DISABLED)
+            return
+        
         try:
             self.updating_source = True  # Prevent modification detection during refresh
             
             # Pretty print the XML
-            self.indent_xml(self.tree_data.getroot())
-            xml_str = ET.tostring(self.tree_data.getroot(), 
-                                 encoding='unicode', method='xml')
-            
-            # Add XML declaration
-            if not xml_str.startswith('<?xml'):
-                xml_str = '<?xml version="1.0" encoding="utf-8"?>\n' + xml_str
+            if xml_str is None:
+                xml_str, source_map = render_document(self.tree_data.getroot())
             
             # Update text widget
             self.source_text.delete(1.0, tk.END)
@@ -1365,109 +1863,161 @@ class GameXMLEditor:
             
             # Reset modification flag
             self.source_modified = False
+            self.source_map = source_map
             
         except Exception as e:
             self.source_text.delete(1.0, tk.END)
             self.source_text.insert(1.0, f"Error generating source view: {str(e)}")
         finally:
             self.updating_source = False
+    
+    def document_text(self):
+        """The document pretty-printed as the source view shows it and files are saved
+        
+        While the source map is current this is its text, kept up to date by
+        re-rendering only edited elements; otherwise the tree is rendered once
+        and the result shown in the source view, so the next call is free.
+        """
+        self.ui_scheduler.flush("source")
+        if self.source_map is not None:
+            return self.source_map.text()
+        xml_str, source_map = render_document(self.tree_data.getroot())
+        if not self.source_modified:
+            self.refresh_source_view(xml_str, source_map)
+        return xml_str
+    
+    def revert_source_view(self):
+        """Drop unapplied edits in the source view"""
+        if self.source_map is None:
+            self.refresh_source_view()
+        else:
+            # Only the edited stretch is put back
+            self.sync_source_view([], self.source_text.get("1.0", "end-1c"))
+    
+    def refresh_source_element(self, element):
+        """Re-render just one edited element in the source view
+        
+        Falls back to a full refresh when the source no longer matches the tree;
+        with no current source map and the tab hidden, that waits for the tab switch.
+        """
+        visible = self.notebook.tab(self.notebook.select(), "text") == "XML Source"
+        if self.source_map is None or self.source_modified or element not in self.source_map:
+            self.source_map = None
+            if visible:
+                self.refresh_source_view()
+            return
+        
+        try:
+            start, end, new_text = self.source_map.patch(element)
+        except UnsupportedDocument:
+            self.source_map = None
+            if visible:
+                self.refresh_source_view()
+            return
+        self.patch_source_view(start, end, new_text)
+    
+    def patch_source_view(self, start, end, new_text):
+        """Replace characters start:end of the source view"""
+        self.updating_source = True  # Prevent modification detection during the patch
+        try:
+            self.source_text.delete(f"1.0 + {start} chars", f"1.0 + {end} chars")
+            self.source_text.insert(f"1.0 + {start} chars", new_text)
+        finally:
+            self.updating_source = False
+        self.source_highlighter.schedule()
 
     def update_statistics(self):
         """Update file and element statistics"""
         if not self.tree_data or not self.current_file:
+            self.update_cache_statistics()
             return
         
         try:
-            # File statistics
-            if os.path.exists(self.current_file):
-                file_size = os.path.getsize(self.current_file)
-                size_str = f"{file_size:,} bytes"
-                if file_size > 1024:
-                    size_str += f" ({file_size/1024:.1f} KB)"
-                if file_size > 1024*1024:
-                    size_str += f" ({file_size/(1024*1024):.1f} MB)"
-                
-                self.stats_file_size.config(text=f"File size: {size_str}")
-                
-                import time
-                mod_time = os.path.getmtime(self.current_file)
-                mod_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mod_time))
-                self.stats_last_modified.config(text=f"Last modified: {mod_str}")
-            
-            # Element statistics
-            root = self.tree_data.getroot()
-            element_count = len(list(root.iter()))
-            attr_count = sum(len(elem.attrib) for elem in root.iter())
-            max_depth = self.calculate_max_depth(root)
-            
-            # Count element types
-            element_types = {}
-            for elem in root.iter():
-                tag = elem.tag
-                element_types[tag] = element_types.get(tag, 0) + 1
+            self.statistics.read_file(self.current_file)
+            self.show_statistics(self.statistics)
+        except Exception as e:
+            print(f"Error updating statistics: {e}")
+    
+    def show_statistics(self, statistics):
+        """Render a DocumentStatistics, updating only the type rows whose counts changed"""
+        self.update_cache_statistics()
+        
+        # File statistics
+        file_size = statistics.file_size
+        if file_size is not None:
+            size_str = f"{file_size:,} bytes"
+            if file_size > 1024:
+                size_str += f" ({file_size/1024:.1f} KB)"
+            if file_size > 1024*1024:
+                size_str += f" ({file_size/(1024*1024):.1f} MB)"
             
-            # Update labels
-            self.stats_total_elements.config(text=f"Total elements: {element_count:,}")
-            self.stats_total_attributes.config(text=f"Total attributes: {attr_count:,}")
-            self.stats_max_depth.config(text=f"Maximum depth: {max_depth}")
+            self.stats_file_size.config(text=f"File size: {size_str}")
             
-            # Update types tree
+            import time
+            mod_str = time.strftime("%Y-%m-%d %H:%M:%S", statistics.modified)
+            self.stats_last_modified.config(text=f"Last modified: {mod_str}")
+        
+        # Update labels
+        self.stats_total_elements.config(text=f"Total elements: {statistics.elements:,}")
+        self.stats_total_attributes.config(text=f"Total attributes: {statistics.attributes:,}")
+        self.stats_max_depth.config(text=f"Maximum depth: {statistics.max_depth}")
+        
+        # Update types tree, most common first
+        changed_tags = statistics.take_changed_tags()
+        if statistics is not self.shown_statistics:
+            self.shown_statistics = statistics
             self.stats_tree.delete(*self.stats_tree.get_children())
-            for tag, count in sorted(element_types.items(), key=lambda x: x[1], reverse=True):
-                self.stats_tree.insert("", "end", text=tag, values=(count,))
+            self.stats_tree_order = sorted((-count, tag) for tag, count in statistics.tag_counts.items())
+            self.stats_tree_items = {
+                tag: self.stats_tree.insert("", "end", text=tag, values=(-count,))
+                for count, tag in self.stats_tree_order
+            }
+            return
         
-        except Exception as e:
-            print(f"Error updating statistics: {e}")
-    
-    def calculate_max_depth(self, element, current_depth=0):
-        """Calculate maximum depth of XML tree"""
-        if not list(element):
-            return current_depth
-        return max(self.calculate_max_depth(child, current_depth + 1) 
-                  for child in element)
-    
-    def apply_dark_highlighting(self):
-        """Apply dark theme syntax highlighting to XML source"""
-        try:
-            # Configure text tags for dark theme highlighting
-            self.source_text.tag_configure("tag", foreground=DarkTheme.XML_TAG)
-            self.source_text.tag_configure("attr", foreground=DarkTheme.XML_ATTR)
-            self.source_text.tag_configure("string", foreground=DarkTheme.XML_STRING)
-            self.source_text.tag_configure("comment", foreground=DarkTheme.XML_COMMENT)
-            self.source_text.tag_configure("declaration", foreground=DarkTheme.ACCENT_PURPLE)
+        for tag in changed_tags:
+            item = self.stats_tree_items.pop(tag, None)
+            if item is not None:
+                old_count = int(self.stats_tree.set(item, "count"))
+                del self.stats_tree_order[bisect_left(self.stats_tree_order, (-old_count, tag))]
             
-            # Simple pattern matching for highlighting
-            content = self.source_text.get(1.0, tk.END)
-            lines = content.split('\n')
+            count = statistics.tag_counts.get(tag, 0)
+            if not count:
+                if item is not None:
+                    self.stats_tree.delete(item)
+                continue
             
-            for i, line in enumerate(lines):
-                # Highlight XML declaration
-                import re
-                for match in re.finditer(r'<\?xml.*?\?>', line):
-                    start_pos = f"{i+1}.{match.start()}"
-                    end_pos = f"{i+1}.{match.end()}"
-                    self.source_text.tag_add("declaration", start_pos, end_pos)
-                
-                # Highlight XML tags
-                for match in re.finditer(r'<[^>]+>', line):
-                    start_pos = f"{i+1}.{match.start()}"
-                    end_pos = f"{i+1}.{match.end()}"
-                    self.source_text.tag_add("tag", start_pos, end_pos)
-                
-                # Highlight attribute values
-                for match in re.finditer(r'="[^"]*"', line):
-                    start_pos = f"{i+1}.{match.start()}"
-                    end_pos = f"{i+1}.{match.end()}"
-                    self.source_text.tag_add("string", start_pos, end_pos)
-                
-                # Highlight comments
-                for match in re.finditer(r'<!--.*?-->', line):
-                    start_pos = f"{i+1}.{match.start()}"
-                    end_pos = f"{i+1}.{match.end()}"
-                    self.source_text.tag_add("comment", start_pos, end_pos)
+            key = (-count, tag)
+            position = bisect_left(self.stats_tree_order, key)
+            self.stats_tree_order.insert(position, key)
+            if item is None:
+                item = self.stats_tree.insert("", position, text=tag, values=(count,))
+            else:
+                self.stats_tree.item(item, values=(count,))
+                self.stats_tree.move(item, "", position)
+            self.stats_tree_items[tag] = item
+    
+    def update_cache_statistics(self):
+        """Update the conversion cache hit/miss and UI update counters"""
+        requested = sum(self.ui_scheduler.requested.values())
+        self.stats_ui_updates.config(
+            text=f"UI updates: {requested:,} requested | {sum(self.ui_scheduler.flushed.values()):,} run | "
+                 f"{self.ui_scheduler.avoided():,} redundant refreshes avoided"
+        )
         
-        except Exception as e:
-            print(f"Error applying highlighting: {e}")
+        cache = getattr(self.converter, "cache", None)
+        if cache is None:
+            self.stats_cache.config(text="Cache: disabled")
+            return
+        
+        stats = cache.stats()
+        self.stats_cache.config(
+            text=f"Cache: {stats['hits']:,} hits | {stats['misses']:,} misses | "
+                 f"{stats['entries']:,} entries ({stats['size']/(1024*1024):.1f} MB)"
+        )
+    
+    def apply_dark_highlighting(self):
+        """Apply dark theme syntax highlighting to the visible part of the XML source"""
+        self.source_highlighter.schedule()
     
     def copy_source(self):
         """Copy source to clipboard"""
@@ -1490,24 +2040,29 @@ class GameXMLEditor:
         """Update the tree view with current XML data"""
         # Clear existing tree and element map
         self.tree.delete(*self.tree.get_children())
+        self.ui_scheduler.discard("tree_item")
         self.element_map = {}
+        self.tree_items = {}
+        self.tree_pending = {}
+        self.tree_placeholders = {}
         
         if self.tree_data is None:
             return
         
-        # Add root element
+        # Add root element, children are inserted when their parent is opened
         root_element = self.tree_data.getroot()
         self.add_element_to_tree("", root_element)
         
         # Expand root by default
         children = self.tree.get_children()
         if children:
+            self.populate_tree_item(children[0])
             self.tree.item(children[0], open=True)
             self.tree.selection_set(children[0])
             self.tree.focus(children[0])
     
-    def add_element_to_tree(self, parent, element):
-        """Recursively add elements to the tree view with improved display"""
+    def add_element_to_tree(self, parent, element, index="end"):
+        """Add one element to the tree view, with a placeholder standing in for its children"""
         # Create display text with better formatting
         display_text = element.tag
         
@@ -1523,22 +2078,52 @@ class GameXMLEditor:
             display_text += f" = '{text_preview}'"
         
         # Add child count if any
-        child_count = len(list(element))
+        child_count = len(element)
         if child_count > 0:
             display_text += f" [{child_count} children]"
         
         # Insert item with improved styling
-        item_id = self.tree.insert(parent, "end", text=display_text)
+        item_id = self.tree.insert(parent, index, text=display_text)
         
         # Store element reference in the element map
         self.element_map[item_id] = element
+        self.tree_items[element] = item_id
         
-        # Add children
-        for child in element:
-            self.add_element_to_tree(item_id, child)
+        # Children are added on <<TreeviewOpen>>, the placeholder keeps the expand arrow
+        if child_count > 0:
+            placeholder = self.tree.insert(item_id, "end", text="Loading...")
+            self.tree_pending[item_id] = (element, 0, placeholder)
+            self.tree_placeholders[placeholder] = item_id
         
         return item_id
     
+    def populate_tree_item(self, item, all_children=False):
+        """Insert the next page of an item's children (or all of them) in place of its placeholder"""
+        from config import TREE_PAGE_SIZE
+        
+        entry = self.tree_pending.pop(item, None)
+        if entry is None:
+            return
+        element, start, placeholder = entry
+        self.tree_placeholders.pop(placeholder, None)
+        self.tree.delete(placeholder)
+        
+        end = len(element) if all_children else min(len(element), start + TREE_PAGE_SIZE)
+        for child in element[start:end]:
+            self.add_element_to_tree(item, child)
+        
+        # Very wide elements get a "more" item that loads the next page when selected
+        if end < len(element):
+            more = self.tree.insert(item, "end", text=f"... {len(element) - end} more elements")
+            self.tree_pending[item] = (element, end, more)
+            self.tree_placeholders[more] = item
+    
+    def on_tree_open(self, event):
+        """Populate an item's children the first time it is expanded"""
+        item = self.tree.focus()
+        if item in self.tree_pending:
+            self.populate_tree_item(item)
+    
     def on_tree_select(self, event):
         """Handle tree selection change with enhanced UI updates"""
         selection = self.tree.selection()
@@ -1547,6 +2132,17 @@ class GameXMLEditor:
         
         # Get selected element using the element map
         item = selection[0]
+        if item in self.tree_placeholders:
+            # "more elements" item: load the next page and select its first element
+            parent = self.tree_placeholders[item]
+            index = self.tree.index(item)
+            self.populate_tree_item(parent)
+            children = self.tree.get_children(parent)
+            if index < len(children):
+                self.tree.selection_set(children[index])
+                self.tree.focus(children[index])
+                self.tree.see(children[index])
+            return
         if item in self.element_map:
             element = self.element_map[item]
             self.update_element_details(element)
@@ -1562,8 +2158,10 @@ class GameXMLEditor:
         child_count = len(list(element))
         text_content = element.text.strip() if element.text else ""
         text_preview = f" | Text: '{text_content[:30]}...'" if text_content else ""
+        line = self.source_lines.get(element) if self.source_lines else None
+        line_info = f" | Line {line}" if line else ""
         
-        self.status_var.set(f"Selected: {element.tag} | {attr_count} attributes | {child_count} children{text_preview}")
+        self.status_var.set(f"Selected: {element.tag} | {attr_count} attributes | {child_count} children{line_info}{text_preview}")
 
     def clear_element_details(self):
         """Clear the element details panel"""
@@ -1573,30 +2171,47 @@ class GameXMLEditor:
         """Handle StringVar changes for text content"""
         self.on_text_change(None)
     
+    def show_element_text(self, element):
+        """Show an element's text in the Text entry without recording an edit"""
+        self.suppress_text_change = True
+        try:
+            self.text_var.set(element.text or "")
+        finally:
+            self.suppress_text_change = False
+    
+    def check_structure_editable(self):
+        """True if elements can be added, removed or moved; otherwise says why"""
+        if not self.compact:
+            return True
+        self.status_var.set("This file is too large to restructure; only text and attributes can be edited")
+        return False
+    
     def on_text_change(self, event):
         """Handle text content change with improved feedback"""
+        if self.suppress_text_change:
+            return
         selection = self.tree.selection()
         if not selection:
             return
-        
         # Get selected element and update its text
         item = selection[0]
         if item in self.element_map:
             element = self.element_map[item]
             new_text = self.text_var.get()
             
-            # Only update if the text actually changed
-            if element.text != new_text:
-                element.text = new_text
-                self.mark_modified()
-                
-                # Update tree display immediately
-                self.update_tree_item_text(item, element)
+            # Only update if the text actually changed (an empty entry matches no text)
+            if (element.text or "") != new_text:
+                # Keystrokes in quick succession are undone as one step
+                change = TextChange(element, element.text, new_text)
+                change.redo()
+                self.undo_stack.record(change)
+                self.document_index.update_element(element)
                 
-                # Refresh source view if visible
-                current_tab = self.notebook.tab(self.notebook.select(), "text")
-                if current_tab == "XML Source":
-                    self.refresh_source_view()
+                # Runs on every keystroke, so the redraws wait for a quiet moment
+                self.ui_scheduler.mark("title")
+                self.ui_scheduler.mark("tree_item", item)
+                self.ui_scheduler.mark("source", element)
+                self.ui_scheduler.mark("journal", element)
     
     def update_tree_item_text(self, item, element):
         """Update tree item display text with enhanced formatting"""
@@ -1651,22 +2266,29 @@ class GameXMLEditor:
                 if tree_item in self.element_map:
                     element = self.element_map[tree_item]
                     
+                    changes = []
+                    
                     # Remove old attribute if name changed
                     if new_name != attr_name and attr_name in element.attrib:
-                        del element.attrib[attr_name]
+                        changes.append(AttributeChange(element, attr_name, element.get(attr_name), None))
                     
                     # Set new attribute
-                    element.attrib[new_name] = new_value
+                    changes.append(AttributeChange(element, new_name, element.get(new_name), new_value))
+                    change = CompoundChange(changes) if len(changes) > 1 else changes[0]
+                    change.redo()
+                    self.undo_stack.record(change)
+                    self.document_index.update_element(element)
+                    self.statistics.change_attributes(change.attribute_delta)
                     
                     # Update displays
                     self.refresh_attribute_display(element)
                     self.update_tree_item_text(tree_item, element)
                     self.mark_modified()
                     
-                    # Refresh source view if visible
-                    current_tab = self.notebook.tab(self.notebook.select(), "text")
-                    if current_tab == "XML Source":
-                        self.refresh_source_view()
+                    # Patch the element into the source view
+                    self.ui_scheduler.mark("source", element)
+                    self.ui_scheduler.mark("statistics")
+                    self.ui_scheduler.mark("journal", element)
     
     def add_attribute(self):
         """Add new attribute to selected element with improved UX"""
@@ -1697,12 +2319,19 @@ class GameXMLEditor:
                         return
                 
                 # Add to XML
-                element.attrib[attr_name] = attr_value
+                change = AttributeChange(element, attr_name, element.get(attr_name), attr_value)
+                change.redo()
+                self.undo_stack.record(change)
+                self.document_index.update_element(element)
+                self.statistics.change_attributes(change.attribute_delta)
                 
                 # Update displays
                 self.refresh_attribute_display(element)
                 self.update_tree_item_text(tree_item, element)
                 self.mark_modified()
+                self.ui_scheduler.mark("source", element)
+                self.ui_scheduler.mark("statistics")
+                self.ui_scheduler.mark("journal", element)
                 
                 # Select the new attribute
                 for item_id in self.attr_tree.get_children():
@@ -1744,7 +2373,7 @@ class GameXMLEditor:
         # Enhanced confirmation dialog
         result = messagebox.askyesno("Confirm Delete", 
                                    f"Are you sure you want to delete attribute '{attr_name}'?\n\n"
-                                   f"This action cannot be undone.")
+                                   f"You can undo this with Ctrl+Z.")
         if result:
             # Remove from XML
             tree_selection = self.tree.selection()
@@ -1753,15 +2382,135 @@ class GameXMLEditor:
                 if tree_item in self.element_map:
                     element = self.element_map[tree_item]
                     if attr_name in element.attrib:
-                        del element.attrib[attr_name]
+                        change = AttributeChange(element, attr_name, element.get(attr_name), None)
+                        change.redo()
+                        self.undo_stack.record(change)
+                        self.document_index.update_element(element)
+                        self.statistics.change_attributes(change.attribute_delta)
                     
                     # Update displays
                     self.refresh_attribute_display(element)
                     self.update_tree_item_text(tree_item, element)
                     self.mark_modified()
+                    self.ui_scheduler.mark("source", element)
+                    self.ui_scheduler.mark("statistics")
+                    self.ui_scheduler.mark("journal", element)
                     
                     self.status_var.set(f"Deleted attribute: {attr_name}")
     
+    def flush_tree_items(self, items):
+        """Redraw the labels of edited tree items"""
+        for item in items:
+            element = self.element_map.get(item)
+            if element is not None:
+                self.update_tree_item_text(item, element)
+    
+    def flush_title(self, keys):
+        """Show the modified state once per burst of typing"""
+        self.mark_modified()
+        if self.source_modified:
+            self.status_var.set("XML source modified - use 'Apply Changes to Tree' or save to apply")
+    
+    def flush_source(self, elements):
+        """Patch edited elements into the source view"""
+        for element in elements:
+            self.refresh_source_element(element)
+    
+    def flush_statistics(self, keys):
+        self.update_statistics()
+    
+    def flush_journal(self, elements):
+        """Append the new state of edited elements to the autosave journal"""
+        if self.autosave is None:
+            return
+        for element in elements:
+            path = self.document_index.path(element)
+            if path:  # Elements of a replaced tree are covered by the document entry
+                self.autosave.record_element(element_path(path), element)
+    
+    def journal_subtree(self, element):
+        """Journal an element replaced along with its descendants"""
+        if self.autosave is None:
+            return
+        path = self.document_index.path(element)
+        if len(path) < 2:
+            self.journal_document()
+            return
+        self.ui_scheduler.flush("journal")
+        self.autosave.record_subtree(element_path(path), element)
+    
+    def journal_document(self):
+        """Journal a whole-document replacement using the freshly rendered source"""
+        self.ui_scheduler.discard("journal")
+        if self.autosave is not None:
+            self.autosave.record_document(self.source_text.get("1.0", "end-1c"))
+    
+    def start_autosave(self, filename):
+        """Journal edits of a newly opened document (the previous journal stays for recovery)"""
+        if self.autosave is not None:
+            self.ui_scheduler.flush("journal")
+            self.autosave.close()
+        self.autosave = Autosave(filename) if filename and self.autosave_interval > 0 else None
+    
+    def autosave_tick(self):
+        """Snapshot the document in the background if it changed since the last snapshot"""
+        if self.autosave is not None and self.tree_data is not None:
+            self.ui_scheduler.flush("journal")
+            if self.autosave.snapshot(self.tree_data):
+                self.status_var.set("Autosaved")
+        self.root.after(self.autosave_interval, self.autosave_tick)
+    
+    def offer_session_recovery(self):
+        """At startup, offer to reopen a document that has unsaved autosaved edits"""
+        sessions = pending_sessions()
+        if not sessions:
+            return
+        filename = sessions[-1]
+        if self.show_custom_messagebox_with_result(
+                "Recover Unsaved Changes",
+                f"The editor did not close cleanly while {os.path.basename(filename)} had unsaved changes.\n\n"
+                f"Open it and recover the changes?",
+                "question"):
+            self.recover_on_load = filename
+            self.load_file(filename)
+    
+    def offer_recovery(self, filename):
+        """Replay a journal left behind for the file that was just opened"""
+        if self.recover_on_load != filename and not self.show_custom_messagebox_with_result(
+                "Recover Unsaved Changes",
+                f"{os.path.basename(filename)} has unsaved changes from a previous session.\n\n"
+                f"Recover them?",
+                "question"):
+            if self.autosave is not None:
+                self.autosave.discard()
+            return
+        self.recover_on_load = None
+        
+        self.status_var.set("Recovering unsaved changes...")
+        tree = self.tree_data
+        
+        def worker():
+            try:
+                recovered, sequence = recover(filename, tree)
+            except Exception as e:
+                self.post_to_ui(self.status_var.set, f"Recovery failed: {e}")
+                return
+            self.post_to_ui(self.finish_recovery, filename, recovered, sequence)
+        
+        threading.Thread(target=worker, name="autosave-recovery", daemon=True).start()
+    
+    def finish_recovery(self, filename, tree, sequence):
+        """Show a recovered document; undo goes back to the file as saved"""
+        if filename != self.current_file:
+            return
+        self.undo_stack.record(DocumentReplace(self.tree_data, tree, self.statistics.elements))
+        self.replace_document(tree)
+        # The journal already describes this state, keep numbering after it
+        if self.autosave is not None:
+            self.autosave.sequence = max(self.autosave.sequence, sequence)
+        self.mark_modified()
+        self.status_var.set(f"Recovered unsaved changes to {os.path.basename(filename)}")
+    
     def mark_modified(self):
         """Mark the document as modified with visual indicators"""
         if not self.is_modified:
@@ -1782,6 +2531,11 @@ class GameXMLEditor:
         if not self.current_file:
             self.show_custom_messagebox("No File", "No file is currently open.", "warning")
             return
+        if self.fcb_flags is not None:
+            self.show_custom_messagebox("Already Binary",
+                                        ".fcb files are binary already; Save writes them in their binary format.",
+                                        "info")
+            return
         
         # Show information about the process using custom messagebox instead of standard messagebox
         custom_result = self.show_custom_messagebox_with_result(
@@ -1796,17 +2550,26 @@ class GameXMLEditor:
         if not custom_result:
             return
         
-        # First save as readable XML
-        self.save_file()
+        # First save as readable XML; a failed or cancelled save leaves nothing to convert
+        if not self.save_file():
+            return
+        
+        def on_done(success, message):
+            if success:
+                self.show_custom_messagebox("Saved as Binary", message, "info")
+                self.status_var.set("Saved in binary format")
+            else:
+                self.show_custom_messagebox("Save Error", message, "error")
         
         # Then convert to binary
-        success, message = self.converter.save_as_binary(self.current_file)
+        if self.async_converter is None:
+            on_done(*self.converter.save_as_binary(self.current_file))
+            return
         
-        if success:
-            self.show_custom_messagebox("Saved as Binary", message, "info")
-            self.status_var.set("Saved in binary format")
-        else:
-            self.show_custom_messagebox("Save Error", message, "error")
+        self.run_conversion_job(
+            self.async_converter.save_as_binary(self.current_file, self.conversion_progress("Saving as binary")),
+            "Save as binary", on_done
+        )
 
     def show_custom_messagebox_with_result(self, title, message, msg_type="info"):
         """Show a custom dark-themed message box that returns a result"""
@@ -1907,17 +2670,27 @@ class GameXMLEditor:
         
         # Show progress
         self.status_var.set("Converting to readable format...")
-        self.root.update()
+        file_path = self.current_file
         
-        success, message = self.converter.convert_to_readable(self.current_file)
+        def on_done(success, message):
+            if success:
+                # Reload the file to show readable format
+                self.load_file(file_path)
+                self.show_custom_messagebox("Conversion Successful", message, "info")
+            else:
+                self.show_custom_messagebox("Conversion Failed", message, "error")
+                self.status_var.set("Conversion failed")
         
-        if success:
-            # Reload the file to show readable format
-            self.load_file(self.current_file)
-            self.show_custom_messagebox("Conversion Successful", message, "info")
-        else:
-            self.show_custom_messagebox("Conversion Failed", message, "error")
-            self.status_var.set("Conversion failed")
+        # Run in the background so the window stays responsive
+        if self.async_converter is None:
+            self.root.update()
+            on_done(*self.converter.convert_to_readable(file_path))
+            return
+        
+        self.run_conversion_job(
+            self.async_converter.convert_to_readable(file_path, self.conversion_progress("Converting to readable")),
+            "Conversion", on_done
+        )
     
     def expand_all(self):
         """Expand all tree items with progress indication"""
@@ -1929,12 +2702,12 @@ class GameXMLEditor:
         self.status_var.set("All elements expanded")
     
     def expand_all_recursive(self, item):
-        """Recursively expand tree items"""
-        if item:
-            self.tree.item(item, open=True)
-        
-        for child in self.tree.get_children(item):
-            self.expand_all_recursive(child)
+        """Expand an item and everything below it"""
+        # Populating an item before its children are fetched lets the walk see them
+        for node, depth in preorder(item, self.tree.get_children):
+            if node:
+                self.populate_tree_item(node, all_children=True)
+                self.tree.item(node, open=True)
     
     def collapse_all(self):
         """Collapse all tree items with progress indication"""
@@ -1946,35 +2719,64 @@ class GameXMLEditor:
         self.status_var.set("All elements collapsed")
     
     def collapse_all_recursive(self, item):
-        """Recursively collapse tree items"""
-        for child in self.tree.get_children(item):
-            self.collapse_all_recursive(child)
-            self.tree.item(child, open=False)
+        """Collapse everything below an item"""
+        for node, depth in preorder(item, self.tree.get_children):
+            if node != item:
+                self.tree.item(node, open=False)
     
     def show_find_dialog(self):
-        """Show find dialog with enhanced search capabilities"""
+        """Show the find-in-tree panel, which searches the document index"""
         if not self.tree_data:
             self.show_custom_messagebox("No File", "No file is currently loaded.", "warning")
             return
         
-        dialog = FindDialog(self.root, self.tree)
-        self.root.wait_window(dialog.dialog)
+        if self.compact:
+            self.show_custom_messagebox("Search Unavailable",
+                                        "Files opened in the compact model are not indexed for search.", "info")
+            return
+        
+        if self.find_dialog is not None and self.find_dialog.is_open():
+            self.find_dialog.show()
+            return
+        
+        from config import SEARCH_SETTINGS
+        self.find_dialog = FindDialog(
+            self.root,
+            lambda query, fields, prefix, limit: self.document_index.search(query, fields, prefix, limit),
+            self.reveal_element,
+            SEARCH_SETTINGS["max_results"] or 500
+        )
+    
+    def reveal_element(self, element):
+        """Select an element in the tree, populating lazily loaded items on the way"""
+        path = self.document_index.path(element)
+        roots = self.tree.get_children()
+        # Compared with ==: compact document views are equal, not identical, per element
+        if not path or not roots or self.element_map.get(roots[0]) != path[0]:
+            self.status_var.set("Element is no longer in the document")
+            return False
+        
+        item = roots[0]
+        for parent, child in zip(path, path[1:]):
+            position = list(parent).index(child)
+            while True:
+                children = self.tree.get_children(item)
+                if position < len(children) and self.element_map.get(children[position]) == child:
+                    break
+                if item not in self.tree_pending:
+                    return False
+                self.populate_tree_item(item)
+            self.tree.item(item, open=True)
+            item = children[position]
+        
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+        self.tree.see(item)
+        return True
     
     def indent_xml(self, elem, level=0):
         """Add pretty-printing indentation to XML"""
-        i = "\n" + level * "  "
-        if len(elem):
-            if not elem.text or not elem.text.strip():
-                elem.text = i + "  "
-            if not elem.tail or not elem.tail.strip():
-                elem.tail = i
-            for child in elem:
-                self.indent_xml(child, level + 1)
-            if not child.tail or not child.tail.strip():
-                child.tail = i
-        else:
-            if level and (not elem.tail or not elem.tail.strip()):
-                elem.tail = i
+        indent(elem, "  ", level)
     
     def run(self):
         """Start the application with enhanced window management"""
@@ -1996,10 +2798,19 @@ class GameXMLEditor:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # Start the main loop
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self.autosave is not None:
+                self.autosave.close()
+            if self.async_runner is not None:
+                self.async_runner.stop()
+            if self.converter_pool is not None:
+                self.converter_pool.shutdown()
     
     def on_closing(self):
         """Handle application closing with unsaved changes check"""
+        self.ui_scheduler.flush_all()
         if self.is_modified or self.source_modified:
             if self.source_modified:
                 message = "You have unsaved changes in the XML source. Do you want to save before closing?"
@@ -2017,6 +2828,8 @@ class GameXMLEditor:
                 if not self.is_modified and not self.source_modified:  # Only close if save was successful
                     self.root.destroy()
             elif result == "no":  # No - close without saving
+                if self.autosave is not None:
+                    self.autosave.discard()
                 self.root.destroy()
             # Cancel - do nothing, keep window open
         else:
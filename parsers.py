@@ -0,0 +1,271 @@
+"""
+Interchangeable XML parser backends
+
+etree       ElementTree's C parser, fed in chunks (the default)
+iterparse   the same parser driven through pull events; statistics and the
+            search index are built while the tree is, instead of in two
+            more passes over it afterwards
+lxml        libxml2, if lxml is installed; it also records the line each
+            element starts on. Its tree is copied into ElementTree
+            elements, which is what the rest of the editor works on.
+compact     straight into a CompactDocument's flat arrays, several times
+            smaller than ElementTree. Statistics are counted from the
+            arrays and no search index is built. The editor edits text and
+            attributes of these documents (compact) but not their structure.
+
+get_parser() picks a backend from PARSER_SETTINGS, by file size when set
+to "auto". scan_statistics() streams a file with element clearing to count
+it in bounded memory, without keeping a tree.
+"""
+
+import gc
+import logging
+import os
+import xml.etree.ElementTree as ET
+
+from compact_document import CompactDocument, CompactIndex
+from doc_stats import DocumentStatistics
+from document_index import DocumentIndex
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_AUTO = "auto"
+BACKEND_ETREE = "etree"
+BACKEND_ITERPARSE = "iterparse"
+BACKEND_LXML = "lxml"
+BACKEND_COMPACT = "compact"
+
+# Bytes fed to the XML parser between cancellation checks
+PARSE_CHUNK_SIZE = 256 * 1024
+
+
+class ParsedDocument:
+    """A parsed tree and whatever the backend worked out along the way"""
+
+    def __init__(self, tree, statistics=None, index=None, lines=None):
+        self.tree = tree
+        self.statistics = statistics  # DocumentStatistics, if counted while parsing
+        self.index = index            # DocumentIndex, if built while parsing
+        self.lines = lines            # element -> line in the file, if known
+
+
+def _feed(parser, filename, job=None, progress=None, after_chunk=None):
+    """Feed a file to parser in chunks, honouring cancellation and reporting progress"""
+    total = os.path.getsize(filename) or 1
+    done = 0
+    with open(filename, "rb") as f:
+        while True:
+            if job is not None:
+                job.check()
+            chunk = f.read(PARSE_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            if after_chunk is not None:
+                after_chunk()
+            done += len(chunk)
+            if progress is not None:
+                progress(done / total)
+
+
+class ElementTreeParser:
+    """xml.etree.ElementTree, parsing the file in chunks"""
+
+    name = BACKEND_ETREE
+    compact = False  # documents from this backend are fully editable
+
+    def parse_file(self, filename, job=None, progress=None):
+        """Parse a file into a ParsedDocument; job (a LoadJob) can cancel it between chunks"""
+        parser = ET.XMLParser(target=ET.TreeBuilder())
+        _feed(parser, filename, job, progress)
+        return ParsedDocument(ET.ElementTree(parser.close()))
+
+    def parse_string(self, text):
+        """Parse XML text into an element; raises ET.ParseError"""
+        return ET.fromstring(text)
+
+
+class IterparseParser(ElementTreeParser):
+    """ElementTree pull events, counting and indexing elements as they are parsed"""
+
+    name = BACKEND_ITERPARSE
+
+    def parse_file(self, filename, job=None, progress=None):
+        parser = ET.XMLPullParser(events=("start", "end"))
+        statistics = DocumentStatistics()
+        index = DocumentIndex()
+        open_elements = []
+        roots = []
+
+        def consume():
+            for event, element in parser.read_events():
+                if event == "start":
+                    parent = open_elements[-1] if open_elements else None
+                    if parent is None:
+                        roots.append(element)
+                    index.add_node(element, parent)
+                    statistics.add_element(element, len(open_elements))
+                    open_elements.append(element)
+                else:
+                    # Text is only complete once the element has ended
+                    open_elements.pop()
+                    index.add_element(element)
+
+        # As in DocumentIndex.build, the index's containers pile up faster
+        # with the cycle collector paused
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            _feed(parser, filename, job, progress, consume)
+            parser.close()
+            consume()
+        finally:
+            if collecting:
+                gc.enable()
+
+        root = roots[0]
+        index.finish(root)
+        # A fresh count replaces every row anyway
+        statistics.take_changed_tags()
+        return ParsedDocument(ET.ElementTree(root), statistics, index)
+
+
+class LxmlParser(ElementTreeParser):
+    """lxml (libxml2), recording each element's line number"""
+
+    name = BACKEND_LXML
+
+    def _parser(self):
+        # Comments and processing instructions are dropped, as ElementTree does
+        return lxml_etree.XMLParser(huge_tree=True, remove_comments=True, remove_pis=True)
+
+    def parse_file(self, filename, job=None, progress=None):
+        parser = self._parser()
+        _feed(parser, filename, job, progress)
+        try:
+            source_root = parser.close()
+        except lxml_etree.XMLSyntaxError as e:
+            raise _parse_error(e)
+        lines = {}
+        return ParsedDocument(ET.ElementTree(_copy_tree(source_root, lines)), lines=lines)
+
+    def parse_string(self, text):
+        try:
+            # lxml refuses str input that carries an encoding declaration
+            source_root = lxml_etree.fromstring(text.encode("utf-8"), self._parser())
+        except lxml_etree.XMLSyntaxError as e:
+            raise _parse_error(e)
+        return _copy_tree(source_root)
+
+
+class CompactParser(ElementTreeParser):
+    """ElementTree's parser building a CompactDocument instead of elements"""
+
+    name = BACKEND_COMPACT
+    compact = True
+
+    def parse_file(self, filename, job=None, progress=None):
+        parser = ET.XMLParser(target=CompactDocument().builder())
+        _feed(parser, filename, job, progress)
+        document = parser.close()
+        return ParsedDocument(document, document.statistics(), CompactIndex(document))
+
+
+def _parse_error(error):
+    """An lxml syntax error as the ET.ParseError the editor handles"""
+    parse_error = ET.ParseError(str(error))
+    parse_error.code = error.code
+    parse_error.position = error.position
+    return parse_error
+
+
+def _copy_tree(source_root, lines=None):
+    """Copy an lxml tree into ElementTree elements, noting line numbers in lines"""
+    Element = ET.Element
+    root = Element(source_root.tag, dict(source_root.attrib))
+    root.text = source_root.text
+    stack = [(source_root, root)]
+    while stack:
+        source, target = stack.pop()
+        if lines is not None:
+            lines[target] = source.sourceline
+        append = target.append
+        for source_child in source:
+            child = Element(source_child.tag, dict(source_child.attrib))
+            child.text = source_child.text
+            child.tail = source_child.tail
+            append(child)
+            if len(source_child) or lines is not None:
+                stack.append((source_child, child))
+    return root
+
+
+BACKENDS = {
+    BACKEND_ETREE: ElementTreeParser,
+    BACKEND_ITERPARSE: IterparseParser,
+    BACKEND_LXML: LxmlParser,
+    BACKEND_COMPACT: CompactParser,
+}
+
+
+def available_backends():
+    """Names of the backends usable in this installation"""
+    return [name for name in BACKENDS if name != BACKEND_LXML or lxml_etree is not None]
+
+
+def choose_backend(filename=None):
+    """Backend name for a file (or for strings, without a filename) from PARSER_SETTINGS"""
+    from config import PARSER_SETTINGS
+
+    backend = PARSER_SETTINGS.get("backend", BACKEND_AUTO)
+    if backend == BACKEND_AUTO:
+        size = os.path.getsize(filename) if filename and os.path.exists(filename) else 0
+        compact_min_mb = PARSER_SETTINGS.get("compact_min_mb", 0)
+        if compact_min_mb and size >= compact_min_mb * 1024 * 1024:
+            return BACKEND_COMPACT
+        if lxml_etree is not None and PARSER_SETTINGS.get("prefer_lxml", False):
+            return BACKEND_LXML
+        if size >= PARSER_SETTINGS.get("iterparse_min_mb", 8) * 1024 * 1024:
+            return BACKEND_ITERPARSE
+        return BACKEND_ETREE
+
+    if backend not in available_backends():
+        logger.warning("XML parser backend %r is not available, using %s", backend, BACKEND_ETREE)
+        return BACKEND_ETREE
+    return backend
+
+
+def get_parser(filename=None, backend=None):
+    """A parser instance: the named backend, or the configured choice for filename"""
+    return BACKENDS[backend or choose_backend(filename)]()
+
+
+def scan_statistics(filename):
+    """Count a file's elements in one streaming pass, clearing each one as it ends
+
+    Memory stays bounded by the depth of the document rather than its size.
+    Returns a DocumentStatistics; raises ET.ParseError for malformed files.
+    """
+    statistics = DocumentStatistics()
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(filename, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            statistics.add_element(element, depth)
+            depth += 1
+        else:
+            depth -= 1
+            element.clear()
+            if depth == 1:
+                # The root still holds its finished (cleared) children
+                del root[:]
+    statistics.take_changed_tags()
+    statistics.read_file(filename)
+    return statistics
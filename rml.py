@@ -0,0 +1,399 @@
+"""
+Native reader/writer for Dunia XmlResourceFile (.rml / binary .game.xml) data
+
+Layout (all integers little endian):
+    u8      magic (always 0)
+    u8      unknown flag byte (preserved on round trips)
+    packed  string table size in bytes
+    packed  total node count
+    packed  total attribute count
+    nodes   pre-order: name, value, attribute count, child count (packed),
+            then (name, value) string offsets for each attribute,
+            then the child nodes
+    bytes   string table of NUL-terminated UTF-8 strings
+
+A packed value is a single byte when below 0xFF, otherwise 0xFF followed
+by a u32.
+"""
+
+import mmap
+import os
+import struct
+import xml.etree.ElementTree as ET
+
+RML_MAGIC = b"\x00"
+CODEC_VERSION = 1
+
+# Streaming decoder event names
+EVENT_START = "start"
+EVENT_ATTRIBUTE = "attribute"
+EVENT_TEXT = "text"
+EVENT_END = "end"
+ALL_EVENTS = (EVENT_START, EVENT_ATTRIBUTE, EVENT_TEXT, EVENT_END)
+
+# Decoded strings kept by the streaming decoder before its cache is reset
+STRING_CACHE_LIMIT = 65536
+
+
+class RMLFormatError(ValueError):
+    """Raised when data is not a valid RML resource"""
+
+
+def _read_packed(data, offset):
+    """Read a packed u32 and return (value, new_offset)"""
+    try:
+        value = data[offset]
+    except IndexError:
+        raise RMLFormatError("Unexpected end of data") from None
+    if value < 0xFF:
+        return value, offset + 1
+    if offset + 5 > len(data):
+        raise RMLFormatError("Unexpected end of data")
+    return struct.unpack_from("<I", data, offset + 1)[0], offset + 5
+
+
+def _write_packed(out, value):
+    """Append a packed u32 to a bytearray"""
+    if value < 0xFF:
+        out.append(value)
+    else:
+        out.append(0xFF)
+        out += struct.pack("<I", value)
+
+
+def is_rml(data):
+    """Check if the given bytes start like an RML resource"""
+    return len(data) >= 2 and data[:1] == RML_MAGIC
+
+
+def read_header(data):
+    """Parse the RML header and return (unknown1, string_table_size, node_count, attr_count, offset)"""
+    if not is_rml(data):
+        raise RMLFormatError("Not an XML resource file (bad magic)")
+    unknown1 = data[1]
+    offset = 2
+    string_table_size, offset = _read_packed(data, offset)
+    node_count, offset = _read_packed(data, offset)
+    attr_count, offset = _read_packed(data, offset)
+    return unknown1, string_table_size, node_count, attr_count, offset
+
+
+def read_string_table(data, start, size):
+    """Build an offset -> string lookup for the string table at data[start:start+size]"""
+    if start + size != len(data):
+        raise RMLFormatError(
+            f"String table size mismatch: expected {size} bytes, found {len(data) - start}")
+    table = {}
+    position = 0
+    raw = bytes(data[start:start + size])
+    while position < size:
+        end = raw.find(b"\x00", position)
+        if end == -1:
+            raise RMLFormatError("Unterminated string in string table")
+        table[position] = raw[position:end].decode("utf-8")
+        position = end + 1
+    return table
+
+
+def decode(data):
+    """Decode RML bytes into an ElementTree root element"""
+    return decode_document(data)[0]
+
+
+def decode_document(data):
+    """Decode RML bytes and return (root_element, unknown1)"""
+    unknown1, string_table_size, node_count, attr_count, offset = read_header(data)
+
+    # Node records reference the string table at the end of the file,
+    # so collect offsets first and resolve them afterwards
+    pending = []
+    stack = []  # [element, remaining_children]
+    root = None
+    seen_nodes = 0
+    seen_attrs = 0
+
+    while True:
+        name_index, offset = _read_packed(data, offset)
+        value_index, offset = _read_packed(data, offset)
+        attribute_count, offset = _read_packed(data, offset)
+        child_count, offset = _read_packed(data, offset)
+
+        attributes = []
+        for _ in range(attribute_count):
+            attr_name, offset = _read_packed(data, offset)
+            attr_value, offset = _read_packed(data, offset)
+            attributes.append((attr_name, attr_value))
+
+        element = ET.Element("_")
+        pending.append((element, name_index, value_index, attributes))
+        seen_nodes += 1
+        seen_attrs += attribute_count
+
+        if stack:
+            stack[-1][0].append(element)
+            stack[-1][1] -= 1
+        else:
+            root = element
+
+        if child_count:
+            stack.append([element, child_count])
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+        if not stack:
+            break
+
+    if seen_nodes != node_count or seen_attrs != attr_count:
+        raise RMLFormatError(
+            f"Count mismatch: header says {node_count} nodes/{attr_count} attributes, "
+            f"found {seen_nodes}/{seen_attrs}")
+
+    strings = read_string_table(data, offset, string_table_size)
+
+    try:
+        for element, name_index, value_index, attributes in pending:
+            element.tag = strings[name_index]
+            value = strings[value_index]
+            if value:
+                element.text = value
+            for attr_name, attr_value in attributes:
+                element.set(strings[attr_name], strings[attr_value])
+    except KeyError as e:
+        raise RMLFormatError(f"Invalid string table offset: {e}") from None
+
+    return root, unknown1
+
+
+def _node_value(element):
+    """Get the RML value of an element (whitespace-only text is formatting, not data)"""
+    text = element.text or ""
+    if not text.strip():
+        return ""
+    return text
+
+
+def encode(root, unknown1=0):
+    """Encode an ElementTree element into RML bytes"""
+    if isinstance(root, ET.ElementTree):
+        root = root.getroot()
+
+    string_offsets = {}
+    string_table = bytearray()
+
+    def add_string(value):
+        offset = string_offsets.get(value)
+        if offset is None:
+            offset = len(string_table)
+            string_offsets[value] = offset
+            string_table.extend(value.encode("utf-8"))
+            string_table.append(0)
+        return offset
+
+    nodes = bytearray()
+    node_count = 0
+    attr_count = 0
+
+    # Explicit pre-order walk so deep documents don't hit the recursion limit
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        node_count += 1
+        attr_count += len(element.attrib)
+
+        _write_packed(nodes, add_string(element.tag))
+        _write_packed(nodes, add_string(_node_value(element)))
+        _write_packed(nodes, len(element.attrib))
+        _write_packed(nodes, len(element))
+        for name, value in element.attrib.items():
+            _write_packed(nodes, add_string(name))
+            _write_packed(nodes, add_string(value))
+
+        stack.extend(reversed(element))
+
+    out = bytearray(RML_MAGIC)
+    out.append(unknown1 & 0xFF)
+    _write_packed(out, len(string_table))
+    _write_packed(out, node_count)
+    _write_packed(out, attr_count)
+    out += nodes
+    out += string_table
+    return bytes(out)
+
+
+def to_xml_bytes(root, encoding="utf-8"):
+    """Serialize a decoded element as indented readable XML"""
+    ET.indent(root, space="  ")
+    body = ET.tostring(root, encoding="unicode")
+    return (f'<?xml version="1.0" encoding="{encoding}"?>\n' + body + "\n").encode(encoding)
+
+
+def roundtrip_matches(data):
+    """Check that decoding and re-encoding reproduces the input byte-for-byte"""
+    root, unknown1 = decode_document(data)
+    return encode(root, unknown1) == bytes(data)
+
+
+class _LazyStringTable:
+    """Resolves string table offsets on demand instead of decoding the whole table"""
+
+    def __init__(self, data, start, size):
+        self.data = data
+        self.start = start
+        self.size = size
+        self.cache = {}
+
+    def get(self, offset):
+        value = self.cache.get(offset)
+        if value is not None:
+            return value
+        if offset >= self.size:
+            raise RMLFormatError(f"Invalid string table offset: {offset}")
+
+        end = self.data.find(b"\x00", self.start + offset, self.start + self.size)
+        if end == -1:
+            raise RMLFormatError("Unterminated string in string table")
+        value = self.data[self.start + offset:end].decode("utf-8")
+
+        if len(self.cache) >= STRING_CACHE_LIMIT:
+            self.cache.clear()
+        self.cache[offset] = value
+        return value
+
+
+def _open_source(source):
+    """Get a sliceable buffer for bytes or a file path (memory-mapped) plus its closer"""
+    if isinstance(source, (bytes, bytearray)):
+        return source, None
+    if isinstance(source, memoryview):
+        return source.tobytes(), None
+
+    f = open(source, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise RMLFormatError("Not an XML resource file (empty)")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except BaseException:
+        f.close()
+        raise
+
+    def close():
+        data.close()
+        f.close()
+    return data, close
+
+
+def iterdecode(source, events=ALL_EVENTS):
+    """Yield (event, value) pairs while decoding RML without building a tree
+
+    source is RML bytes or a file path, which is memory-mapped. Events are:
+        ("start", tag), ("attribute", (name, value)), ("text", value), ("end", tag)
+    Memory use grows with the depth of the tree, not the size of the file.
+    """
+    wanted_start = EVENT_START in events
+    wanted_attribute = EVENT_ATTRIBUTE in events
+    wanted_text = EVENT_TEXT in events
+    wanted_end = EVENT_END in events
+
+    data, close = _open_source(source)
+    try:
+        unknown1, string_table_size, node_count, attr_count, offset = read_header(data)
+        table_start = len(data) - string_table_size
+        if table_start < offset:
+            raise RMLFormatError("String table size is larger than the file")
+        strings = _LazyStringTable(data, table_start, string_table_size)
+
+        open_elements = []  # [tag, remaining_children]
+        while True:
+            if offset >= table_start:
+                raise RMLFormatError("Node data runs into the string table")
+
+            name_index, offset = _read_packed(data, offset)
+            value_index, offset = _read_packed(data, offset)
+            attribute_count, offset = _read_packed(data, offset)
+            child_count, offset = _read_packed(data, offset)
+
+            tag = strings.get(name_index)
+            if wanted_start:
+                yield EVENT_START, tag
+
+            for _ in range(attribute_count):
+                attr_name, offset = _read_packed(data, offset)
+                attr_value, offset = _read_packed(data, offset)
+                if wanted_attribute:
+                    yield EVENT_ATTRIBUTE, (strings.get(attr_name), strings.get(attr_value))
+
+            if wanted_text:
+                value = strings.get(value_index)
+                if value:
+                    yield EVENT_TEXT, value
+
+            if open_elements:
+                open_elements[-1][1] -= 1
+
+            if child_count:
+                open_elements.append([tag, child_count])
+            elif wanted_end:
+                yield EVENT_END, tag
+
+            while open_elements and open_elements[-1][1] == 0:
+                closed_tag = open_elements.pop()[0]
+                if wanted_end:
+                    yield EVENT_END, closed_tag
+            if not open_elements:
+                break
+    finally:
+        if close is not None:
+            close()
+
+
+def iterparse(source):
+    """Yield ("start", element) and ("end", element) like ElementTree.iterparse
+
+    Elements are attached to their parents as they are decoded, so a consumer
+    can show partial results early, or call element.clear() on "end" to keep
+    memory bounded.
+    """
+    stack = []
+    pending = None  # element whose start event waits for its attributes and text
+    for event, value in iterdecode(source):
+        if event == EVENT_ATTRIBUTE:
+            pending.set(*value)
+        elif event == EVENT_TEXT:
+            pending.text = value
+        else:
+            if pending is not None:
+                yield EVENT_START, pending
+                pending = None
+            if event == EVENT_START:
+                element = ET.Element(value)
+                if stack:
+                    stack[-1].append(element)
+                stack.append(element)
+                pending = element
+            else:
+                yield EVENT_END, stack.pop()
+
+
+def scan(source, tag_filter=None):
+    """Count nodes, attributes, depth and tags of an RML file in one streaming pass"""
+    nodes = attributes = depth = max_depth = 0
+    tags = {}
+    matches = 0
+    for event, value in iterdecode(source, (EVENT_START, EVENT_ATTRIBUTE, EVENT_END)):
+        if event == EVENT_START:
+            nodes += 1
+            depth += 1
+            max_depth = max(max_depth, depth)
+            tags[value] = tags.get(value, 0) + 1
+            if tag_filter is not None and value == tag_filter:
+                matches += 1
+        elif event == EVENT_ATTRIBUTE:
+            attributes += 1
+        else:
+            depth -= 1
+    return {
+        "elements": nodes,
+        "attributes": attributes,
+        "max_depth": max_depth - 1 if max_depth else 0,
+        "tags": tags,
+        "matches": matches
+    }
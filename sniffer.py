@@ -0,0 +1,88 @@
+"""
+Cheap file format detection from the first few bytes of a file
+"""
+
+import os
+
+from config import is_excluded_file, is_supported_file
+from fcb import FCB_MAGIC
+from rml import RML_MAGIC
+
+FORMAT_RML = "rml"
+FORMAT_XML = "xml"
+FORMAT_FCB = "fcb"
+FORMAT_UNKNOWN = "unknown"
+
+# Enough to get past a BOM and leading whitespace in practice
+SNIFF_SIZE = 64
+
+_BOMS = (
+    (b"\xef\xbb\xbf", "utf-8"),
+    (b"\xff\xfe", "utf-16-le"),
+    (b"\xfe\xff", "utf-16-be"),
+)
+
+
+def sniff_bytes(head):
+    """Classify data as binary RML, binary object (.fcb), readable XML or unknown from its first bytes"""
+    if not head:
+        return FORMAT_UNKNOWN
+
+    if head.startswith(FCB_MAGIC):
+        return FORMAT_FCB
+
+    # Byte order marks only appear in front of text
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            text = head[len(bom):].decode(encoding, errors="ignore").lstrip()
+            return FORMAT_XML if text.startswith("<") else FORMAT_UNKNOWN
+
+    if head.startswith(RML_MAGIC):
+        # UTF-16 BE XML without a BOM also starts with a NUL byte
+        if head[1:2] == b"<":
+            return FORMAT_XML
+        return FORMAT_RML if len(head) >= 2 else FORMAT_UNKNOWN
+
+    # UTF-16 LE XML without a BOM
+    if head[:2] == b"<\x00":
+        return FORMAT_XML
+
+    if head.lstrip(b" \t\r\n").startswith(b"<"):
+        return FORMAT_XML
+
+    return FORMAT_UNKNOWN
+
+
+def sniff_file(file_path, size=SNIFF_SIZE):
+    """Classify a file by reading only its first bytes"""
+    with open(file_path, "rb") as f:
+        head = f.read(size)
+
+    result = sniff_bytes(head)
+    if result == FORMAT_UNKNOWN and len(head) == size and not head.strip(b" \t\r\n"):
+        # Lots of leading whitespace, keep reading until real content shows up
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(4096)
+                if not chunk:
+                    break
+                stripped = chunk.lstrip(b" \t\r\n")
+                if stripped:
+                    return sniff_bytes(stripped)
+    return result
+
+
+def classify_directory(root_dir, supported_only=True):
+    """Classify every file below root_dir without parsing, returning {path: format}"""
+    results = {}
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(dirpath, filename)
+            if supported_only and (not is_supported_file(file_path) or is_excluded_file(file_path)):
+                continue
+            try:
+                results[file_path] = sniff_file(file_path)
+            except OSError:
+                results[file_path] = FORMAT_UNKNOWN
+    return results
@@ -0,0 +1,452 @@
+"""
+Element-to-source mapping for patching the XML source view in place
+
+render_document() produces the same text as the editor's pretty-printed
+ET.tostring() output and, alongside it, a SourceMap holding each
+element's character range. After an edit, SourceMap.patch() re-serializes
+just that element and reports which range of the old text to replace.
+Later elements are shifted through a Fenwick tree, so each patch costs
+O(size of the element + log n) rather than a full re-render.
+"""
+
+import xml.etree.ElementTree as ET
+# Same escaping as ET.tostring, so patched text matches a full refresh
+from xml.etree.ElementTree import _escape_attrib, _escape_cdata
+
+from tree_walk import indent
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+# Patched-in pieces of the source text kept before they are joined into one string
+MAX_TEXT_PIECES = 256
+
+
+class UnsupportedDocument(ValueError):
+    """Raised for documents this serializer doesn't map (namespaces, comments)"""
+
+
+def _check_name(name):
+    if not isinstance(name, str) or name.startswith("{"):
+        raise UnsupportedDocument(f"Cannot map element {name!r}")
+    return name
+
+
+def _render(root, base, include_tail, on_element):
+    """Serialize root like ET.tostring and return the list of text pieces
+
+    on_element(element, depth, offset) is called twice per element: at the
+    offset where it starts and at the offset where it ends (before its tail).
+    Offsets count from base.
+    """
+    parts = []
+    position = base
+    # (element, depth, closing)
+    stack = [(root, 0, False)]
+    while stack:
+        element, depth, closing = stack.pop()
+        tag = element.tag
+        if closing:
+            piece = "</" + tag + ">"
+            parts.append(piece)
+            position += len(piece)
+            on_element(element, depth, position)
+        else:
+            _check_name(tag)
+            on_element(element, depth, position)
+            piece = "<" + tag
+            for name, value in element.items():
+                piece += f' {_check_name(name)}="{_escape_attrib(value)}"'
+            text = element.text
+            if text or len(element):
+                piece += ">"
+                if text:
+                    piece += _escape_cdata(text)
+                parts.append(piece)
+                position += len(piece)
+                stack.append((element, depth, True))
+                for child in reversed(element):
+                    stack.append((child, depth + 1, False))
+                continue
+            piece += " />"
+            parts.append(piece)
+            position += len(piece)
+            on_element(element, depth, position)
+
+        # The tail follows the element's closing tag; the top element's tail
+        # only belongs to the output for a whole document
+        if element.tail and (depth or include_tail):
+            piece = _escape_cdata(element.tail)
+            parts.append(piece)
+            position += len(piece)
+    return parts
+
+
+class _Fenwick:
+    """Prefix sums with point updates, used to shift ranges after a patch"""
+
+    def __init__(self, size):
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        """Add delta to every position >= index"""
+        index += 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def total(self, index):
+        """Sum of deltas applied at positions <= index"""
+        index += 1
+        result = 0
+        while index > 0:
+            result += self.tree[index]
+            index -= index & -index
+        return result
+
+
+class SourceMap:
+    """Character ranges of every element in the rendered source
+
+    The map also keeps the text it describes, as a list of slices of the
+    rendered string plus patched-in pieces, so patches don't copy it.
+    """
+
+    def __init__(self, space="  "):
+        self.space = space
+        self.order = {}     # element -> preorder number
+        self.elements = []  # preorder number -> element
+        self.starts = []    # preorder number -> start offset, before shifts
+        self.ends = []      # preorder number -> end offset, before shifts
+        self.last = []      # preorder number -> preorder number of its last descendant
+        self.depths = []
+        self.parents = []
+        self.shifts = _Fenwick(0)
+        self.end_adjustments = {}  # preorder number -> growth from patches inside it
+        self._pieces = []   # (string, start, end) slices making up the text
+
+    def __contains__(self, element):
+        return element in self.order
+
+    def __len__(self):
+        return len(self.order)
+
+    def _span(self, number):
+        shift = self.shifts.total(number)
+        # Patches inside the element moved its end but not its start
+        end = self.ends[number] + shift + self.end_adjustments.get(number, 0)
+        return self.starts[number] + shift, end
+
+    def span(self, element):
+        """Current (start, end) offsets of an element in the source text"""
+        return self._span(self.order[element])
+
+    def parent(self, element):
+        number = self.parents[self.order[element]]
+        return self.elements[number] if number != -1 else None
+
+    def depth(self, element):
+        return self.depths[self.order[element]]
+
+    def innermost(self, start, end):
+        """Deepest element strictly containing start:end, or None if no element does
+
+        A range touching an element's first or last character is left to its
+        parent, since the edit may have moved the element's boundary.
+        """
+        # Last element (in document order) starting before start;
+        # the element wanted is it or one of its ancestors
+        low, high = 0, len(self.elements)
+        while low < high:
+            middle = (low + high) // 2
+            if self.starts[middle] + self.shifts.total(middle) < start:
+                low = middle + 1
+            else:
+                high = middle
+        number = low - 1
+        while number != -1:
+            element_start, element_end = self._span(number)
+            if element_start < start and end < element_end:
+                return self.elements[number]
+            number = self.parents[number]
+        return None
+
+    def text(self):
+        """The source text the map describes"""
+        if len(self._pieces) != 1:
+            text = "".join(string[start:end] for string, start, end in self._pieces)
+            self._pieces = [(text, 0, len(text))]
+        string, start, end = self._pieces[0]
+        return string[start:end] if (start, end) != (0, len(string)) else string
+
+    def _replace_text(self, start, end, text):
+        pieces = []
+        position = 0
+        inserted = False
+        for string, piece_start, piece_end in self._pieces:
+            offset = position
+            position += piece_end - piece_start
+            if position <= start:
+                pieces.append((string, piece_start, piece_end))
+                continue
+            if offset < start:
+                pieces.append((string, piece_start, piece_start + start - offset))
+            if not inserted:
+                pieces.append((text, 0, len(text)))
+                inserted = True
+            if position > end:
+                pieces.append((string, piece_start + max(end - offset, 0), piece_end))
+        if not inserted:
+            pieces.append((text, 0, len(text)))
+        self._pieces = [piece for piece in pieces if piece[2] > piece[1]]
+        if len(self._pieces) > MAX_TEXT_PIECES:
+            self.text()
+
+    def build(self, root, base=0, prefix=""):
+        """Render a whole document and record every element's range
+
+        prefix (base characters long) is text preceding the root, such as the XML declaration.
+        """
+        order, elements = self.order, self.elements
+        starts, ends, last, depths, parents = self.starts, self.ends, self.last, self.depths, self.parents
+        open_numbers = []
+
+        def on_element(element, depth, position):
+            number = order.get(element)
+            if number is None:
+                number = len(starts)
+                order[element] = number
+                elements.append(element)
+                starts.append(position)
+                ends.append(position)
+                last.append(number)
+                depths.append(depth)
+                parents.append(open_numbers[-1] if open_numbers else -1)
+                open_numbers.append(number)
+            else:
+                ends[number] = position
+                last[number] = len(starts) - 1
+                open_numbers.pop()
+
+        text = prefix + "".join(_render(root, base, True, on_element))
+        self.shifts = _Fenwick(len(starts))
+        self.end_adjustments = {}
+        self._pieces = [(text, 0, len(text))]
+        return text
+
+    def _reindent(self, element, depth):
+        # Re-apply indentation to the element as a full refresh would,
+        # without touching its tail, which lives in the parent's content
+        tail = element.tail
+        indent(element, self.space, depth)
+        element.tail = tail
+
+    def _grow(self, after, parent, delta):
+        # Everything from number after on moves; the enclosing elements only grow or shrink
+        self.shifts.add(after, delta)
+        while parent != -1:
+            self.end_adjustments[parent] = self.end_adjustments.get(parent, 0) + delta
+            parent = self.parents[parent]
+
+    def patch(self, element):
+        """Re-render an edited element (same children as before)
+
+        Returns (old_start, old_end, new_text): replace old_start:old_end
+        of the current source text with new_text.
+        """
+        number = self.order[element]
+        old_start, old_end = self.span(element)
+        self._reindent(element, self.depths[number])
+
+        new_spans = []
+
+        def on_element(node, depth, position):
+            new_spans.append((node, position))
+
+        text = "".join(_render(element, old_start, False, on_element))
+        delta = len(text) - (old_end - old_start)
+
+        # The element must still have the descendants it was rendered with
+        last = self.last[number]
+        numbers = [self.order.get(node) for node, position in new_spans]
+        if len(numbers) != 2 * (last - number + 1) or any(
+                node_number is None or not number <= node_number <= last for node_number in numbers):
+            raise UnsupportedDocument("Element children changed since the source was rendered")
+
+        # Store the new offsets net of the shifts already applied to them
+        seen = set()
+        for node_number, (node, position) in zip(numbers, new_spans):
+            base = position - self.shifts.total(node_number)
+            if node_number in seen:
+                self.ends[node_number] = base
+            else:
+                seen.add(node_number)
+                self.starts[node_number] = base
+                self.end_adjustments.pop(node_number, None)
+
+        if delta:
+            self._grow(last + 1, self.parents[number], delta)
+        self._replace_text(old_start, old_end, text)
+        return old_start, old_end, text
+
+    def _fold_shifts(self):
+        """Apply the pending shifts to the stored offsets and reset them"""
+        if not self.end_adjustments and not any(self.shifts.tree):
+            return
+        tree = self.shifts.tree
+        totals = [0] * len(tree)
+        for index in range(1, len(tree)):
+            totals[index] = tree[index] + totals[index - (index & -index)]
+        adjustments = self.end_adjustments
+        self.starts = [start + totals[number + 1] for number, start in enumerate(self.starts)]
+        self.ends = [end + totals[number + 1] + adjustments.get(number, 0)
+                     for number, end in enumerate(self.ends)]
+        self.end_adjustments = {}
+
+    def _splice(self, first, old_last, parent, depth, nodes, position, include_tail, lead=""):
+        """Replace entries first..old_last with nodes rendered from position on
+
+        nodes (at depth, children of parent number) get the numbers from
+        first on; later entries are renumbered. Returns lead plus their text.
+        Changing the number of entries costs a pass over the map's arrays,
+        but there is no rendering outside nodes.
+        """
+        elements, starts, ends, lasts, depths, parents = [], [], [], [], [], []
+        local = {}
+        open_numbers = []
+
+        def on_element(node, node_depth, offset):
+            index = local.get(node)
+            if index is None:
+                index = local[node] = len(elements)
+                elements.append(node)
+                starts.append(offset)
+                ends.append(offset)
+                lasts.append(first + index)
+                depths.append(depth + node_depth)
+                parents.append(first + open_numbers[-1] if open_numbers else parent)
+                open_numbers.append(index)
+            else:
+                ends[index] = offset
+                lasts[index] = first + len(elements) - 1
+                open_numbers.pop()
+
+        pieces = [lead]
+        position += len(lead)
+        for node in nodes:
+            text = "".join(_render(node, position, include_tail, on_element))
+            pieces.append(text)
+            position += len(text)
+
+        count_delta = len(elements) - (old_last - first + 1)
+        if count_delta:
+            self._fold_shifts()
+        else:
+            # Same numbering: store the offsets net of the pending shifts, as patch() does
+            total = self.shifts.total
+            starts = [start - total(first + index) for index, start in enumerate(starts)]
+            ends = [end - total(first + index) for index, end in enumerate(ends)]
+            for number in range(first, old_last + 1):
+                self.end_adjustments.pop(number, None)
+
+        for node in self.elements[first:old_last + 1]:
+            del self.order[node]
+        self.elements[first:old_last + 1] = elements
+        self.starts[first:old_last + 1] = starts
+        self.ends[first:old_last + 1] = ends
+        self.last[first:old_last + 1] = lasts
+        self.depths[first:old_last + 1] = depths
+        self.parents[first:old_last + 1] = parents
+        for index, node in enumerate(elements):
+            self.order[node] = first + index
+
+        if count_delta:
+            # Renumber everything after the new entries and the enclosing elements' last descendants
+            after = first + len(elements)
+            self.order.update(zip(self.elements[after:], range(after, len(self.elements))))
+            self.last[after:] = map(count_delta.__add__, self.last[after:])
+            self.parents[after:] = [
+                node_parent + count_delta if node_parent > old_last else node_parent
+                for node_parent in self.parents[after:]
+            ]
+            ancestor = parent
+            while ancestor != -1:
+                self.last[ancestor] += count_delta
+                ancestor = self.parents[ancestor]
+            self.shifts = _Fenwick(len(self.elements))
+        return "".join(pieces)
+
+    def replace_subtree(self, element):
+        """Re-render an element whose descendants were added, removed or replaced
+
+        Returns (old_start, old_end, new_text) like patch().
+        """
+        number = self.order[element]
+        old_start, old_end = self.span(element)
+        depth, parent = self.depths[number], self.parents[number]
+        self._reindent(element, depth)
+
+        text = self._splice(number, self.last[number], parent, depth, [element], old_start, False)
+        delta = len(text) - (old_end - old_start)
+        if delta:
+            self._grow(self.last[number] + 1, parent, delta)
+        self._replace_text(old_start, old_end, text)
+        return old_start, old_end, text
+
+    def replace_children(self, element, index, removed, added):
+        """Re-render the children added in place of removed at index, and the tail before them
+
+        Only that run of children is rendered, so a wide element costs no
+        more than the children that changed. The element's own tag,
+        attributes and text must be as rendered; when it gains its first
+        or loses its last child it is re-rendered whole instead.
+        Returns (old_start, old_end, new_text) like patch().
+        """
+        children = list(element)
+        next_index = index + len(added)
+        old_count = len(children) - len(added) + len(removed)
+        if not old_count or not (children or element.text):
+            # Switching between <tag /> and <tag>...</tag>
+            return self.replace_subtree(element)
+
+        number = self.order[element]
+        kept_after = children[next_index] if next_index < len(children) else None
+        if removed:
+            first = self.order[removed[0]]
+            old_last = self.last[self.order[removed[-1]]]
+        else:
+            first = self.order[kept_after] if kept_after is not None else self.last[number] + 1
+            old_last = first - 1
+
+        if index:
+            start = self.span(children[index - 1])[1]
+        else:
+            start = self._span(first)[0]
+        if kept_after is not None:
+            end = self.span(kept_after)[0]
+        else:
+            end = self._span(number)[1] - len(element.tag) - 3  # before "</tag>"
+
+        tail = children[index - 1].tail if index else None
+        lead = _escape_cdata(tail) if tail else ""
+        text = self._splice(first, old_last, number, self.depths[number] + 1, added, start, True, lead)
+        delta = len(text) - (end - start)
+        if delta:
+            after = self.last[self.order[added[-1]]] + 1 if added else first
+            self._grow(after, number, delta)
+        self._replace_text(start, end, text)
+        return start, end, text
+
+
+def render_document(root, space="  "):
+    """Pretty-print a document for the source view, returning (text, SourceMap or None)
+
+    The SourceMap is None for documents it can't represent; the text is
+    still produced with ET.tostring.
+    """
+    indent(root, space)
+    source_map = SourceMap(space)
+    try:
+        return source_map.build(root, len(XML_DECLARATION), XML_DECLARATION), source_map
+    except UnsupportedDocument:
+        xml_str = ET.tostring(root, encoding="unicode", method="xml")
+        return XML_DECLARATION + xml_str, None
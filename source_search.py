@@ -0,0 +1,64 @@
+"""
+Text search over the XML source view
+
+A LineIndex maps character offsets to Tk "line.column" indices with a
+binary search over line start offsets, so each match costs O(log lines)
+instead of counting newlines in everything before it.
+"""
+
+import re
+from bisect import bisect_right
+from itertools import accumulate, islice
+
+
+class SearchError(ValueError):
+    """Raised for an invalid search pattern"""
+
+
+class LineIndex:
+    """Start offset of every line in a string"""
+
+    def __init__(self, text):
+        self.starts = [0]
+        self.starts.extend(accumulate(len(line) + 1 for line in text.split("\n")))
+        self.starts.pop()  # offset one past the last line
+
+    def position(self, offset):
+        """Convert a character offset into a Tk text index"""
+        line = bisect_right(self.starts, offset) - 1
+        return f"{line + 1}.{offset - self.starts[line]}"
+
+
+def compile_pattern(term, case_sensitive=False, regex=False, whole_word=False):
+    """Build the regular expression for a search term"""
+    pattern = term if regex else re.escape(term)
+    if whole_word:
+        pattern = rf"\b(?:{pattern})\b"
+    try:
+        return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+    except re.error as e:
+        raise SearchError(f"Invalid regular expression: {e}") from None
+
+
+class SourceSearch:
+    """Finds matches in one snapshot of the source text"""
+
+    def __init__(self, text):
+        self.text = text
+        self.lines = LineIndex(text)
+
+    def iter_matches(self, pattern, max_results=None):
+        """Yield (start_index, end_index) Tk index pairs, skipping empty matches"""
+        matches = (match for match in pattern.finditer(self.text) if match.end() > match.start())
+        position = self.lines.position
+        for match in islice(matches, max_results):
+            yield position(match.start()), position(match.end())
+
+    def iter_batches(self, pattern, max_results=None, batch_size=200):
+        """Yield lists of at most batch_size matches, so callers can show results as they come"""
+        matches = self.iter_matches(pattern, max_results)
+        while True:
+            batch = list(islice(matches, batch_size))
+            if not batch:
+                return
+            yield batch
@@ -0,0 +1,135 @@
+"""
+Writes the binary fixtures next to this file
+
+The bytes are assembled by hand from the layouts documented in rml.py and
+fcb.py, without using either codec, so the tests can check the codecs
+against data they did not produce. Run it again only when a fixture is
+meant to change:
+
+    python tests/fixtures/make_fixtures.py
+"""
+
+import os
+import struct
+import zlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def packed(value):
+    """RML packed u32: one byte below 0xFF, else 0xFF and a u32"""
+    if value < 0xFF:
+        return bytes([value])
+    return b"\xff" + struct.pack("<I", value)
+
+
+class StringTable:
+    """RML string table, each string stored once at the offset it was first added"""
+
+    def __init__(self):
+        self.offsets = {}
+        self.data = bytearray()
+
+    def __call__(self, value):
+        if value not in self.offsets:
+            self.offsets[value] = len(self.data)
+            self.data += value.encode("utf-8") + b"\x00"
+        return self.offsets[value]
+
+
+def rml_node(strings, tag, value="", attributes=(), child_count=0):
+    record = packed(strings(tag)) + packed(strings(value)) + packed(len(attributes)) + packed(child_count)
+    for name, attribute_value in attributes:
+        record += packed(strings(name)) + packed(strings(attribute_value))
+    return record
+
+
+def rml_file(flag, strings, records, node_count, attribute_count):
+    header = b"\x00" + bytes([flag]) + packed(len(strings.data)) + packed(node_count) + packed(attribute_count)
+    return header + b"".join(records) + bytes(strings.data)
+
+
+def small_rml():
+    """<root><Item id="1" name="Tree" /><Note>hello</Note></root>, flag byte 1"""
+    strings = StringTable()
+    records = [
+        rml_node(strings, "root", child_count=2),
+        rml_node(strings, "Item", attributes=[("id", "1"), ("name", "Tree")]),
+        rml_node(strings, "Note", "hello"),
+    ]
+    return rml_file(1, strings, records, 3, 2)
+
+
+def empty_rml():
+    """A lone <Empty /> element: no value, no attributes, no children"""
+    strings = StringTable()
+    return rml_file(0, strings, [rml_node(strings, "Empty")], 1, 0)
+
+
+def packed_rml():
+    """<List> with 255 <Entry index="N" /> children, so counts and offsets need the 0xFF form"""
+    strings = StringTable()
+    records = [rml_node(strings, "List", child_count=255)]
+    for number in range(255):
+        records.append(rml_node(strings, "Entry", attributes=[("index", str(number))]))
+    return rml_file(0, strings, records, 256, 255)
+
+
+def fcb_count(value):
+    """.fcb count: one byte below 0xFE, else 0xFF and a u32"""
+    if value < 0xFE:
+        return bytes([value])
+    return b"\xff" + struct.pack("<I", value)
+
+
+def crc(name):
+    return zlib.crc32(name.encode("ascii")) & 0xFFFFFFFF
+
+
+def fcb_object(class_hash, values, child_count=0):
+    record = fcb_count(child_count) + struct.pack("<I", class_hash) + fcb_count(len(values))
+    for member_hash, raw in values:
+        record += struct.pack("<I", member_hash) + fcb_count(len(raw)) + raw
+    return record
+
+
+def fcb_file(flags, objects, object_count, value_count):
+    return b"nbCF" + struct.pack("<HHII", 3, flags, object_count, value_count) + b"".join(objects)
+
+
+def entity_fcb():
+    """An Entity object with typed, unknown and large values, and one child object"""
+    root = fcb_object(crc("Entity"), [
+        (crc("hidName"), b"tree01\x00"),
+        (crc("hidPos"), struct.pack("<3f", 1.0, 2.0, 3.5)),
+        (0xDEADBEEF, b"\x00\xff"),
+        (crc("hidBlob"), bytes(range(256)) + bytes(44)),
+    ], child_count=1)
+    child = fcb_object(0xE0BDB3DB, [(crc("hidEnabled"), b"\x01")])
+    return fcb_file(2, [root, child], 2, 5)
+
+
+def reference_fcb():
+    """Two values with the same bytes, the second stored as a back reference to the first"""
+    head = fcb_count(0) + struct.pack("<I", crc("Entity")) + fcb_count(2)
+    first = struct.pack("<I", crc("hidName")) + fcb_count(7) + b"shared\x00"
+    # The reference distance counts back from the reference to the first value's size
+    reference_at = 16 + len(head) + len(first) + 4
+    first_size_at = 16 + len(head) + 4
+    second = struct.pack("<I", crc("hidOther")) + b"\xfe" + struct.pack("<I", reference_at - first_size_at)
+    return fcb_file(0, [head + first + second], 1, 2)
+
+
+FIXTURES = {
+    "small.rml": small_rml,
+    "empty.rml": empty_rml,
+    "packed.rml": packed_rml,
+    "entity.fcb": entity_fcb,
+    "reference.fcb": reference_fcb,
+}
+
+
+if __name__ == "__main__":
+    for name, make in FIXTURES.items():
+        with open(os.path.join(HERE, name), "wb") as f:
+            f.write(make())
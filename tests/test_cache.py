@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from cache import ConversionCache
+
+KB = 1024 / (1024 * 1024)  # max_size_mb of one kilobyte
+
+
+class ConversionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def entry_files(self):
+        return sorted(name for _, _, names in os.walk(self.directory) for name in names)
+
+    def test_put_and_get(self):
+        store = ConversionCache(self.directory)
+        key = store.make_key(b"input", "to_xml")
+        self.assertIsNone(store.get(key))
+        store.put(key, b"output")
+        self.assertEqual(store.get(key), b"output")
+        self.assertEqual(store.stats()["hits"], 1)
+        self.assertEqual(store.stats()["misses"], 1)
+
+    def test_keys_depend_on_direction(self):
+        store = ConversionCache(self.directory)
+        self.assertNotEqual(store.make_key(b"data", "to_xml"), store.make_key(b"data", "to_binary"))
+
+    def test_least_recently_used_is_evicted(self):
+        store = ConversionCache(self.directory, max_size_mb=KB)
+        keys = [store.make_key(bytes([number]), "to_xml") for number in range(3)]
+        store.put(keys[0], bytes(400))
+        store.put(keys[1], bytes(400))
+        store.get(keys[0])  # now more recent than keys[1]
+        store.put(keys[2], bytes(400))
+
+        self.assertEqual(store.evictions, 1)
+        self.assertIsNone(store.get(keys[1]))
+        self.assertIsNotNone(store.get(keys[0]))
+        self.assertIsNotNone(store.get(keys[2]))
+        self.assertLessEqual(store.stats()["size"], 1024)
+
+    def test_oversized_entries_are_not_stored(self):
+        store = ConversionCache(self.directory, max_size_mb=KB)
+        store.put(store.make_key(b"big", "to_xml"), bytes(2048))
+        self.assertEqual(self.entry_files(), [])
+
+    def test_order_survives_restart(self):
+        first = ConversionCache(self.directory, max_size_mb=KB)
+        old, new = first.make_key(b"old", "to_xml"), first.make_key(b"new", "to_xml")
+        first.put(old, bytes(400))
+        first.put(new, bytes(400))
+        past = time.time() - 60
+        os.utime(first._entry_path(old), (past, past))
+
+        second = ConversionCache(self.directory, max_size_mb=KB)
+        second.put(second.make_key(b"third", "to_xml"), bytes(400))
+        self.assertNotIn(old, self.entry_files())
+        self.assertIn(new, self.entry_files())
+
+    def test_limit_holds_across_instances(self):
+        # Two processes sharing the directory each see the other's entries before evicting
+        first = ConversionCache(self.directory, max_size_mb=KB)
+        second = ConversionCache(self.directory, max_size_mb=KB)
+        first.stats()
+        second.stats()
+        for number in range(6):
+            store = (first, second)[number % 2]
+            store.put(store.make_key(bytes([number]), "to_xml"), bytes(300))
+        total = sum(os.path.getsize(first._entry_path(key)) for key in self.entry_files())
+        self.assertLessEqual(total, 1024)
+
+    def test_put_sees_entries_of_other_instances(self):
+        first = ConversionCache(self.directory, max_size_mb=1)
+        second = ConversionCache(self.directory, max_size_mb=1)
+        first.stats()
+        second.put(second.make_key(b"other", "to_xml"), bytes(10))
+        first.put(first.make_key(b"mine", "to_xml"), bytes(10))
+        self.assertEqual(first.stats()["entries"], 2)
+
+    def test_clear(self):
+        store = ConversionCache(self.directory)
+        store.put(store.make_key(b"a", "to_xml"), b"x")
+        store.clear()
+        self.assertEqual(self.entry_files(), [])
+        self.assertEqual(store.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from compact_document import CompactDocument, CompactIndex
+from doc_stats import DocumentStatistics
+
+DOCUMENT = """<?xml version="1.0" encoding="utf-8"?>
+<root>
+  <Entity name="tree01" kind="plant">
+    <field name="hidPos">1,2,3</field>
+    <field name="hidScale">1</field>
+  </Entity>
+  <Entity name="rock01">
+    <field name="hidPos">4,5,6</field>
+  </Entity>
+  <Group />
+</root>"""
+
+
+class CompactDocumentTest(unittest.TestCase):
+    def setUp(self):
+        self.document = CompactDocument.fromstring(DOCUMENT)
+        self.reference = ET.fromstring(DOCUMENT)
+
+    def test_statistics_match_a_full_count(self):
+        counted = self.document.statistics()
+        full = DocumentStatistics(self.reference)
+        self.assertEqual((counted.elements, counted.attributes, counted.tag_counts, counted.depth_counts),
+                         (full.elements, full.attributes, full.tag_counts, full.depth_counts))
+        self.assertEqual(counted.max_depth, 2)
+
+    def test_detached_elements_are_not_counted(self):
+        root = self.document.getroot()
+        root.remove(root[0])
+        self.assertEqual(self.document.statistics().elements, 4)
+
+    def test_index_paths(self):
+        index = CompactIndex(self.document)
+        root = self.document.getroot()
+        field = root[1][0]
+        self.assertEqual(index.path(field), [root, root[1], field])
+        self.assertEqual(index.parent(field), root[1])
+        self.assertEqual(index.search("rock01"), [])
+
+        detached = root[0]
+        root.remove(detached)
+        self.assertEqual(index.path(detached), [])
+        self.assertEqual(index.path(ET.Element("field")), [])
+
+    def test_edits_are_saved(self):
+        root = self.document.getroot()
+        root[0][1].text = "2"
+        root[1].set("name", "rock02")
+        del root[0].attrib["kind"]
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "saved.xml")
+        self.document.write(path)
+
+        saved = ET.parse(path).getroot()
+        self.assertEqual(saved[0][1].text, "2")
+        self.assertEqual(saved[1].get("name"), "rock02")
+        self.assertEqual(saved[0].attrib, {"name": "tree01"})
+        self.assertEqual(ET.tostring(saved), ET.tostring(self.document.to_element()))
+
+
+if __name__ == "__main__":
+    unittest.main()
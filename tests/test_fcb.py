@@ -0,0 +1,102 @@
+import os
+import unittest
+import xml.etree.ElementTree as ET
+
+import fcb
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def definitions():
+    entity = fcb.hash_name("Entity")
+    return fcb.ClassDefinitions(
+        classes={entity: ("Entity", {
+            fcb.hash_name("hidName"): ("hidName", "String"),
+            fcb.hash_name("hidPos"): ("hidPos", "Vector3"),
+        })},
+        members={fcb.hash_name("hidEnabled"): ("hidEnabled", "Bool")},
+    )
+
+
+class FixtureRoundTripTest(unittest.TestCase):
+    def test_entity(self):
+        data = read_fixture("entity.fcb")
+        root, flags = fcb.decode_document(data, definitions())
+        self.assertEqual(flags, 2)
+        self.assertEqual(root.get("name"), "Entity")
+
+        fields = root.findall("field")
+        self.assertEqual([(field.get("name"), field.get("type"), field.text) for field in fields[:2]],
+                         [("hidName", "String", "tree01"), ("hidPos", "Vector3", "1,2,3.5")])
+        # Unknown members are kept by hash, as BinHex
+        self.assertEqual((fields[2].get("hash"), fields[2].get("type"), fields[2].text), ("DEADBEEF", "BinHex", "00FF"))
+        # Sizes of 0xFE and up use the long count form
+        self.assertEqual(len(bytes.fromhex(fields[3].text)), 300)
+
+        child = root.find("object")
+        self.assertEqual(child.get("hash"), "E0BDB3DB")
+        self.assertEqual((child[0].get("name"), child[0].text), ("hidEnabled", "true"))
+
+        self.assertEqual(fcb.encode(root, flags), data)
+
+    def test_round_trip_through_text(self):
+        data = read_fixture("entity.fcb")
+        root, flags = fcb.decode_document(data, definitions())
+        reparsed = ET.fromstring(fcb.to_xml_bytes(root))
+        self.assertEqual(fcb.encode(reparsed, flags), data)
+
+    def test_back_reference_is_expanded(self):
+        data = read_fixture("reference.fcb")
+        root = fcb.decode(data, definitions())
+        self.assertEqual([field.text for field in root], ["shared", b"shared\x00".hex().upper()])
+        self.assertEqual(root[1].get("type"), "BinHex")
+
+        # Written out again the shared value is stored twice
+        encoded = fcb.encode(root)
+        self.assertGreater(len(encoded), len(data))
+        self.assertEqual(ET.tostring(fcb.decode(encoded, definitions())), ET.tostring(root))
+
+
+class MalformedDataTest(unittest.TestCase):
+    def test_bad_magic(self):
+        with self.assertRaises(fcb.FCBFormatError):
+            fcb.decode(b"nbCX" + bytes(12))
+
+    def test_truncated(self):
+        with self.assertRaises(fcb.FCBFormatError):
+            fcb.decode(read_fixture("entity.fcb")[:-10])
+
+    def test_value_out_of_range(self):
+        # struct.error from packing, reported like any other bad value
+        root = ET.fromstring('<object name="Entity"><field name="hidCount" type="UInt32">4294967296</field></object>')
+        with self.assertRaises(fcb.FCBFormatError):
+            fcb.encode(root)
+
+    def test_invalid_values(self):
+        for value_type, text in (("Bool", "maybe"), ("Vector3", "1,2"), ("UInt32", "ten"), ("BinHex", "0G")):
+            root = ET.fromstring(f'<object name="Entity"><field name="hidX" type="{value_type}">{text}</field></object>')
+            with self.assertRaises(fcb.FCBFormatError, msg=value_type):
+                fcb.encode(root)
+
+
+class ValueTest(unittest.TestCase):
+    def test_typed_values_round_trip(self):
+        for value_type, text in (("String", "tree01"), ("Bool", "false"), ("Hash", "1A2B3C4D"),
+                                 ("UInt32", "4294967295"), ("UInt64", "18446744073709551615"),
+                                 ("Float", "0.1"), ("Vector2", "-1,0.5"), ("Vector4", "1,2,3,4")):
+            raw = fcb.encode_value(value_type, text)
+            self.assertEqual(fcb.decode_value(value_type, raw), (text, value_type))
+
+    def test_mismatched_data_becomes_binhex(self):
+        self.assertEqual(fcb.decode_value("Bool", b"\x02"), ("02", "BinHex"))
+        self.assertEqual(fcb.decode_value("String", b"no terminator"), (b"no terminator".hex().upper(), "BinHex"))
+        self.assertEqual(fcb.decode_value("Float", b"\x00\x00\xc0\x7f"), ("0000C07F", "BinHex"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import unittest
+import xml.etree.ElementTree as ET
+
+import rml
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class PackedValueTest(unittest.TestCase):
+    def test_below_0xff_is_one_byte(self):
+        self.assertEqual(rml._read_packed(b"\xfe", 0), (0xFE, 1))
+        out = bytearray()
+        rml._write_packed(out, 0xFE)
+        self.assertEqual(out, b"\xfe")
+
+    def test_0xff_and_above_are_five_bytes(self):
+        for value in (0xFF, 0x100, 0xFFFFFFFF):
+            out = bytearray()
+            rml._write_packed(out, value)
+            self.assertEqual(len(out), 5)
+            self.assertEqual(out[0], 0xFF)
+            self.assertEqual(rml._read_packed(out, 0), (value, 5))
+
+    def test_truncated(self):
+        with self.assertRaises(rml.RMLFormatError):
+            rml._read_packed(b"\xff\x01\x02", 0)
+        with self.assertRaises(rml.RMLFormatError):
+            rml._read_packed(b"", 0)
+
+
+class FixtureRoundTripTest(unittest.TestCase):
+    """Decode hand-built files, check what came out, and re-encode them byte for byte"""
+
+    def assert_round_trip(self, name):
+        data = read_fixture(name)
+        root, unknown1 = rml.decode_document(data)
+        self.assertEqual(rml.encode(root, unknown1), data)
+        self.assertTrue(rml.roundtrip_matches(data))
+        return root, unknown1
+
+    def test_small(self):
+        root, unknown1 = self.assert_round_trip("small.rml")
+        self.assertEqual(unknown1, 1)
+        self.assertEqual(root.tag, "root")
+        self.assertEqual([child.tag for child in root], ["Item", "Note"])
+        self.assertEqual(root[0].attrib, {"id": "1", "name": "Tree"})
+        self.assertEqual(list(root[0].attrib), ["id", "name"])
+        self.assertIsNone(root[0].text)
+        self.assertEqual(root[1].text, "hello")
+
+    def test_empty_tables(self):
+        root, unknown1 = self.assert_round_trip("empty.rml")
+        self.assertEqual((root.tag, root.attrib, root.text, len(root)), ("Empty", {}, None, 0))
+        self.assertEqual(rml.read_header(read_fixture("empty.rml"))[2:4], (1, 0))
+
+    def test_packed_counts_and_offsets(self):
+        data = read_fixture("packed.rml")
+        unknown1, table_size, node_count, attr_count, offset = rml.read_header(data)
+        self.assertGreaterEqual(table_size, 0xFF)
+        self.assertEqual((node_count, attr_count), (256, 255))
+        root, _ = self.assert_round_trip("packed.rml")
+        self.assertEqual(len(root), 255)
+        self.assertEqual([child.get("index") for child in root], [str(number) for number in range(255)])
+
+    def test_readable_xml_encodes_back(self):
+        data = read_fixture("small.rml")
+        text = rml.to_xml_bytes(rml.decode(data))
+        # Indentation added for reading is not part of the data
+        self.assertEqual(rml.encode(ET.fromstring(text), 1), data)
+
+
+class StreamingDecoderTest(unittest.TestCase):
+    def test_iterparse_matches_decode(self):
+        for name in ("small.rml", "empty.rml", "packed.rml"):
+            data = read_fixture(name)
+            root = None
+            for event, element in rml.iterparse(os.path.join(FIXTURES, name)):
+                if event == "end":
+                    root = element
+            self.assertEqual(ET.tostring(root), ET.tostring(rml.decode(data)), name)
+
+    def test_scan(self):
+        counts = rml.scan(os.path.join(FIXTURES, "packed.rml"), "Entry")
+        self.assertEqual((counts["elements"], counts["attributes"], counts["max_depth"]), (256, 255, 1))
+        self.assertEqual(counts["matches"], 255)
+
+
+class MalformedDataTest(unittest.TestCase):
+    def test_bad_magic(self):
+        with self.assertRaises(rml.RMLFormatError):
+            rml.decode(b"\x01\x00\x00\x00\x00")
+
+    def test_truncated_string_table(self):
+        with self.assertRaises(rml.RMLFormatError):
+            rml.decode(read_fixture("small.rml")[:-3])
+
+    def test_count_mismatch(self):
+        data = bytearray(read_fixture("small.rml"))
+        data[3] = 4  # node count
+        with self.assertRaises(rml.RMLFormatError):
+            rml.decode(bytes(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import sniffer
+from sniffer import FORMAT_FCB, FORMAT_RML, FORMAT_UNKNOWN, FORMAT_XML, sniff_bytes
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+XML = '<?xml version="1.0" encoding="utf-8"?>\n<root />'
+
+
+class SniffBytesTest(unittest.TestCase):
+    def test_binary_formats(self):
+        with open(os.path.join(FIXTURES, "small.rml"), "rb") as f:
+            self.assertEqual(sniff_bytes(f.read(sniffer.SNIFF_SIZE)), FORMAT_RML)
+        with open(os.path.join(FIXTURES, "entity.fcb"), "rb") as f:
+            self.assertEqual(sniff_bytes(f.read(sniffer.SNIFF_SIZE)), FORMAT_FCB)
+
+    def test_xml_encodings(self):
+        cases = {
+            "utf-8": XML.encode("utf-8"),
+            "utf-8 with BOM": b"\xef\xbb\xbf" + XML.encode("utf-8"),
+            "utf-16 le with BOM": b"\xff\xfe" + XML.encode("utf-16-le"),
+            "utf-16 be with BOM": b"\xfe\xff" + XML.encode("utf-16-be"),
+            "utf-16 le": XML.encode("utf-16-le"),
+            "utf-16 be": XML.encode("utf-16-be"),
+            "leading whitespace": b"\r\n  \t" + XML.encode("utf-8"),
+        }
+        for name, data in cases.items():
+            self.assertEqual(sniff_bytes(data[:sniffer.SNIFF_SIZE]), FORMAT_XML, name)
+
+    def test_unknown(self):
+        for data in (b"", b"\x00", b"PK\x03\x04", b"\xef\xbb\xbfnot xml", b"plain text"):
+            self.assertEqual(sniff_bytes(data), FORMAT_UNKNOWN, data)
+
+
+class SniffFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_whitespace_beyond_the_first_bytes(self):
+        path = self.write("padded.xml", b" " * (sniffer.SNIFF_SIZE * 100) + XML.encode("utf-8"))
+        self.assertEqual(sniffer.sniff_file(path), FORMAT_XML)
+        path = self.write("blank.xml", b"\n" * (sniffer.SNIFF_SIZE * 2))
+        self.assertEqual(sniffer.sniff_file(path), FORMAT_UNKNOWN)
+
+    def test_classify_directory(self):
+        with open(os.path.join(FIXTURES, "small.rml"), "rb") as f:
+            rml_data = f.read()
+        binary = self.write("a/binary.game.xml", rml_data)
+        readable = self.write("a/readable.game.xml", XML.encode("utf-8"))
+        self.write("b/notes.txt", XML.encode("utf-8"))
+        self.write("b/level_depload.xml", XML.encode("utf-8"))
+
+        self.assertEqual(sniffer.classify_directory(self.directory), {binary: FORMAT_RML, readable: FORMAT_XML})
+        self.assertEqual(len(sniffer.classify_directory(self.directory, supported_only=False)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import copy
+import unittest
+import xml.etree.ElementTree as ET
+
+from source_map import render_document
+from tree_diff import (common_prefix_length, common_suffix_length, patch_source, subtree_equal,
+                       update_source_map)
+
+DOCUMENT = """<root>
+  <Entity name="tree01" kind="plant">
+    <field name="hidPos">1,2,3</field>
+    <field name="hidScale">1</field>
+  </Entity>
+  <Entity name="rock01">
+    <field name="hidPos">4,5,6</field>
+  </Entity>
+  <Group />
+</root>"""
+
+
+class PrefixSuffixTest(unittest.TestCase):
+    def test_lengths(self):
+        self.assertEqual(common_prefix_length("abcdef", "abcxef"), 3)
+        self.assertEqual(common_prefix_length("abc", "abc"), 3)
+        self.assertEqual(common_suffix_length("abcdef", "abcxef", 3), 2)
+        # The suffix never overlaps the prefix already matched
+        self.assertEqual(common_suffix_length("aaaa", "aaaaa", 4), 4)
+
+
+class PatchSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.root = ET.fromstring(DOCUMENT)
+        self.text, self.source_map = render_document(self.root)
+        self.elements = list(self.root.iter())
+
+    def edit(self, old, new, use_map=True):
+        """Apply a text edit; returns the new text and the patches"""
+        self.assertEqual(self.text.count(old), 1, old)
+        new_text = self.text.replace(old, new)
+        element, patches = patch_source(self.root, new_text, self.source_map if use_map else None)
+        return new_text, element, patches
+
+    def assert_matches(self, new_text, patches):
+        """The patched tree renders to the edited text, and the patched map matches a fresh one"""
+        fresh_text, fresh_map = render_document(copy.deepcopy(self.root))
+        self.assertEqual(fresh_text, new_text)
+        update_source_map(self.source_map, patches)
+        self.assertEqual(self.source_map.text(), new_text)
+        _, fresh_map = render_document(self.root)
+        for element in self.root.iter():
+            self.assertEqual(self.source_map.span(element), fresh_map.span(element), element)
+
+    def test_attribute_edit_patches_only_that_element(self):
+        new_text, element, patches = self.edit('name="rock01"', 'name="rock02"')
+        self.assertIs(element, self.root[1])
+        self.assertEqual([patch.element for patch in patches], [self.root[1]])
+        self.assertEqual(self.root[1].get("name"), "rock02")
+        self.assertEqual(list(self.root.iter()), self.elements)  # every element kept its identity
+        self.assert_matches(new_text, patches)
+
+    def test_text_edit(self):
+        new_text, _, patches = self.edit(">4,5,6<", ">7,8,9<")
+        self.assertEqual(self.root[1][0].text, "7,8,9")
+        self.assert_matches(new_text, patches)
+
+    def test_insert_child(self):
+        new_text, _, patches = self.edit(
+            '<field name="hidScale">1</field>',
+            '<field name="hidScale">1</field>\n    <field name="hidAngle">90</field>')
+        self.assertEqual([field.get("name") for field in self.root[0]], ["hidPos", "hidScale", "hidAngle"])
+        self.assertIs(self.root[0][0], self.elements[2])
+        self.assertEqual(sum(patch.attribute_delta for patch in patches), 0)
+        self.assert_matches(new_text, patches)
+
+    def test_remove_child(self):
+        new_text, _, patches = self.edit('\n    <field name="hidScale">1</field>', "")
+        self.assertEqual(len(self.root[0]), 1)
+        self.assert_matches(new_text, patches)
+
+    def test_edit_across_elements(self):
+        # Two siblings changed: their parent is the innermost element holding both
+        new_text = self.text.replace('name="rock01"', 'name="rock02"').replace("<Group />", '<Group id="1" />')
+        element, patches = patch_source(self.root, new_text, self.source_map)
+        self.assertIs(element, self.root)
+        self.assertEqual((self.root[1].get("name"), self.root[2].get("id")), ("rock02", "1"))
+        # The changed run of children is replaced; the child before it is kept
+        self.assertEqual(list(self.root[0].iter()), self.elements[1:4])
+        self.assert_matches(new_text, patches)
+
+    def test_without_source_map(self):
+        new_text, element, patches = self.edit('kind="plant"', 'kind="tree"', use_map=False)
+        self.assertIs(element, self.root)
+        self.assertEqual(self.root[0].get("kind"), "tree")
+        self.assertEqual(render_document(self.root)[0], new_text)
+
+    def test_no_change(self):
+        self.assertEqual(patch_source(self.root, self.text, self.source_map), (None, []))
+
+    def test_malformed_source(self):
+        with self.assertRaises(ET.ParseError):
+            self.edit("<Group />", "<Group>")
+
+    def test_inverse_patches_restore_the_tree(self):
+        original = copy.deepcopy(self.root)
+        _, _, patches = self.edit('<field name="hidPos">4,5,6</field>', '<Item />')
+        self.assertFalse(subtree_equal(self.root, original))
+        for patch in reversed(patches):
+            patch.inverse().apply()
+        self.assertTrue(subtree_equal(self.root, original))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+import undo
+from undo import AttributeChange, Change, CompoundChange, TextChange, UndoStack
+
+
+def type_text(stack, element, text, at=0.0):
+    """Record one keystroke's TextChange made at time at"""
+    with mock.patch.object(undo.time, "monotonic", return_value=at):
+        change = TextChange(element, element.text, text)
+    change.redo()
+    stack.record(change)
+    return change
+
+
+class CoalescingTest(unittest.TestCase):
+    def setUp(self):
+        self.element = ET.Element("field")
+        self.stack = UndoStack(coalesce_seconds=1.0)
+
+    def test_keystrokes_within_the_window_are_one_step(self):
+        for position, at in enumerate((0.0, 0.4, 0.8, 1.2)):
+            type_text(self.stack, self.element, "abcd"[:position + 1], at)
+        self.stack.undo()
+        self.assertIsNone(self.element.text)
+        self.assertFalse(self.stack.can_undo())
+        self.stack.redo()
+        self.assertEqual(self.element.text, "abcd")
+
+    def test_pause_starts_a_new_step(self):
+        type_text(self.stack, self.element, "a", 0.0)
+        type_text(self.stack, self.element, "ab", 2.5)
+        self.stack.undo()
+        self.assertEqual(self.element.text, "a")
+
+    def test_other_element_starts_a_new_step(self):
+        other = ET.Element("field")
+        type_text(self.stack, self.element, "a", 0.0)
+        type_text(self.stack, other, "b", 0.1)
+        self.stack.undo()
+        self.assertEqual((self.element.text, other.text), ("a", None))
+
+    def test_undo_and_break_merge_end_a_step(self):
+        type_text(self.stack, self.element, "a", 0.0)
+        self.stack.break_merge()
+        type_text(self.stack, self.element, "ab", 0.1)
+        self.stack.undo()
+        self.assertEqual(self.element.text, "a")
+
+        type_text(self.stack, self.element, "ax", 0.2)
+        self.stack.undo()
+        self.assertEqual(self.element.text, "a")
+
+    def test_merged_size_is_accounted(self):
+        type_text(self.stack, self.element, "a", 0.0)
+        type_text(self.stack, self.element, "a" * 1000, 0.1)
+        self.assertEqual(self.stack.size, undo.CHANGE_OVERHEAD + 1000)
+
+
+class EvictionTest(unittest.TestCase):
+    def test_step_limit_drops_the_oldest(self):
+        element = ET.Element("field")
+        stack = UndoStack(max_levels=3)
+        for number in range(5):
+            change = AttributeChange(element, "value", element.get("value"), str(number))
+            change.redo()
+            stack.record(change)
+        self.assertEqual(stack.evicted, 2)
+        while stack.undo():
+            pass
+        self.assertEqual(element.get("value"), "1")
+
+    def test_memory_limit_drops_the_oldest_but_keeps_the_newest(self):
+        element = ET.Element("field")
+        stack = UndoStack(max_bytes=3000)
+        for number in range(3):
+            stack.break_merge()
+            type_text(stack, element, str(number) * 1000, number)
+        self.assertLessEqual(stack.size, 3000)
+        self.assertEqual(stack.evicted, 2)
+
+        # A single step larger than the budget still stays undoable
+        stack.break_merge()
+        type_text(stack, element, "x" * 5000, 10)
+        self.assertTrue(stack.can_undo())
+        stack.undo()
+        self.assertEqual(element.text, "2" * 1000)
+
+    def test_recording_drops_the_redo_steps(self):
+        element = ET.Element("field")
+        stack = UndoStack()
+        type_text(stack, element, "a")
+        stack.undo()
+        self.assertTrue(stack.can_redo())
+        stack.record(AttributeChange(element, "id", None, "1"))
+        self.assertFalse(stack.can_redo())
+        self.assertEqual(stack.size, stack._undo[0].size)
+
+
+class ChangeTest(unittest.TestCase):
+    def test_compound_change_undoes_in_reverse(self):
+        element = ET.Element("field", {"old": "1"})
+        rename = CompoundChange([AttributeChange(element, "old", "1", None),
+                                 AttributeChange(element, "new", None, "1")])
+        rename.redo()
+        self.assertEqual(element.attrib, {"new": "1"})
+        self.assertEqual(rename.attribute_delta, 0)
+        rename.undo()
+        self.assertEqual(element.attrib, {"old": "1"})
+
+    def test_change_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Change()
+
+
+if __name__ == "__main__":
+    unittest.main()
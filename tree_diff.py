@@ -0,0 +1,293 @@
+"""
+Structural diff and in-place patching of element trees
+
+"Apply Changes to Tree" used to parse the whole source and replace the
+tree. Instead, the edited region of the text is found (common prefix and
+suffix against the text the source map describes), only the innermost
+element around it is parsed again, and the old element is patched in
+place to match. Elements that didn't change keep their identity, so tree
+items, index entries and undo records pointing at them stay valid.
+
+When the edit can't be narrowed down to one element, the whole text is
+parsed and compared from the root, still patching only what differs.
+"""
+
+import copy
+import xml.etree.ElementTree as ET
+
+from tree_walk import indent
+
+# Characters compared at a time when looking for the common prefix/suffix
+COMPARE_CHUNK = 64 * 1024
+
+
+def common_prefix_length(a, b):
+    """Length of the longest common prefix of two strings"""
+    limit = min(len(a), len(b))
+    position = 0
+    while position < limit:
+        end = min(position + COMPARE_CHUNK, limit)
+        if a[position:end] != b[position:end]:
+            # Narrow down within the differing chunk
+            while a[position] == b[position]:
+                position += 1
+            return position
+        position = end
+    return limit
+
+
+def common_suffix_length(a, b, limit):
+    """Length of the longest common suffix of two strings, at most limit"""
+    length = 0
+    while length < limit:
+        size = min(COMPARE_CHUNK, limit - length)
+        a_end, b_end = len(a) - length, len(b) - length
+        if a[a_end - size:a_end] != b[b_end - size:b_end]:
+            while a[a_end - 1] == b[b_end - 1]:
+                a_end -= 1
+                b_end -= 1
+                length += 1
+            return length
+        length += size
+    return limit
+
+
+def _fields(element):
+    # Attribute order matters: it is what the source view shows
+    return element.tag, tuple(element.attrib.items()), element.text, element.tail
+
+
+def subtree_equal(a, b):
+    """Check two elements for identical tags, attributes, text, tails and descendants"""
+    stack = [(a, b)]
+    while stack:
+        x, y = stack.pop()
+        if len(x) != len(y) or _fields(x) != _fields(y):
+            return False
+        stack.extend(zip(x, y))
+    return True
+
+
+class ElementPatch:
+    """One element's new tag, attributes and text, and a run of replaced children
+
+    Children [index, index + len(removed)) are replaced by added; tail, if
+    set, is the (old, new) tail of the child just before them. depth is the
+    element's depth below the document root.
+    """
+
+    def __init__(self, element, depth, old_fields, new_fields, index=0, removed=(), added=(), tail=None):
+        self.element = element
+        self.depth = depth
+        self.old_fields = old_fields
+        self.new_fields = new_fields
+        self.index = index
+        self.removed = list(removed)
+        self.added = list(added)
+        self.tail = tail
+
+    @property
+    def structural(self):
+        return bool(self.removed or self.added)
+
+    @property
+    def attribute_delta(self):
+        return len(self.new_fields[1]) - len(self.old_fields[1])
+
+    def apply(self):
+        element = self.element
+        element.tag, attributes, element.text, element.tail = self.new_fields
+        element.attrib.clear()
+        element.attrib.update(attributes)
+        if self.structural:
+            element[self.index:self.index + len(self.removed)] = self.added
+        if self.tail is not None:
+            element[self.index - 1].tail = self.tail[1]
+
+    def inverse(self):
+        """The patch that undoes this one"""
+        tail = self.tail[::-1] if self.tail is not None else None
+        return ElementPatch(self.element, self.depth, self.new_fields, self.old_fields,
+                            self.index, self.added, self.removed, tail)
+
+
+def patch_tree(old, new, depth=0, keep_before=None, keep_after=None):
+    """Make old match new in place and return the applied ElementPatch list, parents first
+
+    new should be indented like the source view, with old's tail.
+    keep_before/keep_after are the numbers of leading and trailing children
+    known to be unchanged; when omitted they are found by comparing
+    subtrees. A single changed child with the same tag and tail on both
+    sides is patched recursively rather than replaced.
+    """
+    patches = []
+    stack = [(old, new, depth, keep_before, keep_after)]
+    while stack:
+        old_element, new_element, element_depth, before, after = stack.pop()
+        old_children, new_children = list(old_element), list(new_element)
+        limit = min(len(old_children), len(new_children))
+        if before is None:
+            before = 0
+            while before < limit and subtree_equal(old_children[before], new_children[before]):
+                before += 1
+        if after is None:
+            after = 0
+            while after < limit - before and subtree_equal(old_children[-1 - after], new_children[-1 - after]):
+                after += 1
+        removed = old_children[before:len(old_children) - after]
+        added = new_children[before:len(new_children) - after]
+
+        # Kept children are unchanged up to their end; the last one's tail
+        # runs into the edited text
+        tail = None
+        if before and old_children[before - 1].tail != new_children[before - 1].tail:
+            tail = (old_children[before - 1].tail, new_children[before - 1].tail)
+
+        if (len(removed) == len(added) == 1 and removed[0].tag == added[0].tag
+                and removed[0].tail == added[0].tail):
+            stack.append((removed[0], added[0], element_depth + 1, None, None))
+            removed = added = ()
+
+        old_fields, new_fields = _fields(old_element), _fields(new_element)
+        if old_fields != new_fields or removed or added or tail is not None:
+            patch = ElementPatch(old_element, element_depth, old_fields, new_fields, before, removed, added, tail)
+            patch.apply()
+            patches.append(patch)
+    return patches
+
+
+def update_source_map(source_map, patches):
+    """Re-render what applied patches changed in a SourceMap
+
+    Deeper elements go first, so an ancestor re-rendered whole afterwards
+    finds its descendants already mapped.
+    """
+    for patch in sorted(patches, key=lambda patch: -patch.depth):
+        element = patch.element
+        if patch.old_fields != patch.new_fields:
+            if patch.structural:
+                source_map.replace_subtree(element)
+            else:
+                source_map.patch(element)
+        else:
+            # Only children (and the tail before them) changed: render just those
+            source_map.replace_children(element, patch.index, patch.removed, patch.added)
+
+
+def patch_source(root, new_text, source_map=None, space="  ", fromstring=ET.fromstring):
+    """Patch a document to match its edited source text
+
+    With a source map describing the text before the edit, only the
+    innermost element holding the edit is parsed and compared; otherwise
+    the whole text is. Returns (element compared, applied patches), with
+    element None if nothing changed. fromstring parses text into an element
+    and raises ET.ParseError for malformed source.
+    """
+    located = locate_change(source_map, new_text, space, fromstring) if source_map is not None else None
+    if located is None:
+        new_root = fromstring(new_text)
+        indent(new_root, space)
+        new_root.tail = root.tail
+        return root, patch_tree(root, new_root)
+
+    element, new_element, keep_before, keep_after = located
+    if element is None:
+        return None, []
+    return element, patch_tree(element, new_element, source_map.depth(element), keep_before, keep_after)
+
+
+def locate_change(source_map, new_text, space="  ", fromstring=ET.fromstring):
+    """Find the innermost mapped element whose source holds every difference in new_text
+
+    Returns (element, new_element, keep_before, keep_after): new_element is
+    the element parsed again from the edited text and indented, the counts
+    are its leading and trailing children outside the edit. When the edit
+    lies between two children only that stretch is parsed. Returns
+    (None, None, 0, 0) if nothing changed, None if no single element holds the edit.
+    """
+    old_text = source_map.text()
+    prefix = common_prefix_length(old_text, new_text)
+    if prefix == len(old_text) == len(new_text):
+        return None, None, 0, 0
+    suffix = common_suffix_length(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+    old_end = len(old_text) - suffix
+    delta = len(new_text) - len(old_text)
+
+    element = source_map.innermost(prefix, old_end)
+    while element is not None:
+        start, end = source_map.span(element)
+        depth = source_map.depth(element)
+        children = list(element)
+        # Children entirely before or after the edit are unchanged
+        keep_before = _leading_run(source_map, children, lambda span: span[1] <= prefix)
+        keep_after = _leading_run(source_map, children[::-1], lambda span: span[0] >= old_end)
+
+        if keep_before:
+            # Between two children (or the last child and the end tag):
+            # parse just that stretch, in a wrapper element
+            content_start = source_map.span(children[keep_before - 1])[1]
+            if keep_after:
+                content_end = source_map.span(children[-keep_after])[0]
+            else:
+                content_end = end - len(element.tag) - 3
+            if old_end <= content_end:
+                try:
+                    wrapper = fromstring("<_>" + new_text[content_start:content_end + delta] + "</_>")
+                except ET.ParseError:
+                    pass
+                else:
+                    new_element = _rebuild(element, children, wrapper, keep_before, keep_after, space, depth)
+                    return element, new_element, keep_before, keep_after
+
+        try:
+            new_element = fromstring(new_text[start:end + delta])
+        except ET.ParseError:
+            # The edit breaks this element's markup on its own; try its parent
+            element = source_map.parent(element)
+            continue
+
+        indent(new_element, space, depth)
+        new_element.tail = element.tail
+        keep_before = min(keep_before, len(new_element))
+        keep_after = min(keep_after, len(new_element) - keep_before)
+        return element, new_element, keep_before, keep_after
+    return None
+
+
+def _rebuild(element, children, wrapper, keep_before, keep_after, space, depth):
+    # The element as edited: its kept children around the parsed middle ones.
+    # The last kept child is copied because its tail (the wrapper's text) may differ
+    middle = list(wrapper)
+    kept_after = children[len(children) - keep_after:]
+    last_kept = copy.copy(children[keep_before - 1])
+    last_kept.tail = wrapper.text
+
+    # Indent the new stretch as indent() would indent the whole element
+    child_indentation = "\n" + space * (depth + 1)
+    closing_indentation = "\n" + space * depth
+    for child in middle:
+        indent(child, space, depth + 1)
+    if not (last_kept.tail or "").strip():
+        last_kept.tail = child_indentation if middle or kept_after else closing_indentation
+    if middle and not kept_after and not middle[-1].tail.strip():
+        middle[-1].tail = closing_indentation
+
+    new_element = ET.Element(element.tag, element.attrib)
+    new_element.text, new_element.tail = element.text, element.tail
+    new_element.extend(children[:keep_before - 1])
+    new_element.append(last_kept)
+    new_element.extend(middle)
+    new_element.extend(kept_after)
+    return new_element
+
+
+def _leading_run(source_map, children, unchanged):
+    # Spans are ordered, so the children passing unchanged() form a prefix
+    low, high = 0, len(children)
+    while low < high:
+        middle = (low + high) // 2
+        if unchanged(source_map.span(children[middle])):
+            low = middle + 1
+        else:
+            high = middle
+    return low
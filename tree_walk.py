@@ -0,0 +1,73 @@
+"""
+Explicit-stack tree traversals
+
+Works on anything with an ordered list of children: ElementTree elements by
+default, or Treeview items by passing children=tree.get_children. Nothing
+here recurses, so documents nested deeper than the interpreter's recursion
+limit are fine.
+"""
+
+
+def _element_children(element):
+    return element
+
+
+def preorder(root, children=_element_children):
+    """Yield (node, depth) in document order
+
+    A node's children are fetched only after the node has been yielded, so
+    the consumer may add or replace them (e.g. populate a lazy tree item)
+    before they are visited.
+    """
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        nodes = children(node)
+        if len(nodes):
+            depth += 1
+            stack.extend((child, depth) for child in reversed(nodes))
+
+
+def max_depth(root, children=_element_children):
+    """Depth of the deepest node below root (0 for a leaf)"""
+    deepest = 0
+    for node, depth in preorder(root, children):
+        if depth > deepest:
+            deepest = depth
+    return deepest
+
+
+def indent(root, space="  ", level=0):
+    """Add pretty-printing whitespace in place, like ElementTree.indent
+
+    Existing non-whitespace text and tails are left alone. level is the
+    indentation level of root itself.
+    """
+    indentations = ["\n" + level * space]
+
+    def indentation(depth):
+        while len(indentations) <= depth - level:
+            indentations.append(indentations[-1] + space)
+        return indentations[depth - level]
+
+    if (level or len(root)) and (not root.tail or not root.tail.strip()):
+        root.tail = indentations[0]
+
+    # Only elements with children are stacked; a parent sets its children's tails
+    stack = [(root, level)] if len(root) else []
+    while stack:
+        element, depth = stack.pop()
+        child_indentation = indentation(depth + 1)
+        if not element.text or not element.text.strip():
+            element.text = child_indentation
+
+        for child in element:
+            if not child.tail or not child.tail.strip():
+                child.tail = child_indentation
+            if len(child):
+                stack.append((child, depth + 1))
+
+        # The last child closes its parent, so it lines up with the parent
+        if not child.tail.strip():
+            child.tail = indentation(depth)
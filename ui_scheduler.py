@@ -0,0 +1,98 @@
+"""
+Coalesced UI updates for the editor
+
+Event handlers mark what became stale (a tree item, the statistics, part
+of the source view, the window title) instead of redrawing it right away.
+Each kind of update is flushed once, either at the next idle moment or
+after a quiet period, however many times it was requested in between.
+"""
+
+
+class UIScheduler:
+    """Collects dirty flags and runs one handler call per flag per flush"""
+
+    def __init__(self, widget, intervals=None):
+        self.widget = widget
+        # name -> debounce interval in ms; 0 (or missing) flushes at the next idle moment
+        self.intervals = dict(intervals or {})
+        self._handlers = {}  # name -> handler(keys)
+        self._dirty = {}     # name -> set of keys waiting to be flushed
+        self._pending = {}   # name -> Tk after id
+        self.requested = {}  # name -> number of mark() calls
+        self.flushed = {}    # name -> number of handler calls
+
+    def register(self, name, handler):
+        """Set the handler for a flag; it gets the set of keys marked since the last flush"""
+        self._handlers[name] = handler
+        self.requested.setdefault(name, 0)
+        self.flushed.setdefault(name, 0)
+
+    def mark(self, name, key=None):
+        """Request an update; key (e.g. a tree item) is passed to the handler"""
+        self.requested[name] += 1
+        keys = self._dirty.setdefault(name, set())
+        if key is not None:
+            keys.add(key)
+
+        interval = self.intervals.get(name, 0)
+        pending = self._pending.get(name)
+        if interval <= 0:
+            if pending is None:
+                self._pending[name] = self.widget.after_idle(self.flush, name)
+            return
+
+        # Debounce: every new request pushes the flush back
+        if pending is not None:
+            self.widget.after_cancel(pending)
+        self._pending[name] = self.widget.after(interval, self.flush, name)
+
+    def is_dirty(self, name):
+        return name in self._dirty
+
+    def discard(self, name):
+        """Drop pending updates for a flag, e.g. after a full redraw made them moot"""
+        self._dirty.pop(name, None)
+        pending = self._pending.pop(name, None)
+        if pending is not None:
+            self.widget.after_cancel(pending)
+
+    def flush(self, name):
+        """Run a flag's handler now if it has pending updates"""
+        pending = self._pending.pop(name, None)
+        if pending is not None:
+            self.widget.after_cancel(pending)
+        if name not in self._dirty:
+            return
+        keys = self._dirty.pop(name)
+        self.flushed[name] += 1
+        try:
+            self._handlers[name](keys)
+        except Exception as e:
+            print(f"Error in {name} update: {e}")
+
+    def flush_all(self):
+        for name in list(self._dirty):
+            self.flush(name)
+
+    def cancel_all(self):
+        for name in list(self._dirty):
+            self.discard(name)
+
+    def _avoided(self, name):
+        # A flag still waiting will be flushed once more
+        return self.requested[name] - self.flushed[name] - (name in self._dirty)
+
+    def avoided(self):
+        """Number of requested updates that were merged into another one"""
+        return sum(self._avoided(name) for name in self._handlers)
+
+    def stats(self):
+        """Per flag {"requested", "flushed", "avoided"} counters"""
+        return {
+            name: {
+                "requested": self.requested[name],
+                "flushed": self.flushed[name],
+                "avoided": self._avoided(name),
+            }
+            for name in self._handlers
+        }
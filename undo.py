@@ -0,0 +1,241 @@
+"""
+Undo/redo history made of small edit records
+
+Each change remembers only what it altered (one attribute, one text value,
+or which tree replaced which), never a copy of the document, so undoing
+an edit in a huge file is as cheap as making it. The history is bounded
+by a number of steps and by an estimate of the memory it keeps alive;
+the oldest steps are dropped first.
+"""
+
+import time
+from abc import ABC, abstractmethod
+
+# Rough cost of keeping one element alive (object, attribute dict, strings)
+ELEMENT_SIZE_ESTIMATE = 400
+
+# Fixed cost of one change record
+CHANGE_OVERHEAD = 100
+
+
+def _text_size(value):
+    return len(value) if value else 0
+
+
+class Change(ABC):
+    """One undoable edit"""
+
+    element = None          # element the change touches, None for whole-document changes
+    attribute_delta = 0     # attributes added (negative: removed) when the change is applied
+    size = CHANGE_OVERHEAD  # estimated bytes this record keeps alive
+
+    @abstractmethod
+    def undo(self):
+        """Put the document back as it was before the change"""
+
+    @abstractmethod
+    def redo(self):
+        """Apply the change (again)"""
+
+    def merge(self, change, window):
+        """Fold a following change made within window seconds into this one; returns success"""
+        return False
+
+
+class TextChange(Change):
+    """Element text replaced"""
+
+    def __init__(self, element, old, new):
+        self.element = element
+        self.old = old
+        self.new = new
+        self.time = time.monotonic()
+        self.size = CHANGE_OVERHEAD + _text_size(old) + _text_size(new)
+
+    def undo(self):
+        self.element.text = self.old
+
+    def redo(self):
+        self.element.text = self.new
+
+    def merge(self, change, window):
+        # Consecutive keystrokes in the same element become one step
+        if not isinstance(change, TextChange) or change.element is not self.element:
+            return False
+        if change.time - self.time > window:
+            return False
+        self.new = change.new
+        self.time = change.time
+        self.size = CHANGE_OVERHEAD + _text_size(self.old) + _text_size(self.new)
+        return True
+
+
+class AttributeChange(Change):
+    """Attribute added, changed or deleted (None means the attribute is absent)"""
+
+    def __init__(self, element, name, old, new):
+        self.element = element
+        self.name = name
+        self.old = old
+        self.new = new
+        self.attribute_delta = (new is not None) - (old is not None)
+        self.size = CHANGE_OVERHEAD + len(name) + _text_size(old) + _text_size(new)
+
+    def _set(self, value):
+        if value is None:
+            self.element.attrib.pop(self.name, None)
+        else:
+            self.element.set(self.name, value)
+
+    def undo(self):
+        self._set(self.old)
+
+    def redo(self):
+        self._set(self.new)
+
+
+class CompoundChange(Change):
+    """Several changes undone and redone as one step (e.g. an attribute rename)"""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        elements = {id(change.element) for change in self.changes}
+        if len(elements) == 1:
+            self.element = self.changes[0].element
+        self.attribute_delta = sum(change.attribute_delta for change in self.changes)
+        self.size = sum(change.size for change in self.changes)
+
+    def undo(self):
+        for change in reversed(self.changes):
+            change.undo()
+
+    def redo(self):
+        for change in self.changes:
+            change.redo()
+
+
+class DocumentReplace(Change):
+    """The whole tree swapped for a newly parsed one
+
+    .tree is whichever ElementTree is current after the last undo/redo.
+    """
+
+    def __init__(self, old_tree, new_tree, element_count=0):
+        self.old_tree = old_tree
+        self.new_tree = new_tree
+        self.tree = new_tree
+        # The replaced tree stays alive for as long as this record does
+        self.size = CHANGE_OVERHEAD + element_count * ELEMENT_SIZE_ESTIMATE
+
+    def undo(self):
+        self.tree = self.old_tree
+
+    def redo(self):
+        self.tree = self.new_tree
+
+
+class TreePatchChange(Change):
+    """Source edits applied to the tree as element patches (see tree_diff)
+
+    element is the element the edit was located in. .applied is the list
+    of patches the last undo or redo applied, in order.
+    """
+
+    def __init__(self, element, patches):
+        self.element = element
+        self.patches = list(patches)
+        self.applied = self.patches
+        self.attribute_delta = sum(patch.attribute_delta for patch in self.patches)
+        # Removed and added subtrees stay alive for as long as this record does
+        elements = sum(1 for patch in self.patches for child in patch.removed + patch.added for _ in child.iter())
+        self.size = CHANGE_OVERHEAD * (1 + len(self.patches)) + elements * ELEMENT_SIZE_ESTIMATE
+
+    def undo(self):
+        self.applied = [patch.inverse() for patch in reversed(self.patches)]
+        for patch in self.applied:
+            patch.apply()
+
+    def redo(self):
+        self.applied = self.patches
+        for patch in self.applied:
+            patch.apply()
+
+
+class UndoStack:
+    """Bounded undo/redo history"""
+
+    def __init__(self, max_levels=50, max_bytes=64 * 1024 * 1024, coalesce_seconds=1.0):
+        self.max_levels = max_levels
+        self.max_bytes = max_bytes
+        self.coalesce_seconds = coalesce_seconds
+        self._undo = []
+        self._redo = []
+        self._size = 0
+        self._can_merge = False
+        self.evicted = 0
+
+    @property
+    def size(self):
+        """Estimated bytes kept alive by the history"""
+        return self._size
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+        self._can_merge = False
+
+    def record(self, change):
+        """Add a change that has already been applied to the document"""
+        for undone in self._redo:
+            self._size -= undone.size
+        self._redo.clear()
+
+        if self._can_merge and self._undo:
+            top = self._undo[-1]
+            old_size = top.size
+            if top.merge(change, self.coalesce_seconds):
+                self._size += top.size - old_size
+                self._evict()
+                return
+
+        self._undo.append(change)
+        self._size += change.size
+        self._can_merge = True
+        self._evict()
+
+    def _evict(self):
+        # Oldest first; the newest step is always kept
+        while len(self._undo) > 1 and (len(self._undo) > self.max_levels or self._size > self.max_bytes):
+            self._size -= self._undo.pop(0).size
+            self.evicted += 1
+
+    def undo(self):
+        """Revert the newest change and return it, or None if there is nothing to undo"""
+        if not self._undo:
+            return None
+        change = self._undo.pop()
+        change.undo()
+        self._redo.append(change)
+        self._can_merge = False
+        return change
+
+    def redo(self):
+        """Re-apply the newest undone change and return it, or None"""
+        if not self._redo:
+            return None
+        change = self._redo.pop()
+        change.redo()
+        self._undo.append(change)
+        self._can_merge = False
+        return change
+
+    def break_merge(self):
+        """Make the next recorded change a separate step"""
+        self._can_merge = False
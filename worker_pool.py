@@ -0,0 +1,334 @@
+"""
+Long-lived converter worker processes fed from a request queue
+
+Workers stay warm between conversions and receive (direction, bytes) jobs over
+a pipe. Each job gets a timeout scaled by its input size; a worker that times
+out or crashes is killed and restarted, up to a limited number of restarts
+within a time window.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import Future
+
+import rml
+
+
+class WorkerError(Exception):
+    """Raised when a worker fails to convert a job"""
+
+
+class WorkerTimeoutError(WorkerError):
+    """Raised when a job takes longer than its timeout"""
+
+
+class WorkerCrashedError(WorkerError):
+    """Raised when a worker process dies or the pool has no workers left"""
+
+
+def scaled_timeout(size, base_timeout=None, timeout_per_mb=None):
+    """Seconds allowed to convert size bytes; unset values come from WORKER_POOL_SETTINGS"""
+    if base_timeout is None or timeout_per_mb is None:
+        from config import WORKER_POOL_SETTINGS
+        if base_timeout is None:
+            base_timeout = WORKER_POOL_SETTINGS.get("base_timeout", 10)
+        if timeout_per_mb is None:
+            timeout_per_mb = WORKER_POOL_SETTINGS.get("timeout_per_mb", 2)
+    return base_timeout + timeout_per_mb * size / (1024 * 1024)
+
+
+def convert_native(direction, data):
+    """Convert bytes with the in-process RML codec"""
+    if direction == "readable":
+        return rml.to_xml_bytes(rml.decode(data))
+    return rml.encode(ET.fromstring(data))
+
+
+def convert_exe(direction, data, converter_path, timeout=None, child_pid=None):
+    """Convert bytes with ConvertXml.exe through temporary files
+
+    child_pid, a multiprocessing.Value, holds the tool's process id while it
+    runs, so whoever kills this process can kill the tool too.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if direction == "readable":
+            source, target, mode = "input.rml", "output.xml", "--xml"
+        else:
+            source, target, mode = "input.xml", "output.rml", "--rml"
+        source = os.path.join(tmp_dir, source)
+        target = os.path.join(tmp_dir, target)
+
+        with open(source, "wb") as f:
+            f.write(data)
+
+        process = subprocess.Popen(
+            [converter_path, mode, source.replace("\\", "/"), target.replace("\\", "/")],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        if child_pid is not None:
+            child_pid.value = process.pid
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            if child_pid is not None:
+                child_pid.value = 0
+        if process.returncode != 0:
+            raise WorkerError(f"Conversion failed: {stderr}")
+
+        with open(target, "rb") as f:
+            return f.read()
+
+
+def _worker_main(conn, backend, converter_path, child_pid):
+    """Worker process loop: receive jobs until told to stop"""
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        job_id, direction, data, timeout = message
+        try:
+            if backend == "exe":
+                output = convert_exe(direction, data, converter_path, timeout, child_pid)
+            else:
+                output = convert_native(direction, data)
+            conn.send((job_id, True, output))
+        except Exception as e:
+            conn.send((job_id, False, (type(e).__name__, str(e))))
+
+
+def _rebuild_error(name, message):
+    """Turn an error reported by a worker back into a local exception"""
+    if name == "RMLFormatError":
+        return rml.RMLFormatError(message)
+    if name == "ParseError":
+        return ET.ParseError(message)
+    if name == "TimeoutExpired":
+        return WorkerTimeoutError(message)
+    return WorkerError(f"{name}: {message}")
+
+
+class _Worker:
+    """One worker process plus the dispatcher thread that feeds it"""
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.child_pid = None  # pid of the worker's running ConvertXml.exe, 0 when idle
+        self.retired = False
+        self.restart_times = deque()
+
+        self.start_process()
+        self.thread = threading.Thread(target=self.dispatch_loop,
+                                       name=f"converter-worker-{index}", daemon=True)
+        self.thread.start()
+
+    def start_process(self):
+        """Spawn the worker process"""
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.child_pid = multiprocessing.Value("i", 0)
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, self.pool.backend, self.pool.converter_path, self.child_pid),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def kill_process(self):
+        """Terminate the worker process without waiting for it to finish its job"""
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(timeout=5)
+
+        # The tool is a separate process and outlives its terminated worker
+        pid = self.child_pid.value
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+            self.child_pid.value = 0
+
+    def restart(self):
+        """Restart the worker process, retiring it if it keeps failing"""
+        self.kill_process()
+
+        now = time.monotonic()
+        self.restart_times.append(now)
+        while self.restart_times and now - self.restart_times[0] > self.pool.restart_window:
+            self.restart_times.popleft()
+
+        if len(self.restart_times) > self.pool.max_restarts:
+            self.retired = True
+            return False
+
+        self.pool.record("restarts")
+        self.start_process()
+        return True
+
+    def run_job(self, job_id, direction, data, timeout):
+        """Send a job to the process and wait for its reply"""
+        message = (job_id, direction, data, timeout)
+        try:
+            self.conn.send(message)
+        except OSError:
+            # The process died while idle, so the job never started: retry it once
+            if not self.restart():
+                raise WorkerCrashedError("Converter worker keeps crashing") from None
+            self.conn.send(message)
+        deadline = time.monotonic() + timeout
+        while True:
+            if not self.conn.poll(max(0.0, deadline - time.monotonic())):
+                raise WorkerTimeoutError(f"Conversion timed out after {timeout:.1f}s")
+            reply_id, ok, payload = self.conn.recv()
+            # Anything else answers a job that already gave up waiting
+            if reply_id == job_id:
+                break
+        if ok:
+            return payload
+        raise _rebuild_error(*payload)
+
+    def dispatch_loop(self):
+        """Take jobs from the pool queue until shutdown"""
+        while True:
+            job = self.pool.jobs.get()
+            if job is None:
+                break
+
+            future, job_id, direction, data, timeout = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(self.run_job(job_id, direction, data, timeout))
+                self.pool.record("completed")
+            except WorkerTimeoutError as e:
+                self.pool.record("timeouts")
+                self.pool.record("failed")
+                future.set_exception(e)
+                self.restart()
+            except (EOFError, OSError) as e:
+                self.pool.record("failed")
+                future.set_exception(WorkerCrashedError(f"Converter worker crashed: {e}"))
+                self.restart()
+            except Exception as e:
+                self.pool.record("failed")
+                future.set_exception(e)
+
+            if self.retired:
+                self.pool.worker_retired()
+                break
+
+        if not self.retired:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+
+
+class ConverterWorkerPool:
+    """Pool of warm converter processes that accepts conversion jobs"""
+
+    def __init__(self, workers=1, backend="native", tools_path="tools",
+                 base_timeout=10.0, timeout_per_mb=2.0, max_restarts=3, restart_window=60.0):
+        self.backend = backend
+        self.converter_path = os.path.join(tools_path, "Gibbed.Dunia.ConvertXml.exe")
+        self.base_timeout = base_timeout
+        self.timeout_per_mb = timeout_per_mb
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+
+        self.jobs = queue.Queue()
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "restarts": 0}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._closed = False
+
+        self.workers = [_Worker(self, index) for index in range(max(1, workers))]
+
+    def record(self, counter):
+        """Increment a pool counter"""
+        with self._lock:
+            self.counters[counter] += 1
+
+    def timeout_for(self, size):
+        """Get the timeout in seconds for an input of the given size"""
+        return scaled_timeout(size, self.base_timeout, self.timeout_per_mb)
+
+    def submit(self, direction, data, timeout=None):
+        """Queue a conversion and return a Future for the converted bytes"""
+        future = Future()
+        with self._lock:
+            if self._closed or all(worker.retired for worker in self.workers):
+                future.set_exception(WorkerCrashedError("No converter workers available"))
+                return future
+            self._next_id += 1
+            job_id = self._next_id
+            self.counters["submitted"] += 1
+
+        if timeout is None:
+            timeout = self.timeout_for(len(data))
+        self.jobs.put((future, job_id, direction, data, timeout))
+        return future
+
+    def convert(self, direction, data, timeout=None):
+        """Convert bytes and wait for the result"""
+        return self.submit(direction, data, timeout).result()
+
+    def worker_retired(self):
+        """Fail queued jobs once every worker has been retired"""
+        if not all(worker.retired for worker in self.workers):
+            return
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job[0].set_running_or_notify_cancel():
+                job[0].set_exception(WorkerCrashedError("No converter workers available"))
+
+    def stats(self):
+        """Get a copy of the pool counters"""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["workers"] = sum(1 for worker in self.workers if not worker.retired)
+        return stats
+
+    def shutdown(self):
+        """Stop all workers after the queued jobs finish"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.thread.join(timeout=10)